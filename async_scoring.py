@@ -0,0 +1,192 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains an asyncio interface to the complexity measures, for services that run on an event loop.
+
+Every measure is CPU-bound, so calling one from a coroutine would block the event loop until it is done. AsyncScorer
+runs them in an executor instead (a process pool by default, since the measures hold the GIL), and limits how many
+texts are being scored at once:
+    - score and score_text wait for a free slot before handing a text to the executor
+    - stream scores a (synchronous or asynchronous) stream of texts, and only reads the next text from it when a slot
+      is free, so a fast producer cannot queue up unbounded work
+Results of a stream come back in input order, or as soon as each one is done.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import asyncio
+import collections
+import os
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, Iterable, Optional
+
+import create_tree as ct
+import evaluation
+from data_processing import TextBlock, Sentence, excerpt_phrases
+
+
+def text_to_block(text: str, block_id: Optional[int] = None) -> TextBlock:
+    """Return a TextBlock of text, split into sentences the same way as the excerpts of the corpus. Text without a
+    sentence ending mark ('.', '?' or '!') is one sentence.
+
+    >>> [sentence.phrase for sentence in text_to_block('She danced. He sang').excerpt]
+    ['She danced.']
+    >>> [sentence.phrase for sentence in text_to_block('She danced').excerpt]
+    ['She danced']
+    """
+    phrases = excerpt_phrases(text) or [text.replace('\\', '')]
+    sentences = [Sentence(phrase, block_id, None, None) for phrase in phrases]
+    return TextBlock(sentences, block_id, None, None, None, None, None, None, len(text), None, None)
+
+
+async def _aiter(items: Iterable | AsyncIterable) -> AsyncIterator:
+    """Yield every item of items, whether it is a synchronous or an asynchronous iterable."""
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class AsyncScorer:
+    """
+    Scores text blocks (Dale-Chall, Flesch Reading Ease and MDD, as evaluation.score_block does) without blocking the
+    event loop, with at most max_concurrency blocks being scored at any time.
+
+    Use it as an async context manager, so that the executor it created is shut down afterwards:
+        async with AsyncScorer() as scorer:
+            async for index, scores in scorer.stream(texts):
+                ...
+
+    Instance Attributes:
+    - executor: the executor the measures run in
+    - max_concurrency: the most blocks handed to the executor at once
+
+    Representation Invariants:
+    - self.max_concurrency > 0
+    """
+    executor: Executor
+    max_concurrency: int
+    _slots: asyncio.Semaphore
+    _owns_executor: bool
+
+    def __init__(self, workers: Optional[int] = None, max_concurrency: Optional[int] = None,
+                 executor: Optional[Executor] = None) -> None:
+        """Initialize a scorer that runs in executor, or in a new pool of workers processes (all cores by default).
+
+        By default, max_concurrency is twice the number of workers, so that every worker has a block queued behind the
+        one it is scoring.
+        """
+        workers = workers or os.cpu_count() or 1
+        self._owns_executor = executor is None
+        self.executor = executor or ct.process_pool(workers)
+        self.max_concurrency = max_concurrency or 2 * workers
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    async def __aenter__(self) -> AsyncScorer:
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Shut down the executor, if this scorer created it, without blocking the event loop."""
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+
+    async def score(self, text_block: TextBlock) -> tuple[float, float, float]:
+        """Return the raw (Dale-Chall, Flesch Reading Ease, MDD) scores of text_block, nan where a measure cannot be
+        computed, waiting for a free slot first if max_concurrency blocks are already being scored.
+        """
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, evaluation.score_block, text_block)
+
+    async def score_text(self, text: str) -> tuple[float, float, float]:
+        """Return the raw scores of text (see score and text_to_block)."""
+        return await self.score(text_to_block(text))
+
+    async def stream(self, items: Iterable[str | TextBlock] | AsyncIterable[str | TextBlock],
+                     ordered: bool = True) -> AsyncIterator[tuple[int, tuple[float, float, float]]]:
+        """Score every text or text block of items, and yield (index, scores) pairs, where index is the position of the
+        item in items.
+
+        If ordered is True, pairs are yielded in input order. Otherwise, each is yielded as soon as it is done. Either
+        way, at most max_concurrency items are read from items but not yet yielded, so items is consumed only as fast
+        as the results are.
+        """
+        if ordered:
+            generator = self._stream_ordered(items)
+        else:
+            generator = self._stream_completed(items)
+        async for result in generator:
+            yield result
+
+    def _submit(self, index: int, item: str | TextBlock) -> asyncio.Task:
+        """Start scoring item, and return the task that will give its (index, scores) pair."""
+        async def run() -> tuple[int, tuple[float, float, float]]:
+            block = item if isinstance(item, TextBlock) else text_to_block(item, index)
+            return index, await self.score(block)
+        return asyncio.ensure_future(run())
+
+    async def _stream_ordered(self, items: Iterable | AsyncIterable) -> AsyncIterator:
+        """Yield the (index, scores) pair of every item in input order (see stream)."""
+        window = collections.deque()
+        index = 0
+        try:
+            async for item in _aiter(items):
+                if len(window) >= self.max_concurrency:
+                    yield await window.popleft()
+                window.append(self._submit(index, item))
+                index += 1
+            while window:
+                yield await window.popleft()
+        finally:
+            for task in window:
+                task.cancel()
+
+    async def _stream_completed(self, items: Iterable | AsyncIterable) -> AsyncIterator:
+        """Yield the (index, scores) pair of every item as soon as it is done (see stream)."""
+        pending = set()
+        index = 0
+        try:
+            async for item in _aiter(items):
+                if len(pending) >= self.max_concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                pending.add(self._submit(index, item))
+                index += 1
+            for task in asyncio.as_completed(pending):
+                yield await task
+            pending = set()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+async def _demo(texts: list[str]) -> None:
+    """Score texts as a stream and print each result as it is done."""
+    async with AsyncScorer() as scorer:
+        async for index, scores in scorer.stream(texts, ordered=False):
+            print(index, scores)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    asyncio.run(_demo(['She danced.', 'The girl ate an apple.',
+                       'She fights like the wind when she is fighting angrily.']))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["asyncio", "collections", "os", "concurrent.futures", "typing", "create_tree",
+                          "evaluation", "data_processing"],
+        'allowed-io': ["_demo"]
+    })
@@ -0,0 +1,269 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains a learned estimate of the CAREC_M score of a text, as an alternative to matching it with its nearest
+block of the corpus (scoring.get_closest_carec_score).
+
+The model is a ridge (L2-regularized linear) regression of CAREC_M on the complexity measures of a text:
+    - Dale-Chall and Flesch Reading Ease
+    - the mean MDD of its sentences
+    - the mean of every syntactic metric of its sentences (see complexity_measures.SYNTAX_METRICS)
+It is fit offline on the corpus (run this file) and saved to data/carec_model.npz, which holds only the means and
+scales of the features, the coefficients, the intercept and the range of CAREC_M scores that estimates are clipped to,
+along with the parser backend and scores version (see evaluation.scores_provenance) that the features were computed
+with. The MDD and syntax features depend on both, so a model saved with different ones is trained again when loaded.
+Once the features of a text are known, estimating its CAREC_M is a dot product of a few numbers, which takes a couple
+of microseconds (see compare_with_nearest).
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+import complexity_measures as com_m
+import evaluation
+import scoring
+from data_processing import TextBlock, read_csv
+
+FEATURES = ('dale_chall', 'flesch', 'mdd') + com_m.SYNTAX_METRICS
+MODEL_FILE = 'data/carec_model.npz'
+
+
+class CarecModel:
+    """
+    A linear model of the CAREC_M score of a text, on its standardized features (in the order of FEATURES).
+
+    A missing (nan) feature is replaced by its mean over the corpus, so it does not move the estimate.
+
+    Instance Attributes:
+    - mean: the mean of every feature over the training blocks
+    - scale: the standard deviation of every feature over the training blocks (1 where a feature is constant)
+    - coefficients: the weight of every standardized feature
+    - intercept: the estimate for a text with every feature at its mean
+    - bounds: the lowest and highest CAREC_M scores of the training blocks, which estimates are clipped to
+    - provenance: the parser backend and scores version the training features were computed with, or None if unknown
+
+    Representation Invariants:
+    - len(self.mean) == len(self.scale) == len(self.coefficients) == len(FEATURES)
+    """
+    mean: np.ndarray
+    scale: np.ndarray
+    coefficients: np.ndarray
+    intercept: float
+    bounds: tuple[float, float]
+    provenance: Optional[tuple[str, int]]
+    _weights: list[tuple[float, float, float]]
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray, coefficients: np.ndarray, intercept: float,
+                 bounds: tuple[float, float] = (-np.inf, np.inf),
+                 provenance: Optional[tuple[str, int]] = None) -> None:
+        """Initialize a model from its parameters, fit on features computed with provenance."""
+        self.provenance = provenance
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.intercept = float(intercept)
+        self.bounds = (float(bounds[0]), float(bounds[1]))
+        # plain floats, so that predict_one does not pay the overhead of NumPy on a handful of numbers
+        self._weights = list(zip(self.mean.tolist(), self.scale.tolist(), self.coefficients.tolist()))
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Return the estimated CAREC_M score of every row of features.
+
+        >>> model = CarecModel(np.zeros(2), np.ones(2), np.array([1.0, -2.0]), 0.5)
+        >>> model.predict(np.array([[1.0, 1.0], [float('nan'), 0.25]])).tolist()
+        [-0.5, 0.0]
+        """
+        standardized = (np.atleast_2d(np.asarray(features, dtype=float)) - self.mean) / self.scale
+        return np.clip(np.nan_to_num(standardized) @ self.coefficients + self.intercept, *self.bounds)
+
+    def predict_one(self, features: list[float]) -> float:
+        """Return the estimated CAREC_M score of a single text from its features.
+
+        >>> model = CarecModel(np.zeros(2), np.ones(2), np.array([1.0, -2.0]), 0.5)
+        >>> model.predict_one([float('nan'), 0.25])
+        0.0
+        """
+        estimate = self.intercept
+        for value, (mean, scale, coefficient) in zip(features, self._weights):
+            if value == value:  # not nan
+                estimate += coefficient * (value - mean) / scale
+        return min(max(estimate, self.bounds[0]), self.bounds[1])
+
+    def save(self, model_file: str = MODEL_FILE) -> None:
+        """Save the parameters of the model to model_file, to be loaded with load_carec_model, along with its
+        provenance (the current one, if it is unknown).
+        """
+        backend, version = self.provenance or evaluation.scores_provenance()
+        np.savez(model_file, mean=self.mean, scale=self.scale, coefficients=self.coefficients,
+                 intercept=np.array(self.intercept), bounds=np.array(self.bounds),
+                 backend=np.array(backend), scores_version=np.array(version))
+
+
+def fit_carec_model(features: np.ndarray, carec: np.ndarray, alpha: float = 1.0) -> CarecModel:
+    """Return the ridge regression of carec on features (one row per block, in the order of FEATURES), with
+    regularization strength alpha. Blocks with a nan feature or CAREC_M score are left out.
+
+    >>> features = np.array([[0.0, 1.0], [1.0, 0.0], [2.0, 1.0], [3.0, 0.0]])
+    >>> model = fit_carec_model(features, 2 * features[:, 0] + 1, alpha=0.0)
+    >>> [round(estimate, 6) for estimate in model.predict(features).tolist()]
+    [1.0, 3.0, 5.0, 7.0]
+    """
+    features = np.asarray(features, dtype=float)
+    carec = np.asarray(carec, dtype=float)
+    keep = ~np.isnan(features).any(axis=1) & ~np.isnan(carec)
+    features, carec = features[keep], carec[keep]
+
+    mean = features.mean(axis=0)
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1
+    standardized = (features - mean) / scale
+    intercept = carec.mean()
+    # the normal equations of ridge regression, on centered features and target so that the intercept is not shrunk
+    gram = standardized.T @ standardized + alpha * np.eye(features.shape[1])
+    coefficients = np.linalg.solve(gram, standardized.T @ (carec - intercept))
+    return CarecModel(mean, scale, coefficients, intercept, (carec.min(), carec.max()))
+
+
+def _mean_over_sentences(values: list[float]) -> float:
+    """Return the mean of the values that are not nan, or nan if there are none."""
+    values = [value for value in values if value == value]
+    return sum(values) / len(values) if values else float('nan')
+
+
+def block_features(text_block: TextBlock, counts: Optional[tuple[float, float]] = None) -> list[float]:
+    """Return the features of text_block, in the order of FEATURES, nan where a feature cannot be computed.
+
+    counts is the (Dale-Chall, Flesch Reading Ease) pair of text_block, if it was already computed. MDD is the mean
+    MDD of the sentences that have one, the same as com_m.mean_dependency_distance when every sentence does (where that
+    cannot be computed at all), so that it is on the same scale for an excerpt and for a single sentence typed in.
+    """
+    if counts is None:
+        counts = (evaluation.try_score(com_m.dale_chall_complexity, text_block),
+                  evaluation.try_score(com_m.flesch_complexity_score, text_block))
+    mdd = _mean_over_sentences([evaluation.try_score(com_m.mean_dependency_distance_sentence, sentence)
+                                for sentence in text_block.excerpt])
+    syntax = [com_m.syntactic_complexity_sentence(sentence) for sentence in text_block.excerpt]
+    return [*counts, mdd, *(_mean_over_sentences([metrics[name] for metrics in syntax])
+                            for name in com_m.SYNTAX_METRICS)]
+
+
+def corpus_features(text_blocks: list[TextBlock], workers: Optional[int] = None) -> np.ndarray:
+    """Return a (len(text_blocks), len(FEATURES)) array of the features of every block.
+
+    The sentences are parsed in parallel by evaluation.score_corpus first, which fills the MDD and syntax caches, so
+    block_features only reads them back.
+    """
+    scores = evaluation.score_corpus(text_blocks, workers)
+    return np.array([block_features(block, (scores[i, 0], scores[i, 1])) for i, block in enumerate(text_blocks)],
+                    dtype=float)
+
+
+# the model saved in MODEL_FILE, loaded by load_carec_model the first time an estimate is needed
+carec_model = None
+
+
+def load_carec_model(model_file: str = MODEL_FILE) -> CarecModel:
+    """Return the model saved in model_file (loaded only once for the default file). Raise FileNotFoundError if it
+    was never trained.
+
+    If it was trained on features from a different parser backend or scores version than the current ones (or saved
+    before they were recorded), it is trained again on the corpus and saved to model_file first.
+    """
+    global carec_model
+    current = evaluation.scores_provenance()
+    if model_file == MODEL_FILE and carec_model is not None and carec_model.provenance == current:
+        return carec_model
+    with np.load(model_file) as parameters:
+        provenance = (str(parameters['backend']), int(parameters['scores_version'])) \
+            if 'scores_version' in parameters.files else None
+        model = CarecModel(parameters['mean'], parameters['scale'], parameters['coefficients'],
+                           float(parameters['intercept']), tuple(parameters['bounds'].tolist()), provenance)
+    if provenance != current:
+        model = train_carec_model(model_file=model_file)[0]
+    if model_file == MODEL_FILE:
+        carec_model = model
+    return model
+
+
+def estimate_carec(text_block: TextBlock) -> float:
+    """Return the estimated CAREC_M score of text_block, from the trained model if there is one, and from its nearest
+    block of the corpus otherwise.
+    """
+    if not os.path.exists(MODEL_FILE):
+        return scoring.get_closest_carec_score(text_block)
+    return load_carec_model().predict_one(block_features(text_block))
+
+
+def train_carec_model(csv_file: str = 'data/data_set_novels.csv', alpha: float = 1.0, workers: Optional[int] = None,
+                      model_file: str = MODEL_FILE) -> tuple[CarecModel, list[TextBlock], np.ndarray]:
+    """Fit the model on every block of csv_file and save it to model_file.
+
+    Return the model, the blocks and their features, so they can be passed on to compare_with_nearest.
+    """
+    text_blocks = read_csv(csv_file)
+    features = corpus_features(text_blocks, workers)
+    model = fit_carec_model(features, np.array([block.carec_m for block in text_blocks], dtype=float), alpha)
+    model.provenance = evaluation.scores_provenance()
+    model.save(model_file)
+    return model, text_blocks, features
+
+
+def compare_with_nearest(text_blocks: list[TextBlock], features: np.ndarray, alpha: float = 1.0,
+                         test_fraction: float = 0.2, seed: int = 0) -> dict[str, dict[str, float]]:
+    """Return how the model compares with nearest neighbour matching (scoring.CarecIndex, as used by
+    get_closest_carec_score) on a random held-out test_fraction of text_blocks, with both fit on the rest.
+
+    For each, report the correlation and MAE of its estimates with the actual CAREC_M scores of the test blocks, and
+    the mean time in microseconds to estimate one text once its features are known.
+    """
+    carec = np.array([block.carec_m for block in text_blocks], dtype=float)
+    order = np.random.default_rng(seed).permutation(len(text_blocks))
+    num_test = int(len(text_blocks) * test_fraction)
+    test, train = order[:num_test], order[num_test:]
+
+    model = fit_carec_model(features[train], carec[train], alpha)
+    index = scoring.CarecIndex(features[train, :2], carec[train])
+    test_rows = features[test].tolist()
+
+    start = time.perf_counter()
+    model_estimates = np.array([model.predict_one(row) for row in test_rows])
+    model_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    nearest_estimates = np.array([index.estimate(np.array(row[:2]))[0] for row in test_rows])
+    nearest_time = time.perf_counter() - start
+
+    report = {}
+    for name, estimates, elapsed in (('model', model_estimates, model_time),
+                                     ('nearest', nearest_estimates, nearest_time)):
+        valid = ~np.isnan(estimates) & ~np.isnan(carec[test])
+        report[name] = {'correlation': float(evaluation.correlation(estimates[valid], carec[test][valid])),
+                        'mae': float(evaluation.mean_absolute_error(estimates[valid], carec[test][valid])),
+                        'microseconds_per_text': elapsed / max(num_test, 1) * 1e6}
+    return report
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    trained_model, corpus, corpus_feature_rows = train_carec_model()
+    print(dict(zip(FEATURES, trained_model.coefficients.round(4).tolist())))
+    print(compare_with_nearest(corpus, corpus_feature_rows))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["os", "time", "typing", "numpy", "complexity_measures", "evaluation", "scoring",
+                          "data_processing"],
+        'allowed-io': []
+    })
@@ -6,10 +6,16 @@ This file contains the implementations for the three different complexity measur
 
 Dale_Chall: Complexity measured by ratio of unfamiliar words to overall words
 
-Flesch-Kincaid: Complexity measured by average number of syllables per word and average number of words per sentence
+Flesch-Kincaid: Complexity measured by average number of syllables per word and average number of words per sentence,
+as Reading Ease or as a Grade Level. SMOG and Coleman-Liau are computed from the same word, sentence, syllable and
+character counts.
 
 Mean Dependency Distance (MDD): Visualizing the dependency relations of each word in a sentence as a syntax tree,
-MDD measures the distance between every parent-child pair.
+MDD measures the distance between every parent-child pair. The same parse also gives the tree depth, the number of
+subordinate clauses and coordinated conjuncts, and the mean branching factor of each sentence.
+
+Word Frequency: Complexity measured by how rare the words are in the corpus, as the average log frequency rank of each
+word in the lexicon of lexicon.py
 
 Also included:
 Standardizers for each scoring system. Each returns a value measured on a different scale,
@@ -21,8 +27,39 @@ Copyright and Usage Information
 This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
 """
 import csv
-from data_processing import TextBlock, Sentence
+import math
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+from data_processing import TextBlock, Sentence, MetricCache, sentence_pool, corpus_vocabulary
 import create_tree as ct
+import standardization as std
+import lexicon
+
+
+# Per-sentence caches: a sentence repeated across the corpus (or scored again and again by the interactive scorer)
+# is only counted or parsed once. See cache_stats for how often they are reused. They can be shared by threads (see
+# evaluation.score_corpus with threads=True) without a lock.
+unfamiliar_cache = MetricCache()
+count_cache = MetricCache()
+mdd_cache = MetricCache()
+syntax_cache = MetricCache()
+frequency_cache = MetricCache()
+
+DALE_CHALL_FILE = "data/Dale_Chall_Familiar_Words"
+# the familiar word list read from each file by dale_chall_word_list, so every block is scored with the same set
+_word_lists: dict[str, set[str]] = {}
+
+
+def cache_stats() -> dict[str, dict[str, float]]:
+    """Return the dedup statistics of the sentence pool that read_csv interns phrases in, and of every per-sentence
+    cache.
+    """
+    return {'sentences': sentence_pool.stats(), 'dale_chall': unfamiliar_cache.stats(),
+            'counts': count_cache.stats(), 'mdd': mdd_cache.stats(), 'syntax': syntax_cache.stats(),
+            'word_frequency': frequency_cache.stats()}
 
 
 # DALE_CHALL IMPLEMENTATION (complexity, unfamiliar words list initializer, and score standardizer)
@@ -43,40 +80,71 @@ def dale_chall_complexity(text: TextBlock) -> float:
 
     Adjusted Score = Reading Grade of a reader who can comprehend your text at 4th grade or above.
     """
-    PDW_per_sentence = []
     num_diff_words = 0
 
-    word_list = dale_chall_word_list("data/Dale_Chall_Familiar_Words")
+    word_list = dale_chall_word_list()
+    num_words = 0
     for sentence in text.excerpt:
-        # calculate percentage of difficult words
-        words = sentence.sentence_to_list()
-        num_unfamiliar = 0
-        for word in words:
-            if word not in word_list:
-                num_unfamiliar += 1
-
-        # sentence num_unfamiliar percentage:
-        PDW_per_sentence.append(num_unfamiliar / len(words))
+        # count the difficult (unfamiliar) words
+        sentence_words, num_unfamiliar = unfamiliar_cache.get(sentence.phrase, count_unfamiliar, sentence, word_list)
         num_diff_words += num_unfamiliar
+        num_words += sentence_words
 
-    # calculate average sentence length
-    num_words = sum(len(sent.sentence_to_list()) for sent in text.excerpt)
+    # calculate average sentence length, and the percentage of difficult words
     ASL = num_words / len(text.excerpt)
-    PDW = num_diff_words / num_words
+    PDW = num_diff_words / num_words * 100
 
     # Calculate Score
     score = 0.1579 * (PDW) + 0.0496 * ASL
 
-    if PDW > 0.05:
+    if PDW > 5:
         score += 3.6365
 
     return score
 
 
-def dale_chall_word_list(csv_file: str) -> set[str]:
+def dale_chall_corpus(text_blocks: list[TextBlock], word_list: set[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Return the raw and adjusted Dale-Chall scores of every block in text_blocks, computed for all of them at once.
+
+    The adjusted scores are the same as dale_chall_complexity gives block by block. The familiar flags of the
+    vocabulary (see familiar_words) then classify every token of the corpus in one vectorized step.
+    """
+    ids = [sentence.token_ids for block in text_blocks for sentence in block.excerpt]
+    block_ends = np.cumsum([sum(len(sentence.token_ids) for sentence in block.excerpt) for block in text_blocks])
+    familiar = familiar_words(word_list)
+
+    # the number of difficult words up to each token, so the count for a block is a difference of two entries
+    difficult_so_far = np.concatenate([[0], np.cumsum(~familiar[np.concatenate(ids or [np.empty(0, np.int32)])])])
+    ends = np.array(block_ends, dtype=np.int64)
+    starts = np.concatenate([[0], ends[:-1]])
+    num_words = ends - starts
+    num_sentences = np.array([len(block.excerpt) for block in text_blocks])
+
+    pdw = (difficult_so_far[ends] - difficult_so_far[starts]) / num_words * 100
+    raw = 0.1579 * pdw + 0.0496 * num_words / num_sentences
+    return raw, np.where(pdw > 5, raw + 3.6365, raw)
+
+
+def count_unfamiliar(sentence: Sentence, word_list: set[str]) -> tuple[int, int]:
+    """Return the number of words in sentence, and how many of them are not in word_list."""
+    ids = sentence.token_ids
+    return len(ids), len(ids) - int(familiar_words(word_list)[ids].sum())
+
+
+def familiar_words(word_list: set[str]) -> np.ndarray:
+    """Return whether every word of corpus_vocabulary is in word_list, indexed by word id."""
+    return corpus_vocabulary.column('familiar', lambda words: [word in word_list for word in words], bool, word_list)
+
+
+def dale_chall_word_list(csv_file: str = DALE_CHALL_FILE) -> set[str]:
     """
     Given a text file containing all the Dale Chall familiar words, return a set of those words.
+
+    The file is only read the first time, and the same set is returned every time after that (so it must not be
+    changed), which also lets familiar_words recognize it without comparing its words.
     """
+    if csv_file in _word_lists:
+        return _word_lists[csv_file]
     with open(csv_file) as csv_fle:
         reader = csv.reader(csv_fle)
         headers = next(reader)
@@ -86,11 +154,13 @@ def dale_chall_word_list(csv_file: str) -> set[str]:
             # add to word_set
             word_set.add(str(row[0]))
 
-    return word_set
+    # if two threads read the file at once, both keep the set stored first
+    return _word_lists.setdefault(csv_file, word_set)
 
 
 def standardized_dale_chall(dc_score: float) -> float:
-    """Standardizes DC score using the following metric, note the end points are exclusive:
+    """Standardizes DC score (as dale_chall_complexity gives it) using the following metric, note the end points are
+    exclusive:
 
     DC Score Scale:
     4.9 and Below	Grade 4 and Below
@@ -101,45 +171,26 @@ def standardized_dale_chall(dc_score: float) -> float:
     9.0 to 9.9	    Grades 13 - 15 (College)
     10 and Above	Grades 16 and Above (College Graduate)
 
-    Adjusted to 1.0 Scale:
-    0 - 0.2         Grade 4 and Below
-    0.2 - 0.45      Grades 5 - 6
-    0.45 - 0.65     Grades 7-8
-    0.65 - 0.8      Grades 9 - 10
-    0.8 - 0.9       Grades 11 - 12
-    0.9 - 1.0       Grades 13 - 15 (College)
-    1.0 +           Grades 16 and Above (College Graduate)
-
+    Each band is split evenly between its grades:
+    5.0 - 5.5       Grade 5
+    5.5 - 6.0       Grade 6
+    6.0 - 6.5       Grade 7
+    6.5 - 7.0       Grade 8
+    7.0 - 7.5       Grade 9
+    7.5 - 8.0       Grade 10
+    8.0 - 8.5       Grade 11
+    8.5 - 9.0       Grade 12
+    9.0 - 9.34      Grade 13
+    9.34 - 9.67     Grade 14
+    9.67 - 10       Grade 15
+
+    >>> standardized_dale_chall(6.57), standardized_dale_chall(7.78)
+    (8, 10)
     """
-    if dc_score >= 1:
-        return 16
-    elif 0.97 <= dc_score < 1:
-        return 15
-    elif 0.93 <= dc_score < 0.97:
-        return 14
-    elif 0.90 <= dc_score < 0.93:
-        return 13
-    elif 0.85 <= dc_score < 0.90:
-        return 12
-    elif 0.8 <= dc_score < 0.85:
-        return 11
-    elif 0.75 <= dc_score < 0.8:
-        return 10
-    elif 0.65 <= dc_score < 0.75:
-        return 9
-    elif 0.55 <= dc_score < 0.65:
-        return 8
-    elif 0.45 <= dc_score < 0.55:
-        return 7
-    elif 0.30 <= dc_score < 0.45:
-        return 6
-    elif 0.2 <= dc_score < 0.3:
-        return 5
-    else:
-        return 4
-
-
-# FLESCH READING EASE SCORE IMPLEMENTATION (complexity, syllable counter, standardizer)
+    return std.standardize('dale_chall_revised', dc_score)
+
+
+# FLESCH READING EASE SCORE IMPLEMENTATION (complexity, grade level, syllable counter, standardizer)
 def flesch_complexity_score(text: TextBlock) -> float:
     """
     Return the Flesch Reading Ease Readability Formula
@@ -151,23 +202,99 @@ def flesch_complexity_score(text: TextBlock) -> float:
 
     ASW = Average number of syllables per word (i.e., the number of syllables divided by the number of words)
     """
-    # compute average num of syllables per word.
-    average_num_syllables = 0
-    num_words = 0
+    return flesch_reading_ease(block_counts(text))
+
+
+def flesch_kincaid_grade_level(text: TextBlock) -> float:
+    """
+    Return the Flesch-Kincaid Grade Level
+    FKGL = (0.39 x ASL) + (11.8 x ASW) - 15.59
+
+    with ASL and ASW as in flesch_complexity_score. The result is a US school grade level.
+    """
+    return flesch_kincaid_grade(block_counts(text))
+
+
+# COUNT-BASED FORMULAS
+# Every formula below is arithmetic on the same counts, which are taken in a single pass over the words of each
+# sentence (count_sentence, cached per sentence in count_cache), so adding a formula never tokenizes the text again.
+# The counts can be a dict of ints (one block, see block_counts) or of arrays (every block, see corpus_counts).
+COUNTS = ('words', 'sentences', 'syllables', 'polysyllables', 'characters')
+
+
+def count_sentence(sentence: Sentence) -> tuple[int, int, int, int]:
+    """Return the number of words in sentence, their total number of syllables, the number of words with three or more
+    syllables, and their total number of characters (punctuation is removed by Sentence.sentence_to_list).
+    """
+    ids = sentence.token_ids
+    syllables = corpus_vocabulary.column('syllables', lambda words: list(map(num_syllables, words)), np.int32)[ids]
+    characters = corpus_vocabulary.column('characters', lambda words: list(map(len, words)), np.int32)[ids]
+    return len(ids), int(syllables.sum()), int((syllables >= 3).sum()), int(characters.sum())
+
+
+def block_counts(text: TextBlock) -> dict[str, int]:
+    """Return the counts of text, a mapping from every name in COUNTS to its total over the sentences of text."""
+    totals = [0, 0, 0, 0]
     for sentence in text.excerpt:
-        sentence_cleaned = sentence.sentence_to_list()
-        average_num_syllables += sum(num_syllables(word) for word in sentence_cleaned)
-        num_words += len(sentence_cleaned)
+        for i, count in enumerate(count_cache.get(sentence.phrase, count_sentence, sentence)):
+            totals[i] += count
+    return {'words': totals[0], 'sentences': len(text.excerpt), 'syllables': totals[1], 'polysyllables': totals[2],
+            'characters': totals[3]}
 
-    ASW = average_num_syllables / num_words
 
-    # calculate average sentence length
-    num_words = sum(len(sent.sentence_to_list()) for sent in text.excerpt)
-    ASL = num_words / len(text.excerpt)
+def corpus_counts(text_blocks: list[TextBlock]) -> dict[str, np.ndarray]:
+    """Return the counts of every block in text_blocks, as a mapping from every name in COUNTS to an array with the
+    count of each block.
+    """
+    counts = [block_counts(block) for block in text_blocks]
+    return {name: np.array([block[name] for block in counts], dtype=float) for name in COUNTS}
+
+
+def flesch_reading_ease(counts: dict) -> Any:
+    """Return the Flesch Reading Ease from counts (see flesch_complexity_score)."""
+    ASL = counts['words'] / counts['sentences']
+    ASW = counts['syllables'] / counts['words']
+    return 206.835 - 1.015 * ASL - 84.6 * ASW
+
+
+def flesch_kincaid_grade(counts: dict) -> Any:
+    """Return the Flesch-Kincaid Grade Level from counts (see flesch_kincaid_grade_level)."""
+    return 0.39 * counts['words'] / counts['sentences'] + 11.8 * counts['syllables'] / counts['words'] - 15.59
+
+
+def smog_grade(counts: dict) -> Any:
+    """Return the SMOG grade from counts:
+    SMOG = 1.0430 x sqrt(polysyllables x 30 / sentences) + 3.1291
+
+    where polysyllables is the number of words with three or more syllables.
+    """
+    return 1.0430 * np.sqrt(counts['polysyllables'] * 30 / counts['sentences']) + 3.1291
+
+
+def coleman_liau_index(counts: dict) -> Any:
+    """Return the Coleman-Liau index from counts:
+    CLI = (0.0588 x L) - (0.296 x S) - 15.8
+
+    where L is the average number of characters per 100 words, and S the average number of sentences per 100 words.
+    """
+    L = counts['characters'] / counts['words'] * 100
+    S = counts['sentences'] / counts['words'] * 100
+    return 0.0588 * L - 0.296 * S - 15.8
+
 
-    reading_ease = 206.835 - 1.015 * ASL - 84.6 * ASW
+COUNT_FORMULAS = {'flesch_reading_ease': flesch_reading_ease, 'flesch_kincaid_grade': flesch_kincaid_grade,
+                  'smog': smog_grade, 'coleman_liau': coleman_liau_index}
 
-    return reading_ease
+
+def count_formula_scores(text_blocks: list[TextBlock], formulas: Optional[list[str]] = None) -> dict[str, np.ndarray]:
+    """Return the score of every block in text_blocks for each of the given formulas (all of COUNT_FORMULAS by
+    default), all computed from one set of corpus_counts.
+
+    Preconditions:
+        - formulas is None or all(formula in COUNT_FORMULAS for formula in formulas)
+    """
+    counts = corpus_counts(text_blocks)
+    return {formula: COUNT_FORMULAS[formula](counts) for formula in (formulas or COUNT_FORMULAS)}
 
 
 def num_syllables(word: str) -> int:
@@ -212,36 +339,64 @@ def standardized_flesch_ease(fe_score: float) -> int:
     30 - 50:  Grades 13 - 15 (College)
     0 - 30:   Grades 16 and Above (College Graduate)
     """
-    if fe_score >= 90:
-        return 5
-    elif 80 <= fe_score < 90:
-        return 6
-    elif 70 <= fe_score < 80:
-        return 7
-    elif 65 <= fe_score < 70:
-        return 8
-    elif 60 <= fe_score < 65:
-        return 9
-    elif 57 <= fe_score < 60:
-        return 10
-    elif 54 <= fe_score < 57:
-        return 11
-    elif 50 <= fe_score < 54:
-        return 12
-    elif 45 <= fe_score < 50:
-        return 13
-    elif 35 <= fe_score < 45:
-        return 14
-    elif 30 <= fe_score < 35:
-        return 15
-    else:
-        return 16
-
-
-# Dependency Distance Scoring (Text-block implementation, sentence scoring, dependency (tree parsing), flatten helper)
+    return std.standardize('flesch', fe_score)
+
+
+# WORD FREQUENCY IMPLEMENTATION (complexity, lexicon loader)
+
+# the lexicon of the corpus, loaded (or built and saved, the first time) by load_word_lexicon on first use
+word_lexicon: Optional[lexicon.Lexicon] = None
+# held only while word_lexicon is loaded, so that threads scoring at the same time load it once
+_lexicon_lock = threading.Lock()
+
+
+def load_word_lexicon() -> lexicon.Lexicon:
+    """Return the word frequency lexicon, loading it from data/ the first time it is needed."""
+    global word_lexicon
+    if word_lexicon is None:
+        with _lexicon_lock:
+            if word_lexicon is None:
+                word_lexicon = lexicon.load_or_build_lexicon()
+    return word_lexicon
+
+
+def word_frequency_complexity(text: TextBlock) -> float:
+    """
+    Return the average log2 frequency rank of the words of text in the corpus lexicon.
+
+    The most common word in the corpus has rank 1 (a log rank of 0), and words that are not in the lexicon are ranked
+    after the rarest word, so a higher score means rarer, harder words. Unlike Dale-Chall, which only sorts words into
+    familiar and unfamiliar, every word contributes according to how rare it is.
+    """
+    num_words = 0
+    total_log_rank = 0.0
+    for sentence in text.excerpt:
+        sentence_words, sentence_log_rank = frequency_cache.get(sentence.phrase, sum_log_ranks, sentence,
+                                                                load_word_lexicon())
+        num_words += sentence_words
+        total_log_rank += sentence_log_rank
+    return total_log_rank / num_words
+
+
+def sum_log_ranks(sentence: Sentence, word_lexicon_: lexicon.Lexicon) -> tuple[int, float]:
+    """Return the number of (non-empty) words in sentence, and the sum of their log2 frequency ranks."""
+    # empty words (left by punctuation between spaces) are given rank 0, and are not counted
+    ranks = corpus_vocabulary.column('frequency_rank', lambda words: _ranks(words, word_lexicon_), np.int64,
+                                     word_lexicon_)[sentence.token_ids]
+    ranks = ranks[ranks > 0]
+    return len(ranks), float(np.log2(ranks).sum())
+
+
+def _ranks(words: list[str], word_lexicon_: lexicon.Lexicon) -> list[int]:
+    """Return the frequency rank of every word in word_lexicon_, or 0 for an empty word."""
+    ranks = iter(word_lexicon_.lookup([word for word in words if word != '']))
+    return [next(ranks) if word != '' else 0 for word in words]
+
+
+# Dependency Distance Scoring (Text-block implementation, sentence scoring, distances on the integer-encoded parse)
 
 # Note that this uses the NLTK & Spacy Implementations in create_tree
-# to tokenize words and create the tree for each sentence
+# to tokenize words and create the tree for each sentence (or the heuristic parser, see create_tree.use_backend)
 
 
 def mean_dependency_distance(text_block: TextBlock, user_input: bool) -> float:
@@ -251,17 +406,103 @@ def mean_dependency_distance(text_block: TextBlock, user_input: bool) -> float:
     Notes on how MDD is determined in function mean_dependency_distance_sentence()
 
     If this function is being used to generate the mean_dependency_distance of a user input, it acts on only one
-    sentence at a time, and so num_sentences is set to 1.
+    sentence at a time, and so num_sentences is set to 1. Otherwise it is the number of sentences of the excerpt
+    (len(text_block.excerpt), since text_block.sentence_count holds the number of characters of the excerpt).
+
+    This is the aggregate of mdd_breakdown(text_block, user_input), for callers that only want the one number.
     """
-    mdd_lists = []
-    for sentence in text_block.excerpt:
-        mdd_lists.append(mean_dependency_distance_sentence(sentence))
+    return MDDBreakdown(text_block, user_input).aggregate
+
 
-    if user_input:
-        num_sentences = 1
-    else:
-        num_sentences = text_block.sentence_count
-    return sum(mdd_lists) / num_sentences
+class MDDBreakdown:
+    """
+    The MDD of a text block, broken down by sentence and by dependency link, each part computed only when it is first
+    used and then kept.
+
+    The aggregate only needs the MDD of every sentence, which comes from mdd_cache when the sentence was scored
+    before, exactly as mean_dependency_distance does. A sentence is parsed at most once by a breakdown: its parse is
+    kept the first time it is needed (for its MDD or for its links), and reused by the other.
+
+    Instance Attributes:
+    - text_block: the text block broken down
+    - user_input: whether the aggregate is for a user input (see mean_dependency_distance)
+
+    >>> import create_tree
+    >>> _ = create_tree.use_backend('heuristic')
+    >>> breakdown = mdd_breakdown(TextBlock([Sentence('The girl ate an apple.', None, None, None)], None, None, None,
+    ...                                     None, None, None, None, None, None, None), True)
+    >>> breakdown.aggregate, breakdown.links(0)
+    (1.25, [('The', 'girl', 1), ('girl', 'ate', 1), ('an', 'apple', 1), ('apple', 'ate', 2)])
+    """
+    text_block: TextBlock
+    user_input: bool
+    _sentence_mdds: dict[int, float]
+    _parses: dict[int, ct.DependencyParse]
+    _links: dict[int, list[tuple[str, str, int]]]
+
+    def __init__(self, text_block: TextBlock, user_input: bool = False) -> None:
+        """Initialize the breakdown of text_block, with nothing computed yet."""
+        self.text_block = text_block
+        self.user_input = user_input
+        self._sentence_mdds = {}
+        self._parses = {}
+        self._links = {}
+
+    @property
+    def aggregate(self) -> float:
+        """The MDD of the whole text block, as mean_dependency_distance gives it."""
+        total = sum(self.sentence_mdd(i) for i in range(len(self.text_block.excerpt)))
+        return total / (1 if self.user_input else len(self.text_block.excerpt))
+
+    def sentence_mdd(self, i: int) -> float:
+        """Return the MDD of the ith sentence of the text block (see mean_dependency_distance_sentence), raising
+        ZeroDivisionError if it has a single word.
+        """
+        if i not in self._sentence_mdds:
+            sentence = self.text_block.excerpt[i]
+            key = mdd_cache_key(sentence)
+            if key in mdd_cache.values:
+                self._sentence_mdds[i] = mean_dependency_distance_sentence(sentence)
+            else:
+                self._sentence_mdds[i] = mdd_cache.get(key, _mdd_of_parse, self.parse(i), sentence)
+        return self._sentence_mdds[i]
+
+    @property
+    def sentence_mdds(self) -> list[float]:
+        """The MDD of every sentence of the text block, in order, nan where it cannot be computed."""
+        mdds = []
+        for i in range(len(self.text_block.excerpt)):
+            try:
+                mdds.append(self.sentence_mdd(i))
+            except ZeroDivisionError:
+                mdds.append(float('nan'))
+        return mdds
+
+    def hardest_sentences(self, n: int = 1) -> list[tuple[int, float]]:
+        """Return the (position, MDD) of the n sentences with the highest MDD, hardest first."""
+        scored = [(i, mdd) for i, mdd in enumerate(self.sentence_mdds) if not math.isnan(mdd)]
+        return sorted(scored, key=lambda pair: pair[1], reverse=True)[:n]
+
+    def parse(self, i: int) -> ct.DependencyParse:
+        """Return the parse of the ith sentence of the text block, parsing it the first time."""
+        if i not in self._parses:
+            sentence = self.text_block.excerpt[i]
+            self._parses[i] = ct.dependency_parse(sentence.normalized_phrase)
+            syntax_cache.get(mdd_cache_key(sentence), syntactic_metrics, self._parses[i])
+        return self._parses[i]
+
+    def links(self, i: int) -> list[tuple[str, str, int]]:
+        """Return the (dependent, head, distance) of every dependency link of the ith sentence that counts towards its
+        MDD, in sentence order (see dependency_links).
+        """
+        if i not in self._links:
+            self._links[i] = dependency_links(self.parse(i))
+        return self._links[i]
+
+
+def mdd_breakdown(text_block: TextBlock, user_input: bool = False) -> MDDBreakdown:
+    """Return the lazy MDD breakdown of text_block (see MDDBreakdown)."""
+    return MDDBreakdown(text_block, user_input)
 
 
 def mean_dependency_distance_sentence(sentence: Sentence) -> float:
@@ -284,82 +525,123 @@ def mean_dependency_distance_sentence(sentence: Sentence) -> float:
         an: 1 (dependent of apple, dist 1)
         apple: 2 (dependent of ate, distance 2)
     """
-    # Generally: this function calculates the distance between each word and its dependent in the sentence,
-    # by traversing through the tree.
-    # to calculate MDD, we begin with creating a dependency tree.
-    sentence.phrase = sentence.phrase.strip()
-    sentence.phrase = sentence.phrase.replace('\\', '')
-    tree = ct.nltk_spacy_tree(sentence.phrase, False)
-    # tree.pretty_print()
-
-    # Then, for each word in the tree, which we refer to as the ith word based on sentence position
-    # we need to get, for every subtree, the distance between root and children if there is only one child.
-    dependents = get_dependents(tree)
-    dependents = flatten(dependents)
-    # we can now take every pair to get their distances, by finding their position in the sentence.
-    # Since dependency tree is formed left to right, going from i =0  to i = len(sentence) - 1
-    # # will maintain the order in case of duplicates
-    distances = []
-    for i in range(1, len(dependents) - 1, 2):
-        # find position of each word in each sentence
-        distances.append(abs(sentence.get_position_word(dependents[i])
-                             - sentence.get_position_word(dependents[i - 1])))
-
-    # lastly, summ all DDs and divide by num of words in sentence
-    return sum(distances) * 1 / (sentence.word_count - 1)
-
-
-def get_dependents(tree: ct.nltk.tree) -> list[list[ct.nltk.tree]] | None:
-    """Get dependents in pairs
-
-    Note that the NLTK built-in methods for ct.nltk.tree in this function add the following conditions:
-    tree.subtrees() returns ALL the constituent trees, this includes the subtrees of its subtrees (and so on).
-    It does not return ANY leaves, even those which are direct children of the tree's root.
-    It also returns itself as one of the listed subtrees.
-
-    tree.leaves() returns ALL the leaves across the full tree, ie all the descendants which are leaves
-
-    tree.label() is analogous to the in-class tree._root, and returns the root value of the tree
+    # the sentence is parsed as its normalized_phrase (stripped, without backslashes), which is prepared when the
+    # corpus is loaded, so the sentence itself is never changed here (see MDDBreakdown for a block, keeping its parses)
+    return mdd_cache.get(mdd_cache_key(sentence), _parse_mean_dependency_distance, sentence)
+
+
+def mdd_cache_key(sentence: Sentence) -> tuple[str, str, int]:
+    """Return the key of sentence in mdd_cache.
+
+    The MDD of a sentence only depends on the parser, the normalized phrase and the word count (which is taken from
+    the phrase before it is normalized), so identical sentences share a key and are only parsed once.
     """
-    # Then, for each word in the tree, which we refer to as the ith word based on sentence position,
-    tree_root = tree.label()
-    dependents = []
-
-    # we need to get, for every subtree, the distance between root and children if there is a direct child leaf.
-    # If the tree has leaves, cycle through the leaves in its subtrees, and collect all the leaves that are not also
-    # leaves of its subtrees (these are the ones which are direct children of the root
-
-    if len(tree.leaves()) >= 1:
-        for leaf in tree.leaves():
-            subtrees_sans_original = [sub for sub in tree.subtrees() if sub.label() != tree_root]
-            direct_leaf_condition = not any(leaf in sub.leaves() for sub in subtrees_sans_original)
-            if direct_leaf_condition:
-                dependents.append([tree_root, leaf])
-
-    # Iterate through all subtrees (note that leaves are not included here), and if the subtree is not itself,
-    # store the subtree's root and this tree's root in list of dependents
-    # Recurse into the subtree to collect all the parent-child pairs inside
-    for subtree in tree.subtrees():
-        if subtree.label() != tree_root:
-            # create a pair with root and every child, confirm that the subtree is a direct child of tree
-            subtree_direct_child_of_tree_root = (subtree.height() == tree.height() - 1)
-            if subtree_direct_child_of_tree_root:
-                dependents.append([subtree.label(), tree_root])
-            dependents.append(get_dependents(subtree))
-
-    return dependents
-
-
-def flatten(nested_list: str | list) -> list:
-    """Mutate the given unnested list variable to store the items of the given nested list, unnested.
+    return ct.get_backend().name, sentence.normalized_phrase, sentence.word_count
+
+
+def _parse_mean_dependency_distance(sentence: Sentence) -> float:
+    """Parse the normalized sentence and return its MDD, as described in mean_dependency_distance_sentence."""
+    # the syntactic metrics of the same parse are stored on the way, so they never need a parse of their own
+    parse = ct.dependency_parse(sentence.normalized_phrase)
+    syntax_cache.get(mdd_cache_key(sentence), syntactic_metrics, parse)
+    # parse.to_nltk_tree().pretty_print()
+    return _mdd_of_parse(parse, sentence)
+
+
+def _mdd_of_parse(parse: ct.DependencyParse, sentence: Sentence) -> float:
+    """Return the MDD of sentence from its parse."""
+    # sum all DDs and divide by num of words in sentence
+    return int(_link_distances(parse)[2].sum()) / (sentence.word_count - 1)
+
+
+def _link_distances(parse: ct.DependencyParse) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the token index of the dependent and of the head of every link of parse between two words, and their
+    distance in words.
     """
-    if isinstance(nested_list, str):
-        return [nested_list]
-    else:
-        unnested = []
-        for sublist in nested_list:
-            unnested.extend(flatten(sublist))
-    return unnested
+    positions = np.cumsum(parse.is_word) - 1
+    dependents = np.flatnonzero(parse.is_word & (parse.heads >= 0))
+    dependents = dependents[parse.is_word[parse.heads[dependents]]]
+    heads = parse.heads[dependents]
+    return dependents, heads, np.abs(positions[dependents] - positions[heads])
+
+
+def dependency_distance_sum(parse: ct.DependencyParse) -> int:
+    """Return the sum of the dependency distances of every word of parse from its head.
+
+    Distances are counted in words, as Sentence.sentence_to_list splits them, so punctuation tokens (and their links)
+    are left out. Every token is compared with its own head by index, so repeated words are never confused.
+
+    >>> parse = ct.encode_parse(ct.heuristic_parser.parse('The girl ate an apple.')[2])
+    >>> dependency_distance_sum(parse)
+    5
+    """
+    return int(_link_distances(parse)[2].sum())
+
+
+def dependency_links(parse: ct.DependencyParse) -> list[tuple[str, str, int]]:
+    """Return the (dependent, head, distance) of every link of parse between two words, in the order of the
+    dependents, with distances counted as in dependency_distance_sum.
+    """
+    dependents, heads, distances = _link_distances(parse)
+    return [(parse.words[dependent], parse.words[head], distance)
+            for dependent, head, distance in zip(dependents.tolist(), heads.tolist(), distances.tolist())]
+
+
+# Syntactic complexity beyond MDD: subordination, coordination and phrasal complexity, read from the same parse
+CLAUSE_LABELS = {'advcl', 'ccomp', 'relcl', 'acl', 'xcomp', 'csubj', 'csubjpass'}
+COORDINATION_LABELS = {'conj'}
+SYNTAX_METRICS = ('tree_depth', 'clauses', 'coordinations', 'mean_branching')
+# the ids of the labels above in ct.DEP_LABELS, which syntactic_metrics compares the deps of a parse with
+CLAUSE_IDS = sorted(ct.DEP_LABELS.ids_of(CLAUSE_LABELS))
+COORDINATION_IDS = sorted(ct.DEP_LABELS.ids_of(COORDINATION_LABELS))
+
+
+def syntactic_metrics(parse: ct.DependencyParse) -> dict[str, float]:
+    """Return the syntactic metrics of parse, all computed on its arrays:
+        - tree_depth: the number of tokens on the longest path down from the root (1 for a single word)
+        - clauses: the number of subordinate clauses (tokens whose dep_ is in CLAUSE_LABELS)
+        - coordinations: the number of coordinated conjuncts (tokens whose dep_ is in COORDINATION_LABELS)
+        - mean_branching: the mean number of children of the tokens that have any (0 for a single word)
+
+    >>> parse = ct.encode_parse(ct.heuristic_parser.parse('The girl ate an apple')[2])
+    >>> syntactic_metrics(parse)
+    {'tree_depth': 3, 'clauses': 0, 'coordinations': 0, 'mean_branching': 1.3333333333333333}
+    """
+    heads = parse.heads
+    # the level of every token is one more than the number of its ancestors, found by following all heads at once
+    levels = np.ones(len(heads), dtype=np.int32)
+    ancestors = heads.copy()
+    while (ancestors >= 0).any():
+        has_ancestor = ancestors >= 0
+        levels += has_ancestor
+        ancestors[has_ancestor] = heads[ancestors[has_ancestor]]
+    num_children = np.bincount(heads[heads >= 0], minlength=len(heads))
+    parents = int((num_children > 0).sum())
+    return {'tree_depth': int(levels.max()),
+            'clauses': int(np.isin(parse.deps, CLAUSE_IDS).sum()),
+            'coordinations': int(np.isin(parse.deps, COORDINATION_IDS).sum()),
+            'mean_branching': (len(heads) - 1) / parents if parents else 0.0}
+
+
+def syntactic_complexity_sentence(sentence: Sentence) -> dict[str, float]:
+    """Return the syntactic metrics of sentence (see syntactic_metrics).
+
+    They are stored whenever the MDD of the sentence is computed, so the sentence is only parsed here if its MDD was
+    never computed with the current parser in this process.
+    """
+    return syntax_cache.get(mdd_cache_key(sentence), _parse_syntactic_metrics, sentence)
+
+
+def _parse_syntactic_metrics(sentence: Sentence) -> dict[str, float]:
+    """Parse the normalized sentence and return its syntactic metrics."""
+    return syntactic_metrics(ct.dependency_parse(sentence.normalized_phrase))
+
+
+def syntactic_complexity(text_block: TextBlock) -> dict[str, float]:
+    """Return the mean of every syntactic metric over the sentences of text_block."""
+    metrics = [syntactic_complexity_sentence(sentence) for sentence in text_block.excerpt]
+    return {name: sum(sentence_metrics[name] for sentence_metrics in metrics) / len(metrics)
+            for name in SYNTAX_METRICS}
 
 
 def standardized_syntax_score(syn_score: float) -> int:
@@ -376,34 +658,7 @@ def standardized_syntax_score(syn_score: float) -> int:
     4+:  Multiple Nested Clauses (Graduate Level; these are very rare and convoluted sentences)
 
     """
-    if syn_score < 1:
-        return 4
-    elif 1 <= syn_score < 1.5:
-        return 5
-    elif 1.5 <= syn_score < 2:
-        return 6
-    elif 2 <= syn_score < 2.5:
-        return 7
-    elif 2.5 <= syn_score < 2.7:
-        return 8
-    elif 2.7 <= syn_score < 3:
-        return 9
-    elif 3 <= syn_score < 3.2:
-        return 10
-    elif 3.2 <= syn_score < 3.4:
-        return 11
-    elif 3.4 <= syn_score < 3.5:
-        return 12
-    elif 3.5 <= syn_score < 3.7:
-        return 12
-    elif 3.7 <= syn_score < 3.8:
-        return 13
-    elif 3.8 <= syn_score < 3.9:
-        return 14
-    elif 3.9 <= syn_score < 4:
-        return 15
-    else:
-        return 16
+    return std.standardize('mdd', syn_score)
 
 
 if __name__ == '__main__':
@@ -417,6 +672,7 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'max-line-length': 120,
-        'extra-imports': ["data_processing", "Sentence", "csv", "create_tree"],  # the names (strs) of imported modules
+        'extra-imports': ["data_processing", "Sentence", "csv", "math", "threading", "typing", "numpy", "create_tree",
+                          "standardization", "lexicon"],  # the names (strs) of imported modules
         'allowed-io': ["dale_chall_word_list"]
     })
@@ -0,0 +1,243 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains a precomputed index over the TextBlocks of the corpus, to answer queries like
+"all Lit excerpts from the start of a book with Flesch 80-90 and MDD < 2" without scanning every block in Python.
+
+    - Every metadata attribute (category, location, author) has one bitmap (a boolean array over all blocks) per value.
+    - Every score (the stored carec_m, flesch_reading, dale_chall and pub_year, plus any computed scores, such as the
+      output of evaluation.score_corpus) is kept as a sorted array of values with the block positions in that order.
+
+A range query binary searches the sorted array for its bounds and marks the matching positions in a bitmap, and the
+bitmaps of every condition are combined with a bitwise and. On the full corpus, a query takes microseconds
+(see benchmark_query).
+
+The index can be updated in place as blocks are added, replaced or removed (see incremental.py): sorted arrays are
+updated with a binary search insertion, and removed blocks are cleared from a bitmap of live blocks.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import time
+from typing import Optional
+
+import numpy as np
+
+from data_processing import TextBlock, read_csv
+
+METADATA = ('category', 'location', 'author')
+STORED_SCORES = ('carec_m', 'flesch_reading', 'dale_chall', 'pub_year')
+
+
+class CorpusIndex:
+    """
+    A searchable index over a list of TextBlocks, by metadata and by score ranges.
+
+    Instance Attributes:
+    - text_blocks: the indexed blocks, in their original order
+    - bitmaps: maps a metadata attribute to a mapping from each of its values to the bitmap of blocks with that value
+    - sorted_values: maps a score name to its values over all blocks, sorted (nan values are left out)
+    - sorted_positions: maps a score name to the positions in text_blocks of the values in sorted_values
+    - live: the bitmap of blocks that have not been removed
+
+    Representation Invariants:
+    - all(len(bitmap) == len(self.text_blocks) for values in self.bitmaps.values() for bitmap in values.values())
+    - self.sorted_values.keys() == self.sorted_positions.keys()
+    - len(self.live) == len(self.text_blocks)
+    """
+    text_blocks: list[Optional[TextBlock]]
+    live: np.ndarray
+    bitmaps: dict[str, dict[str, np.ndarray]]
+    sorted_values: dict[str, np.ndarray]
+    sorted_positions: dict[str, np.ndarray]
+
+    def __init__(self, text_blocks: list[TextBlock], computed: Optional[dict[str, np.ndarray]] = None) -> None:
+        """Build the index of text_blocks.
+
+        computed maps the name of any extra score (for example 'mdd') to its value for every block, in the order of
+        text_blocks. Use nan for blocks where the score is unknown; they never match a range on that score.
+        """
+        self.text_blocks = list(text_blocks)
+        self.live = np.ones(len(text_blocks), dtype=bool)
+        self.bitmaps = {}
+        self.sorted_values = {}
+        self.sorted_positions = {}
+
+        for attribute in METADATA:
+            values = np.array([str(getattr(block, attribute)) for block in text_blocks])
+            self.bitmaps[attribute] = {value: values == value for value in np.unique(values)}
+
+        for score in STORED_SCORES:
+            self.add_score(score, np.array([_stored_score(block, score) for block in text_blocks]))
+        for score, values in (computed or {}).items():
+            self.add_score(score, values)
+
+    def add_score(self, score: str, values: np.ndarray) -> None:
+        """Index (or re-index) a score, given its value for every block in the order of self.text_blocks.
+
+        Preconditions:
+            - len(values) == len(self.text_blocks)
+        """
+        values = np.asarray(values, dtype=float)
+        positions = np.flatnonzero(~np.isnan(values))
+        order = positions[np.argsort(values[positions], kind='stable')]
+        self.sorted_values[score] = values[order]
+        self.sorted_positions[score] = order
+
+    def range_mask(self, score: str, low: Optional[float] = None, high: Optional[float] = None) -> np.ndarray:
+        """Return the bitmap of blocks with low <= score < high. A bound of None is unbounded.
+
+        Preconditions:
+            - score in self.sorted_values
+        """
+        values = self.sorted_values[score]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='left')
+        mask = np.zeros(len(self.text_blocks), dtype=bool)
+        mask[self.sorted_positions[score][start:end]] = True
+        return mask
+
+    def query_mask(self, ranges: Optional[dict[str, tuple[Optional[float], Optional[float]]]] = None,
+                   **metadata: str) -> np.ndarray:
+        """Return the bitmap of blocks matching every condition.
+
+        ranges maps a score name to a (low, high) range, with low inclusive and high exclusive, and None for
+        unbounded. Every keyword argument is a metadata attribute that must equal the given value.
+
+        Preconditions:
+            - all(attribute in METADATA for attribute in metadata)
+        """
+        mask = self.live.copy()
+        for attribute, value in metadata.items():
+            bitmap = self.bitmaps[attribute].get(value)
+            if bitmap is None:
+                return np.zeros(len(self.text_blocks), dtype=bool)
+            mask &= bitmap
+        for score, (low, high) in (ranges or {}).items():
+            mask &= self.range_mask(score, low, high)
+        return mask
+
+    def query(self, ranges: Optional[dict[str, tuple[Optional[float], Optional[float]]]] = None,
+              **metadata: str) -> list[TextBlock]:
+        """Return the blocks matching every condition, in their original order (see query_mask for the conditions).
+
+        For example, all Lit excerpts from the start of a book with Flesch 80-90 and MDD < 2 are
+            index.query({'flesch_reading': (80, 90), 'mdd': (None, 2)}, category='Lit', location='start')
+        """
+        return [self.text_blocks[i] for i in np.flatnonzero(self.query_mask(ranges, **metadata))]
+
+    # IN PLACE UPDATES
+    def append(self, text_block: TextBlock, computed: Optional[dict[str, float]] = None) -> int:
+        """Add text_block (with the given computed scores) to the end of the index, and return its position.
+
+        Preconditions:
+            - computed is None or all(score in self.sorted_values for score in computed)
+        """
+        position = len(self.text_blocks)
+        self.text_blocks.append(text_block)
+        self.live = np.append(self.live, True)
+        for values in self.bitmaps.values():
+            for value in values:
+                values[value] = np.append(values[value], False)
+        self._index_block(position, text_block, computed)
+        return position
+
+    def replace(self, position: int, text_block: TextBlock, computed: Optional[dict[str, float]] = None) -> None:
+        """Replace the block at position with text_block (with the given computed scores).
+
+        Computed scores that are not given keep their previous value.
+        """
+        computed = dict(computed or {})
+        for score in self.sorted_values:
+            if score not in STORED_SCORES and score not in computed:
+                computed[score] = self.score_of(position, score)
+        self._unindex_block(position)
+        self.text_blocks[position] = text_block
+        self.live[position] = True
+        self._index_block(position, text_block, computed)
+
+    def remove(self, position: int) -> None:
+        """Remove the block at position from the index. Its position is not reused."""
+        self._unindex_block(position)
+        self.text_blocks[position] = None
+        self.live[position] = False
+
+    def score_of(self, position: int, score: str) -> float:
+        """Return the indexed value of score for the block at position (nan if it has none)."""
+        where = np.flatnonzero(self.sorted_positions[score] == position)
+        return float(self.sorted_values[score][where[0]]) if len(where) > 0 else float('nan')
+
+    def _index_block(self, position: int, text_block: TextBlock, computed: Optional[dict[str, float]]) -> None:
+        """Add the metadata and scores of text_block, at position, to the bitmaps and sorted arrays."""
+        for attribute, values in self.bitmaps.items():
+            value = str(getattr(text_block, attribute))
+            if value not in values:
+                values[value] = np.zeros(len(self.text_blocks), dtype=bool)
+            values[value][position] = True
+        scores = {score: _stored_score(text_block, score) for score in STORED_SCORES}
+        scores.update(computed or {})
+        for score, value in scores.items():
+            if score in self.sorted_values and not np.isnan(value):
+                insert_at = np.searchsorted(self.sorted_values[score], value, side='right')
+                self.sorted_values[score] = np.insert(self.sorted_values[score], insert_at, value)
+                self.sorted_positions[score] = np.insert(self.sorted_positions[score], insert_at, position)
+
+    def _unindex_block(self, position: int) -> None:
+        """Remove the block at position from the bitmaps and sorted arrays."""
+        for values in self.bitmaps.values():
+            for bitmap in values.values():
+                bitmap[position] = False
+        for score, positions in self.sorted_positions.items():
+            keep = positions != position
+            self.sorted_values[score] = self.sorted_values[score][keep]
+            self.sorted_positions[score] = positions[keep]
+
+
+def _stored_score(block: TextBlock, score: str) -> float:
+    """Return the stored score of block as a float, with missing values (and a pub_year of 0, unknown) as nan."""
+    value = getattr(block, score)
+    if value is None or value == '' or (score == 'pub_year' and int(value) == 0):
+        return float('nan')
+    return float(value)
+
+
+def benchmark_query(index: CorpusIndex, ranges: dict[str, tuple[Optional[float], Optional[float]]],
+                    repeats: int = 1000, **metadata: str) -> dict[str, float]:
+    """Return the number of blocks a query matches, and its mean latency over repeats runs, in microseconds, both
+    through the index and with a full Python scan of the blocks (stored scores only, skipping removed blocks). The much
+    slower scan is only repeated repeats // 100 times.
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        matches = index.query_mask(ranges, **metadata)
+    index_time = (time.perf_counter() - start) / repeats
+
+    scan_repeats = max(1, repeats // 100)
+    start = time.perf_counter()
+    for _ in range(scan_repeats):
+        scanned = [block for block in index.text_blocks if block is not None
+                   and all(str(getattr(block, attribute)) == value for attribute, value in metadata.items())
+                   and all((low is None or low <= _stored_score(block, score))
+                           and (high is None or _stored_score(block, score) < high)
+                           for score, (low, high) in ranges.items())]
+    scan_time = (time.perf_counter() - start) / scan_repeats
+
+    return {'matches': int(matches.sum()), 'scan_matches': len(scanned),
+            'index_microseconds': index_time * 1e6, 'scan_microseconds': scan_time * 1e6}
+
+
+if __name__ == '__main__':
+    corpus_index = CorpusIndex(read_csv('data/data_set_novels.csv'))
+    print(benchmark_query(corpus_index, {'flesch_reading': (80, 90), 'dale_chall': (None, 7)},
+                          category='Lit', location='start'))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["time", "typing", "numpy", "data_processing"],
+        'allowed-io': []
+    })
@@ -4,32 +4,286 @@ Instructions (READ THIS FIRST!)
 ===============================
 This file contains the implementations for the nltk implementation of creating a tree, using nlp's tokenizers
 
+Dependency trees can come from one of several parser backends (see BACKENDS), chosen per run with use_backend:
+    - 'spacy': the neural en_core_web_sm parser (the default whenever the model can be loaded)
+    - 'heuristic': the rule-based approximation in heuristic_parser, which needs no model and is much faster
+
+The complexity measures read a parse as a DependencyParse: parallel integer arrays of the head, dependency label id and
+part of speech id of every token, with the strings of the ids in the DEP_LABELS and POS_TAGS tables. An nltk tree is
+only built from it on demand, to pretty_print it while debugging.
+
 Copyright and Usage Information
 ===============================
 
 This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnimport nltk
 """
+import string
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, Optional
+
+import warnings
 import nltk
-import spacy
+import numpy as np
 from nltk import Tree
-from typing import Any
 
-spacy.cli.download("en_core_web_sm")
-nlp = spacy.load("en_core_web_sm")
+import heuristic_parser
+
+try:
+    import spacy
+except ImportError:
+    spacy = None
+
+# en_core_web_sm, loaded by load_spacy_model the first time a spaCy parse is needed
+nlp = None
+# Held only while nlp or the default backend is being set up, so that two threads needing them at the same time do
+# not both load the model. Once they exist, they are read without taking it. nlp itself is shared by every thread: a
+# parse does not change the pipeline, and spaCy releases the GIL in parts of the parser.
+_setup_lock = threading.RLock()
+
+# The pipeline components each kind of parse needs; every other component of nlp is skipped for that parse.
+# 'heads' is enough for MDD, which only reads token.head (sentence boundaries also come from the parser).
+# 'attributes' adds the tagger for token.tag_, which attr_included puts in the tree labels with token.dep_.
+# 'full' runs everything, including ner, lemmatizer and attribute_ruler.
+PIPELINES = {
+    'heads': {'tok2vec', 'parser'},
+    'attributes': {'tok2vec', 'tagger', 'parser'},
+    'full': None
+}
+
+
+def load_spacy_model() -> Any:
+    """Return the en_core_web_sm pipeline, loading it (and downloading it, if it is not installed yet) on first use.
+
+    Raises ImportError if spaCy is not installed, and OSError if the model can be neither loaded nor downloaded.
+    """
+    global nlp
+    if nlp is None:
+        with _setup_lock:
+            if nlp is None:
+                nlp = _load_en_core_web_sm()
+    return nlp
+
+
+def _load_en_core_web_sm() -> Any:
+    """Load en_core_web_sm, downloading it first if it is not installed (see load_spacy_model)."""
+    if spacy is None:
+        raise ImportError('spaCy is not installed')
+    try:
+        return spacy.load("en_core_web_sm")
+    except OSError:
+        try:
+            spacy.cli.download("en_core_web_sm")
+        except SystemExit as error:
+            raise OSError('en_core_web_sm could not be downloaded') from error
+        return spacy.load("en_core_web_sm")
+
+
+def pipeline_for(attr_included: bool) -> str:
+    """Return the name of the smallest pipeline in PIPELINES that can build a tree with or without attributes."""
+    return 'attributes' if attr_included else 'heads'
 
-def nltk_spacy_tree(sentence: str, attr_included: bool) -> nltk.tree:
+
+def disabled_components(pipeline: str) -> list[str]:
+    """Return the names of the components of nlp that the given pipeline does not need.
+
+    Preconditions:
+        - pipeline in PIPELINES
+    """
+    needed = PIPELINES[pipeline]
+    if needed is None:
+        return []
+    return [name for name in load_spacy_model().pipe_names if name not in needed]
+
+
+def nltk_spacy_tree(sentence: str, attr_included: bool, pipeline: Optional[str] = None) -> nltk.tree:
     """Visualize the SpaCy dependency tree with nltk.tree
 
     if attr_included is True, then part of speech and syntactic dependency are included
     if attr_included is False, then only the words is included in the nltk.tree
+
+    pipeline chooses which components of nlp are run (see PIPELINES). By default, the smallest pipeline that
+    attr_included needs is used, which gives the same tree as the full pipeline.
     """
     # gets all the tokenized info
-    doc = nlp(sentence)
+    doc = load_spacy_model()(sentence, disable=disabled_components(pipeline or pipeline_for(attr_included)))
     tree = [to_nltk_tree(sent.root, attr_included) for sent in doc.sents]
     # The first item in the list is the full tree
     return tree[0]
 
 
+def nltk_spacy_trees(sentences: Iterable[str], attr_included: bool, pipeline: Optional[str] = None,
+                     batch_size: int = 256) -> list[nltk.tree]:
+    """Return the tree of every sentence in sentences, as nltk_spacy_tree would, parsing them in batches with nlp.pipe.
+    """
+    docs = load_spacy_model().pipe(sentences, disable=disabled_components(pipeline or pipeline_for(attr_included)),
+                                   batch_size=batch_size)
+    return [[to_nltk_tree(sent.root, attr_included) for sent in doc.sents][0] for doc in docs]
+
+
+def benchmark_pipelines(sentences: list[str], attr_included: bool) -> dict[str, float]:
+    """Parse sentences with the full pipeline and with the smallest one attr_included needs, and return the time each
+    took in seconds, the speedup, and whether every tree was identical.
+
+    The batched trees of the smallest pipeline are also checked against nltk_spacy_tree parsing each sentence on its
+    own ('matches_unbatched'), since nlp.pipe must not change the trees either.
+    """
+    start = time.perf_counter()
+    full_trees = nltk_spacy_trees(sentences, attr_included, pipeline='full')
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    minimal_trees = nltk_spacy_trees(sentences, attr_included)
+    minimal_time = time.perf_counter() - start
+
+    unbatched_trees = [nltk_spacy_tree(sentence, attr_included) for sentence in sentences]
+    return {'full': full_time, 'minimal': minimal_time, 'speedup': full_time / minimal_time,
+            'identical': all(str(full) == str(minimal) for full, minimal in zip(full_trees, minimal_trees)),
+            'matches_unbatched': [str(tree) for tree in minimal_trees] == [str(tree) for tree in unbatched_trees]}
+
+
+# PARSER BACKENDS
+def _check_not_empty(sentence: str) -> None:
+    """Raise ZeroDivisionError if sentence is empty or only whitespace, so it has no root to return."""
+    if not sentence.strip():
+        raise ZeroDivisionError(f'{sentence!r} has no tokens to parse')
+
+
+class ParserBackend:
+    """
+    An interface for a dependency parser that builds the nltk trees used by the complexity measures.
+
+    Instance Attributes:
+    - name: the name of this backend in BACKENDS
+    """
+    name: str
+
+    def root(self, sentence: str) -> Any:
+        """Return the root token of the parse of (the first sentence of) sentence. Every token has the i, orth_, dep_,
+        head, children, n_lefts and n_rights attributes of a spaCy token (tag_ is only set by some backends and
+        pipelines).
+
+        Raise ZeroDivisionError if sentence has no tokens at all, as for the other sentences too short to have an MDD.
+        """
+        raise NotImplementedError
+
+    def tree(self, sentence: str, attr_included: bool) -> nltk.tree:
+        """Return the dependency tree of sentence, with the same labels as nltk_spacy_tree."""
+        return to_nltk_tree(self.root(sentence), attr_included)
+
+    def trees(self, sentences: Iterable[str], attr_included: bool) -> list[nltk.tree]:
+        """Return the dependency tree of every sentence in sentences."""
+        return [self.tree(sentence, attr_included) for sentence in sentences]
+
+
+class SpacyBackend(ParserBackend):
+    """
+    Dependency trees from the en_core_web_sm neural parser.
+
+    Instance Attributes:
+    - pipeline: the pipeline in PIPELINES to run, or None to pick the smallest one each tree needs
+    """
+    name = 'spacy'
+    pipeline: Optional[str]
+
+    def __init__(self, pipeline: Optional[str] = None) -> None:
+        """Initialize the backend, raising ImportError or OSError if the spaCy model cannot be loaded."""
+        self.pipeline = pipeline
+        load_spacy_model()
+
+    def root(self, sentence: str) -> Any:
+        """Return the root token of the spaCy parse of sentence, parsed with the 'heads' pipeline unless another one
+        was chosen (the parser sets dep_, so only tag_ is missing).
+        """
+        _check_not_empty(sentence)
+        doc = load_spacy_model()(sentence, disable=disabled_components(self.pipeline or 'heads'))
+        return next(iter(doc.sents)).root
+
+    def tree(self, sentence: str, attr_included: bool) -> nltk.tree:
+        """Return the spaCy dependency tree of sentence."""
+        return nltk_spacy_tree(sentence, attr_included, self.pipeline)
+
+    def trees(self, sentences: Iterable[str], attr_included: bool) -> list[nltk.tree]:
+        """Return the spaCy dependency tree of every sentence, parsed in batches."""
+        return nltk_spacy_trees(sentences, attr_included, self.pipeline)
+
+
+class HeuristicBackend(ParserBackend):
+    """Approximate dependency trees from the rule-based parser in heuristic_parser."""
+    name = 'heuristic'
+
+    def root(self, sentence: str) -> Any:
+        """Return the root token of the heuristic parse of sentence.
+
+        >>> HeuristicBackend().root('The girl ate an apple.').orth_
+        'ate'
+        >>> HeuristicBackend().root(' ')
+        Traceback (most recent call last):
+        ZeroDivisionError: ' ' has no tokens to parse
+        """
+        _check_not_empty(sentence)
+        return [token for token in heuristic_parser.parse(sentence) if token.dep_ == 'ROOT'][0]
+
+
+BACKENDS = {'spacy': SpacyBackend, 'heuristic': HeuristicBackend}
+
+# the backend used by dependency_tree, chosen on first use if use_backend was never called
+_backend: Optional[ParserBackend] = None
+
+
+def use_backend(name: str) -> ParserBackend:
+    """Make the backend called name the one used by dependency_tree for the rest of the run, and return it.
+
+    Preconditions:
+        - name in BACKENDS
+    """
+    global _backend
+    _backend = BACKENDS[name]()
+    return _backend
+
+
+def get_backend() -> ParserBackend:
+    """Return the backend used by dependency_tree.
+
+    Unless use_backend chose one, this is spaCy, or the heuristic parser if the spaCy model is not available.
+    """
+    if _backend is None:
+        with _setup_lock:
+            if _backend is None:
+                try:
+                    use_backend('spacy')
+                except (ImportError, OSError) as error:
+                    warnings.warn(f'spaCy parser unavailable ({error}), using the heuristic parser instead')
+                    use_backend('heuristic')
+    return _backend
+
+
+def process_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Return a pool of workers processes (all cores by default) that parse with the same backend as this process.
+
+    The backend is a global of this module, so a worker that is started fresh rather than forked (the default on
+    macOS and Windows, and on Linux from Python 3.14) would otherwise choose its own, and its parses would be cached
+    under the name of the backend of this process.
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=use_backend, initargs=(get_backend().name,))
+
+
+def dependency_tree(sentence: str, attr_included: bool) -> nltk.tree:
+    """Return the dependency tree of sentence from the current backend (see nltk_spacy_tree for attr_included)."""
+    return get_backend().tree(sentence, attr_included)
+
+
+def dependency_root(sentence: str) -> Any:
+    """Return the root token of the parse of sentence from the current backend (see ParserBackend.root)."""
+    return get_backend().root(sentence)
+
+
+def dependency_trees(sentences: Iterable[str], attr_included: bool) -> list[nltk.tree]:
+    """Return the dependency tree of every sentence in sentences from the current backend."""
+    return get_backend().trees(sentences, attr_included)
+
+
 def token_format(token, attr_included) -> Any:
     """Return its tokenized format, continuous string with all info
 
@@ -51,3 +305,148 @@ def to_nltk_tree(node, attr_included) -> Any:
         return Tree(token_format(node, attr_included), [to_nltk_tree(child, attr_included) for child in node.children])
     else:
         return token_format(node, attr_included)
+
+
+# INTEGER-ENCODED PARSES (what the complexity measures read, instead of matching words in nltk tree labels)
+class LabelTable:
+    """
+    A lookup table between strings (dependency labels or part of speech tags) and small integer ids, given out in the
+    order the strings are first seen in this process.
+
+    Ids are only looked up under a lock the first time a string is seen, so reads do not contend between threads.
+
+    Instance Attributes:
+    - labels: labels[i] is the string with id i
+    - ids: the id of every string in labels
+
+    Representation Invariants:
+    - all(self.labels[self.ids[label]] == label for label in self.ids)
+    """
+    labels: list[str]
+    ids: dict[str, int]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """Initialize an empty table."""
+        self.labels = []
+        self.ids = {}
+        self._lock = threading.Lock()
+
+    def id_of(self, label: str) -> int:
+        """Return the id of label, giving it the next id if it has none yet.
+
+        >>> table = LabelTable()
+        >>> table.id_of('nsubj'), table.id_of('dobj'), table.id_of('nsubj'), table.labels
+        (0, 1, 0, ['nsubj', 'dobj'])
+        """
+        label_id = self.ids.get(label)
+        if label_id is None:
+            with self._lock:
+                label_id = self.ids.get(label)
+                if label_id is None:
+                    label_id = len(self.labels)
+                    self.labels.append(label)
+                    self.ids[label] = label_id
+        return label_id
+
+    def ids_of(self, labels: Iterable[str]) -> set[int]:
+        """Return the ids of every label in labels."""
+        return {self.id_of(label) for label in labels}
+
+
+# the lookup tables of the dep and tag ids of every DependencyParse in this process
+DEP_LABELS = LabelTable()
+POS_TAGS = LabelTable()
+# removes punctuation from a token, to tell words from punctuation the same way Sentence.sentence_to_list does
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+
+class DependencyParse:
+    """
+    The parse of a sentence as parallel arrays, with one entry per token in sentence order.
+
+    Instance Attributes:
+    - words: the text of every token
+    - heads: the index of the head of every token, or -1 for the root
+    - deps: the id of the dependency label of every token in DEP_LABELS
+    - tags: the id of the part of speech tag of every token in POS_TAGS ('' where the backend did not tag it)
+    - is_word: whether every token is a word rather than punctuation (as Sentence.sentence_to_list splits words)
+
+    Representation Invariants:
+    - len(self.words) == len(self.heads) == len(self.deps) == len(self.tags) == len(self.is_word) > 0
+    - (self.heads == -1).sum() == 1
+    """
+    words: list[str]
+    heads: np.ndarray
+    deps: np.ndarray
+    tags: np.ndarray
+    is_word: np.ndarray
+
+    def __init__(self, words: list[str], heads: np.ndarray, deps: np.ndarray, tags: np.ndarray) -> None:
+        """Initialize a parse from its arrays."""
+        self.words = words
+        self.heads = heads
+        self.deps = deps
+        self.tags = tags
+        self.is_word = np.array([word.translate(_PUNCTUATION).strip() != '' for word in words], dtype=bool)
+
+    @property
+    def root(self) -> int:
+        """The index of the root token."""
+        return int(np.flatnonzero(self.heads == -1)[0])
+
+    def children(self, token: int) -> list[int]:
+        """Return the indices of the tokens that depend on token, in sentence order."""
+        return np.flatnonzero(self.heads == token).tolist()
+
+    def to_nltk_tree(self, attr_included: bool = False, token: Optional[int] = None) -> Any:
+        """Return the nltk tree of the parse (or of the subtree of token), with the same labels as to_nltk_tree gives
+        for the tokens it was encoded from. Only meant for debugging, with pretty_print.
+
+        >>> parse = encode_parse(heuristic_parser.parse('The girl ate an apple')[2])
+        >>> print(parse.to_nltk_tree())
+        (ate (girl The) (apple an))
+        """
+        token = self.root if token is None else token
+        if attr_included:
+            label = "_".join([self.words[token], POS_TAGS.labels[self.tags[token]],
+                              DEP_LABELS.labels[self.deps[token]]])
+        else:
+            label = self.words[token]
+        children = self.children(token)
+        if not children:
+            return label
+        return Tree(label, [self.to_nltk_tree(attr_included, child) for child in children])
+
+
+def encode_parse(root: Any) -> DependencyParse:
+    """Return the DependencyParse of the tokens under root, a root token as returned by ParserBackend.root."""
+    tokens = []
+    stack = [root]
+    while stack:
+        token = stack.pop()
+        tokens.append(token)
+        stack.extend(token.children)
+    tokens.sort(key=lambda token_: token_.i)
+    index = {token.i: position for position, token in enumerate(tokens)}
+    heads = [-1 if token is root else index[token.head.i] for token in tokens]
+    return DependencyParse([token.orth_ for token in tokens], np.array(heads, dtype=np.int32),
+                           np.array([DEP_LABELS.id_of(token.dep_) for token in tokens], dtype=np.uint16),
+                           np.array([POS_TAGS.id_of(token.tag_) for token in tokens], dtype=np.uint16))
+
+
+def dependency_parse(sentence: str) -> DependencyParse:
+    """Return the integer-encoded parse of sentence from the current backend."""
+    return encode_parse(dependency_root(sentence))
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    from data_processing import read_csv
+
+    corpus_sentences = [sentence.normalized_phrase
+                        for block in read_csv('data/data_set_novels.csv') for sentence in block.excerpt]
+    for include in (False, True):
+        print(f'attr_included={include}:', benchmark_pipelines(corpus_sentences, include))
@@ -4,6 +4,9 @@ Instructions (READ THIS FIRST!)
 ===============================
 This file contains the implementations for our file readers, and classes TextBlock and Sentence.
 
+As the corpus is read, every distinct word is given an id in corpus_vocabulary, and the measures look up the
+attributes of words (whether they are familiar, their syllables, their frequency rank) in arrays indexed by those ids.
+
 There is nothing to run here, these are mostly just supports for our complexity measures functions (the classes), and
 our visualizers in main.py.
 
@@ -14,50 +17,75 @@ This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
 """
 from __future__ import annotations
 import csv
-from typing import Optional
+import mmap
+import tempfile
+import threading
+from typing import Any, Callable, Hashable, Optional
 import string
 
+import numpy as np
+
 
-def read_csv(csv_file: str) -> list[TextBlock]:
+def read_csv(csv_file: str, pool: Optional[SentencePool] = None) -> list[TextBlock]:
     """Load network and packet data from a CSV file.
 
+    The text of the corpus is stored once, in a memory-mapped ExcerptStore, and every Sentence is a view into it that
+    is only decoded when its phrase is used. Sentences are interned in pool (sentence_pool by default), so identical
+    sentences across the corpus are stored once and share one view. Normalization for parsing (removing backslashes
+    and surrounding whitespace) is done here, once, instead of every time a sentence is parsed.
+
        Preconditions:
            - csv_file refers to a valid CSV file in the format described on the project handout
 
     """
+    if pool is None:
+        pool = sentence_pool
+    store = ExcerptStore()
     with open(csv_file) as csv_fle:
         reader = csv.reader(csv_fle)
         headers = next(reader)
-        list_of_text_blocks = []
-
-        for row in reader:
-            # Turn the excerpt in each row into a list of Sentences
-            counter = 0
-            periods = [0]
-            # Find the indices of the end of the sentences
-            for x in row[7]:
-                if x == '.' or x == '?' or x == '!':
-                    periods.append(counter + 1)
-                counter += 1
-            # Create a Sentence for each sentence
-            sentences = []
-            for i in range(0, len(periods) - 1):
-                sentences.append(Sentence(phrase=row[7][periods[i]: periods[i + 1]], id=int(row[0]), location=row[6],
-                                          carec_m=float(row[8])))
-                sentences[-1].word_count = sentences[-1].calculate_word_count()
-
-            # initialize a text_block with the unique information of each text
-            list_of_text_blocks.append(TextBlock(id=int(row[0]), author=row[1], title=row[2], url=row[3],
-                                                 category=row[5], location=row[6], excerpt=sentences,
-                                                 carec_m=float(row[8]),
-                                                 sentence_count=counter, flesch_reading=float(row[9]),
-                                                 dale_chall=float(row[10])))
-            if row[4] != '':
-                list_of_text_blocks[-1].pub_year = row[4]
+        list_of_text_blocks = [row_to_text_block(row, pool, store) for row in reader]
+    store.freeze()
+    pool.release()
     # return a list of TextBlocks
     return list_of_text_blocks
 
 
+def row_to_text_block(row: list[str], pool: SentencePool, store: ExcerptStore) -> TextBlock:
+    """Return the TextBlock of one row of the CSV file, with its sentences interned in pool and stored in store.
+
+    The caller must freeze the store before the phrases of the sentences are used.
+    """
+    # Create a Sentence for each sentence of the excerpt
+    sentences = [Sentence(phrase=phrase, id=int(row[0]), location=row[6], carec_m=float(row[8]),
+                          view=pool.intern(phrase, store)) for phrase in excerpt_phrases(row[7])]
+
+    # initialize a text_block with the unique information of each text
+    text_block = TextBlock(id=int(row[0]), author=row[1], title=row[2], url=row[3], category=row[5],
+                           location=row[6], excerpt=sentences, carec_m=float(row[8]), sentence_count=len(row[7]),
+                           flesch_reading=float(row[9]), dale_chall=float(row[10]))
+    if row[4] != '':
+        text_block.pub_year = row[4]
+    return text_block
+
+
+def excerpt_phrases(excerpt: str) -> list[str]:
+    """Return the sentences of excerpt: every piece of it that ends with a '.', '?' or '!', without backslashes. Any
+    text after the last of those marks is not part of a sentence.
+
+    >>> excerpt_phrases('She danced. Did he? Yes')
+    ['She danced.', ' Did he?']
+    """
+    counter = 0
+    periods = [0]
+    # Find the indices of the end of the sentences
+    for x in excerpt:
+        if x == '.' or x == '?' or x == '!':
+            periods.append(counter + 1)
+        counter += 1
+    return [excerpt[periods[i]: periods[i + 1]].replace('\\', '') for i in range(0, len(periods) - 1)]
+
+
 def process_blocks(blocks_list: list[TextBlock]) -> list[tuple[int, list[Sentence]]]:
     """
     Processes the text_blocks returned from the csv file and returns a tuple containing an id and
@@ -73,6 +101,316 @@ def process_blocks(blocks_list: list[TextBlock]) -> list[tuple[int, list[Sentenc
     return new_lst
 
 
+class ExcerptStore:
+    """
+    The text of a corpus, stored once as UTF-8 bytes in a memory-mapped temporary file instead of as one Python string
+    per sentence.
+
+    Text is appended while the corpus is loaded, and the store is then frozen, after which it is read only.
+
+    Instance Attributes:
+    - buffer: the memory-mapped text (None until the store is frozen)
+    """
+    buffer: Optional[mmap.mmap | bytes]
+    _file: Any
+    _size: int
+
+    def __init__(self) -> None:
+        """Initialize an empty store."""
+        self.buffer = None
+        self._file = tempfile.TemporaryFile()
+        self._size = 0
+
+    def append(self, text: str) -> tuple[int, int]:
+        """Add text to the end of the store and return its (start, end) byte offsets.
+
+        Preconditions:
+            - self.buffer is None
+        """
+        data = text.encode('utf-8')
+        self._file.write(data)
+        self._size += len(data)
+        return self._size - len(data), self._size
+
+    def freeze(self) -> None:
+        """Memory-map everything appended so far, so that it can be decoded."""
+        self._file.flush()
+        # an empty file cannot be memory-mapped
+        self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size > 0 else b''
+
+    def decode(self, start: int, end: int) -> str:
+        """Return the text between the byte offsets start and end.
+
+        Preconditions:
+            - self.buffer is not None
+        """
+        return self.buffer[start:end].decode('utf-8')
+
+
+class SentenceView:
+    """
+    Where a sentence is in an ExcerptStore.
+
+    Instance Attributes:
+    - store: the store holding the sentence
+    - start, end: the byte offsets of the sentence as it appears in the excerpt (used by the word based measures)
+    - normalized_start, normalized_end: the byte offsets of the sentence without its surrounding whitespace (used for
+      parsing)
+    - token_ids: the ids of the words of the sentence in corpus_vocabulary (see Sentence.token_ids)
+
+    Representation Invariants:
+    - self.start <= self.normalized_start <= self.normalized_end <= self.end
+    """
+    store: ExcerptStore
+    start: int
+    end: int
+    normalized_start: int
+    normalized_end: int
+    token_ids: np.ndarray
+
+    def __init__(self, store: ExcerptStore, phrase: str) -> None:
+        """Append phrase to store and initialize a view of it, with its words encoded in corpus_vocabulary."""
+        self.store = store
+        self.token_ids = corpus_vocabulary.encode(words_of(phrase))
+        self.start, self.end = store.append(phrase)
+        self.normalized_start = self.start + len(phrase.encode('utf-8')) - len(phrase.lstrip().encode('utf-8'))
+        self.normalized_end = max(self.normalized_start,
+                                  self.end - len(phrase.encode('utf-8')) + len(phrase.rstrip().encode('utf-8')))
+
+
+class SentencePool:
+    """
+    Interns identical sentences while a corpus is loaded, so that each distinct sentence is stored once and every
+    Sentence with that phrase shares one view of it.
+
+    Instance Attributes:
+    - phrases: maps each distinct phrase of the corpus being loaded to its view
+    - lookups: the number of phrases interned so far, including repeats
+    - unique: the number of distinct phrases interned so far
+
+    Representation Invariants:
+    - self.lookups >= self.unique
+    """
+    phrases: dict[str, SentenceView]
+    lookups: int
+    unique: int
+
+    def __init__(self) -> None:
+        """Initialize an empty pool."""
+        self.phrases = {}
+        self.lookups = 0
+        self.unique = 0
+
+    def intern(self, phrase: str, store: ExcerptStore) -> SentenceView:
+        """Return the view of phrase, appending phrase to store if it has not been seen since the last release.
+
+        >>> pool, store = SentencePool(), ExcerptStore()
+        >>> pool.intern(' She danced.', store) is pool.intern(''.join([' She ', 'danced.']), store)
+        True
+        """
+        self.lookups += 1
+        if phrase not in self.phrases:
+            self.unique += 1
+            self.phrases[phrase] = SentenceView(store, phrase)
+        return self.phrases[phrase]
+
+    def release(self) -> None:
+        """Forget the phrases seen so far (keeping the statistics), so that their strings can be freed once a corpus
+        has been loaded.
+        """
+        self.phrases = {}
+
+    def stats(self) -> dict[str, float]:
+        """Return the number of sentences interned, how many were unique, and the fraction that were duplicates."""
+        return {'sentences': self.lookups, 'unique': self.unique,
+                'hit_rate': (self.lookups - self.unique) / self.lookups if self.lookups else 0.0}
+
+
+class Vocabulary:
+    """
+    Every distinct word of the sentences seen so far (as Sentence.sentence_to_list splits them), given an integer id in
+    the order it was first seen, with per-word attributes stored in arrays indexed by id.
+
+    The measures then work on the ids of a sentence: a per-word attribute of all of its words is one array gather, and
+    each attribute is only computed once per distinct word. Like MetricCache, it can be shared by threads: a lock is
+    only taken when a new word is given an id or a column is extended, never to read.
+
+    Instance Attributes:
+    - words: words[i] is the word with id i
+    - ids: the id of every word in words
+    - columns: maps the name of a per-word attribute to the object it was computed from (see column) and the array of
+      its value for every word, up to the last word when it was computed
+
+    Representation Invariants:
+    - all(self.words[self.ids[word]] == word for word in self.ids)
+    - all(len(values) <= len(self.words) for _, values in self.columns.values())
+    """
+    words: list[str]
+    ids: dict[str, int]
+    columns: dict[str, tuple[Any, np.ndarray]]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """Initialize an empty vocabulary."""
+        self.words = []
+        self.ids = {}
+        self.columns = {}
+        self._lock = threading.Lock()
+
+    def encode(self, words: list[str]) -> np.ndarray:
+        """Return the ids of words, giving the next ids to the words that have none yet.
+
+        >>> vocabulary = Vocabulary()
+        >>> vocabulary.encode(['the', 'cat', 'the']).tolist(), vocabulary.encode(['a', 'cat']).tolist()
+        ([0, 1, 0], [2, 1])
+        """
+        try:
+            return np.fromiter(map(self.ids.__getitem__, words), dtype=np.int32, count=len(words))
+        except KeyError:
+            with self._lock:
+                for word in words:
+                    if word not in self.ids:
+                        # the word is added before its id is published, so that a reader outside the lock that finds
+                        # the id always finds the word (and the columns computed up to it)
+                        self.words.append(word)
+                        self.ids[word] = len(self.words) - 1
+            return np.fromiter(map(self.ids.__getitem__, words), dtype=np.int32, count=len(words))
+
+    def column(self, name: str, compute: Callable[[list[str]], list], dtype: type, source: Any = None) -> np.ndarray:
+        """Return the array of the attribute called name of every word with an id, where compute(words) gives the
+        attribute of each of words. It is only computed for the words given an id since the last call.
+
+        source is what the attribute depends on besides the word (such as the word list of Dale-Chall), and the column
+        is computed again from scratch if it is not equal to the source it was computed from last time.
+
+        >>> vocabulary = Vocabulary()
+        >>> ids = vocabulary.encode(['the', 'cats'])
+        >>> vocabulary.column('length', lambda words: [len(word) for word in words], np.int32)[ids].tolist()
+        [3, 4]
+        """
+        stored = self.columns.get(name)
+        if stored is not None and len(stored[1]) == len(self.words):
+            if stored[0] is source:
+                return stored[1]
+            if stored[0] == source:
+                # an equal source that is a new object (e.g. the word list read again), so the next call takes the
+                # identity check above instead of comparing them again
+                self.columns[name] = (source, stored[1])
+                return stored[1]
+        with self._lock:
+            stored = self.columns.get(name)
+            if stored is None or not (stored[0] is source or stored[0] == source):
+                stored = (source, np.empty(0, dtype=dtype))
+            num_words = len(self.words)
+            if len(stored[1]) < num_words:
+                new_values = np.array(compute(self.words[len(stored[1]):num_words]), dtype=dtype)
+                stored = (source, np.concatenate([stored[1], new_values]))
+            self.columns[name] = stored
+        return stored[1]
+
+    def clear_columns(self) -> None:
+        """Drop every column, to be computed again from the words when next asked for. The ids are kept, since the
+        sentences read so far refer to them.
+
+        >>> vocabulary = Vocabulary()
+        >>> _ = vocabulary.column('length', lambda words: [len(word) for word in words], np.int32)
+        >>> vocabulary.clear_columns()
+        >>> vocabulary.columns
+        {}
+        """
+        with self._lock:
+            self.columns = {}
+
+
+# the default of dict.get in MetricCache.get, since None can be a stored metric
+_MISSING = object()
+
+
+class MetricCache:
+    """
+    A memo of a per-sentence metric, so that a sentence that appears several times (in the corpus, or over and over in
+    the interactive scorer) is only scored once.
+
+    It can be shared by threads without a lock. Lookups only read values, and a computed metric is stored with
+    dict.setdefault, so if two threads compute the same metric at once, both return (and keep) the one stored first.
+    Each thread counts its hits and misses under its own key, so no count is lost to a race.
+
+    Instance Attributes:
+    - values: maps a key describing a sentence to its metric
+    - hits: the number of lookups answered from values
+    - misses: the number of lookups that had to compute the metric
+    """
+    values: dict[Hashable, Any]
+    _hits: dict[int, int]
+    _misses: dict[int, int]
+
+    def __init__(self) -> None:
+        """Initialize an empty cache."""
+        self.values = {}
+        self._hits = {}
+        self._misses = {}
+
+    @property
+    def hits(self) -> int:
+        """The number of lookups answered from values, over every thread."""
+        return sum(self._hits.copy().values())
+
+    @property
+    def misses(self) -> int:
+        """The number of lookups that had to compute the metric, over every thread."""
+        return sum(self._misses.copy().values())
+
+    def get(self, key: Hashable, compute: Callable[..., Any], *args: Any) -> Any:
+        """Return the metric stored for key, calling compute(*args) to find and store it if there is none yet.
+
+        If compute raises an error, nothing is stored and the error is raised again.
+
+        >>> cache = MetricCache()
+        >>> cache.get('She danced.', len, 'She danced.'), cache.get('She danced.', len, 'anything else')
+        (11, 11)
+        """
+        values = self.values
+        value = values.get(key, _MISSING)
+        thread = threading.get_ident()
+        if value is not _MISSING:
+            self._hits[thread] = self._hits.get(thread, 0) + 1
+            return value
+        self._misses[thread] = self._misses.get(thread, 0) + 1
+        return values.setdefault(key, compute(*args))
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value for key, computed elsewhere (for example in a worker process), unless key already has one."""
+        self.values.setdefault(key, value)
+
+    def clear(self) -> None:
+        """Forget every stored metric (keeping the statistics), to free its memory."""
+        self.values = {}
+
+    def stats(self) -> dict[str, float]:
+        """Return the number of lookups, how many distinct sentences were scored, and the fraction of lookups reused."""
+        hits = self.hits
+        lookups = hits + self.misses
+        return {'lookups': lookups, 'unique': len(self.values),
+                'hit_rate': hits / lookups if lookups else 0.0}
+
+
+# the pool that read_csv interns phrases in, shared by every corpus loaded in this run
+sentence_pool = SentencePool()
+# the vocabulary that the words of every sentence are encoded in, shared by every corpus loaded in this run
+corpus_vocabulary = Vocabulary()
+# removes punctuation from a phrase before it is split into words
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+
+def words_of(phrase: str) -> list[str]:
+    """Return the words of phrase: the pieces between spaces, once punctuation is removed (which can leave empty words).
+
+    >>> words_of("Well,  she danced!")
+    ['Well', '', 'she', 'danced']
+    """
+    return phrase.translate(_PUNCTUATION).split(' ')
+
+
 class TextBlock:
     """
     Class storing the text for each novel entry, plus associated attributes from csv
@@ -143,8 +481,12 @@ class Sentence:
     """
     Class to store each sentence and its associated attributes
 
+    A Sentence loaded by read_csv does not hold its own string: it is a view into the ExcerptStore of its corpus, and
+    its phrase is decoded each time it is used.
+
     Instance Attributes:
     - phrase: a sentence in str form
+    - normalized_phrase: the phrase without surrounding whitespace or backslashes, as it is given to the parser
     - id: the id of the TextBlock that this Sentence originated from
     - location: the location of the TextBlock that this Sentence originated from
     - carec_m: the carec_m of the TextBlock that this Sentence originated from
@@ -156,19 +498,73 @@ class Sentence:
     - self.word_count > 0
 
     """
-    phrase: str
     id: Optional[int] = None
     location: Optional[str] = None
     carec_m: Optional[float] = None
     word_count: Optional[int] = None
+    _phrase: Optional[str]
+    _view: Optional[SentenceView]
+    _token_ids: Optional[np.ndarray] = None
 
-    def __init__(self, phrase: str, id: Optional[int], location: Optional[str], carec_m: Optional[float]):
-        """initializes the instance attributes of Sentence."""
-        self.phrase = phrase
+    def __init__(self, phrase: str, id: Optional[int], location: Optional[str], carec_m: Optional[float],
+                 view: Optional[SentenceView] = None):
+        """initializes the instance attributes of Sentence.
+
+        If view is given (a view of the same text as phrase), the phrase is read from it from now on, and the string
+        phrase is not kept.
+        """
+        self._phrase = phrase
+        self._view = None
         self.id = id
         self.location = location
         self.carec_m = carec_m
         self.word_count = self.calculate_word_count()
+        if view is not None:
+            self._phrase, self._view = None, view
+
+    @property
+    def phrase(self) -> str:
+        """The sentence in str form."""
+        if self._view is None:
+            return self._phrase
+        return self._view.store.decode(self._view.start, self._view.end)
+
+    @phrase.setter
+    def phrase(self, phrase: str) -> None:
+        """Replace the sentence with the string phrase."""
+        self._phrase = phrase
+        self._view = None
+        self._token_ids = None
+
+    @property
+    def token_ids(self) -> np.ndarray:
+        """The ids of the words of the phrase (see sentence_to_list) in corpus_vocabulary.
+
+        Sentences loaded by read_csv share the ids of their view, encoded once per distinct sentence as the corpus is
+        loaded. Any other sentence is encoded the first time its ids are used.
+        """
+        if self._view is not None:
+            return self._view.token_ids
+        if self._token_ids is None:
+            self._token_ids = corpus_vocabulary.encode(self.sentence_to_list())
+        return self._token_ids
+
+    @property
+    def normalized_phrase(self) -> str:
+        """The sentence without surrounding whitespace or backslashes, as it is given to the parser."""
+        if self._view is None:
+            return self._phrase.strip().replace('\\', '')
+        return self._view.store.decode(self._view.normalized_start, self._view.normalized_end)
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Return the state to pickle (e.g. to send to a worker process), with the phrase decoded into a string, since
+        the memory map of the store cannot be pickled. The token ids are left out, since they are only valid in the
+        vocabulary of this process.
+        """
+        state = dict(self.__dict__)
+        state['_phrase'], state['_view'] = self.phrase, None
+        state.pop('_token_ids', None)
+        return state
 
     def calculate_word_count(self) -> int:
         """Returns number of words in sentence.
@@ -178,20 +574,19 @@ class Sentence:
         """
         return len(self.phrase.split(' '))
 
-    def sentence_to_list(self) -> list[str]:
-        """Returns just the words of a sentence.
+    def sentence_to_list(self, normalized: bool = False) -> list[str]:
+        """Returns just the words of a sentence (of the normalized phrase if normalized is True).
 
         Preconditions:
         - len(self.sentence_to_list()) > 0
         """
         # for i in '!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~':
         #   temp = self.phrase.replace(i, '')
-        temp = self.phrase.translate(str.maketrans('', '', string.punctuation))
-        return temp.split(' ')
+        return words_of(self.normalized_phrase if normalized else self.phrase)
 
-    def get_position_word(self, word: str) -> int:
-        """returns the index of the first iteration of this word."""
-        word_list = self.sentence_to_list()
+    def get_position_word(self, word: str, normalized: bool = False) -> int:
+        """returns the index of the first iteration of this word (in the normalized phrase if normalized is True)."""
+        word_list = self.sentence_to_list(normalized)
 
         for i in range(0, len(word_list)):
             if word_list[i] == word:
@@ -211,6 +606,7 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'max-line-length': 120,
-        'extra-imports': ["csv", "typing", "string", "create_tree"],  # the names (strs) of imported modules
+        # the names (strs) of imported modules
+        'extra-imports': ["csv", "mmap", "tempfile", "threading", "typing", "string", "numpy"],
         'allowed-io': ["read_csv"]
     })
@@ -0,0 +1,454 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains the evaluation harness for our research question: how well do Dale-Chall, Flesch Reading Ease and
+Mean Dependency Distance (MDD) agree with CAREC_M?
+
+The whole corpus is scored in parallel with a process pool, each measure is standardized to a grade level, and then
+compared against the standardized CAREC_M grade of the same block using:
+    - Pearson correlation
+    - Mean absolute error (MAE), in grade levels
+    - A confusion matrix of predicted grade vs CAREC_M grade
+
+Every comparison is reported for the full corpus and broken down by category ('Lit', 'Info') and by
+location ('start', 'mid', 'end', 'whole'). Bootstrap confidence intervals for correlation and MAE are computed with the
+resamples split across worker processes.
+
+The corpus can also be scored with a thread pool sharing the caches and the parser, which compare_executors benchmarks
+against the process pool.
+
+Our Dale-Chall scores are also validated against the New Dale-Chall Readability Formula column of the dataset.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import contextlib
+import os
+import time
+import warnings
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+import complexity_measures as com_m
+import create_tree as ct
+import standardization as std
+from data_processing import TextBlock, Sentence, read_csv
+
+MEASURES = ('dale_chall', 'flesch', 'mdd')
+# the per-sentence results of score_corpus_with_sentences, from the same work as the block scores
+SENTENCE_MEASURES = ('words', 'syllables', 'unfamiliar_words', 'mdd')
+# the scale in standardization.SCALES that turns the raw scores of each measure into grades
+MEASURE_SCALES = {'dale_chall': 'dale_chall_revised', 'flesch': 'flesch', 'mdd': 'mdd'}
+GRADES = np.arange(4, 17)
+# the version of the raw scores of score_corpus, to be bumped by any change to the measures that moves them, so that
+# scores saved by an earlier version (such as in an incremental.IncrementalCorpus snapshot) are not reused
+SCORES_VERSION = 2
+
+
+# CORPUS SCORING (one task per TextBlock, spread over a process pool)
+def scores_provenance() -> tuple[str, int]:
+    """Return the name of the current parser backend and SCORES_VERSION, which together decide whether scores (or
+    anything fit on them) saved by an earlier run can be reused.
+    """
+    return ct.get_backend().name, SCORES_VERSION
+
+
+def try_score(measure: Callable[..., float], *args: Any) -> float:
+    """Return measure(*args), or nan if the measure cannot be computed for these arguments.
+
+    This lets one bad excerpt not stop a corpus-wide run. It happens for MDD when a sentence has a single word, or is
+    a stray '.' from an ellipsis (ZeroDivisionError). AttributeError is still caught for parses that are missing the
+    token attributes the measures read.
+    """
+    try:
+        return float(measure(*args))
+    except (ZeroDivisionError, AttributeError):
+        return float('nan')
+
+
+def score_block(text_block: TextBlock) -> tuple[float, float, float]:
+    """Return the raw (Dale-Chall, Flesch Reading Ease, MDD) scores of a single text block, nan where a measure cannot
+    be computed.
+    """
+    return (try_score(com_m.dale_chall_complexity, text_block), try_score(com_m.flesch_complexity_score, text_block),
+            try_score(com_m.mean_dependency_distance, text_block, False))
+
+
+def _score_counts(text_block: TextBlock) -> tuple[float, float, list[tuple[tuple[int, int], tuple[int, ...]]]]:
+    """Return the raw (Dale-Chall, Flesch Reading Ease) scores of a single text block, and the entries of
+    com_m.unfamiliar_cache and com_m.count_cache of each of its sentences, which a worker process sends back so they
+    are not counted again in the main process.
+    """
+    scores = (try_score(com_m.dale_chall_complexity, text_block), try_score(com_m.flesch_complexity_score, text_block))
+    word_list = com_m.dale_chall_word_list()
+    entries = []
+    for sentence in text_block.excerpt:
+        # already stored while the block was scored, unless a measure failed before reaching this sentence
+        unfamiliar = com_m.unfamiliar_cache.values.get(sentence.phrase) or com_m.unfamiliar_cache.get(
+            sentence.phrase, com_m.count_unfamiliar, sentence, word_list)
+        counts = com_m.count_cache.values.get(sentence.phrase) or com_m.count_cache.get(
+            sentence.phrase, com_m.count_sentence, sentence)
+        entries.append((unfamiliar, counts))
+    return (*scores, entries)
+
+
+def _parse_sentence(sentence: Sentence) -> tuple[float, Optional[dict[str, float]]]:
+    """Return the MDD of sentence (nan if it cannot be computed) and the syntactic metrics stored by the same parse
+    (None if the sentence could not be parsed at all).
+    """
+    mdd = try_score(com_m.mean_dependency_distance_sentence, sentence)
+    return mdd, com_m.syntax_cache.values.get(com_m.mdd_cache_key(sentence))
+
+
+def score_corpus(text_blocks: list[TextBlock], workers: Optional[int] = None, threads: bool = False,
+                 executor: Optional[Executor] = None) -> np.ndarray:
+    """Return a (len(text_blocks), 3) array of raw scores, in the column order of MEASURES.
+
+    See score_corpus_with_sentences, which does the work.
+    """
+    return score_corpus_with_sentences(text_blocks, workers, threads, executor)[0]
+
+
+def _pool(workers: int, threads: bool, executor: Optional[Executor]) -> contextlib.AbstractContextManager[Executor]:
+    """Return a context manager giving executor (left running on exit) if it is not None, or else a new pool of workers
+    threads or processes (shut down on exit)."""
+    if executor is not None:
+        return contextlib.nullcontext(executor)
+    return ThreadPoolExecutor(max_workers=workers) if threads else ct.process_pool(workers)
+
+
+def _parse_distinct(text_blocks: list[TextBlock], workers: int, executor: Executor) -> dict[tuple, float]:
+    """Parse every distinct sentence of text_blocks that is not already in com_m.mdd_cache in executor, and return its
+    MDD (nan if it cannot be computed) by cache key. The syntactic metrics of every parse are put in com_m.syntax_cache.
+    """
+    distinct = {}
+    for block in text_blocks:
+        for sentence in block.excerpt:
+            distinct.setdefault(com_m.mdd_cache_key(sentence), sentence)
+    to_parse = [key for key in distinct if key not in com_m.mdd_cache.values]
+    parse_results = executor.map(_parse_sentence, [distinct[key] for key in to_parse],
+                                 chunksize=max(1, len(to_parse) // (workers * 8)))
+    parsed = {}
+    for key, (mdd, syntax) in zip(to_parse, parse_results):
+        parsed[key] = mdd
+        if syntax is not None:
+            com_m.syntax_cache.put(key, syntax)
+    return parsed
+
+
+def _block_mdd(keys: list[tuple], parsed: dict[tuple, float]) -> tuple[float, list[float]]:
+    """Return the MDD of the block whose sentences have the cache keys keys, and the MDD of each of its sentences, from
+    parsed (see _parse_distinct) or com_m.mdd_cache. The MDD of every sentence that has one is put in the cache.
+    """
+    if any(np.isnan(parsed.get(key, 0.0)) for key in keys):
+        mdd = float('nan')
+    else:
+        # same as com_m.mean_dependency_distance(block, False)
+        mdd = sum(com_m.mdd_cache.get(key, parsed.__getitem__, key) for key in keys) / len(keys)
+    sentence_mdds = []
+    for key in keys:
+        sentence_mdd = parsed[key] if key in parsed else com_m.mdd_cache.values[key]
+        if not np.isnan(sentence_mdd):
+            # the sentences of a block with a nan sentence were not stored above
+            com_m.mdd_cache.put(key, sentence_mdd)
+        sentence_mdds.append(sentence_mdd)
+    return mdd, sentence_mdds
+
+
+def score_corpus_with_sentences(text_blocks: list[TextBlock], workers: Optional[int] = None, threads: bool = False,
+                                executor: Optional[Executor] = None) -> tuple[np.ndarray, np.ndarray]:
+    """Return a (len(text_blocks), 3) array of raw scores, in the column order of MEASURES, and a (number of sentences,
+    len(SENTENCE_MEASURES)) array of the results of every sentence (in block order) they were computed from, nan where
+    the MDD of a sentence cannot be computed.
+
+    The work is done in parallel with workers processes (all cores by default), handed out in chunks so that the
+    pickling overhead of each task is amortized. Dale-Chall and Flesch are scored per block. MDD, which needs a parse,
+    is computed once per distinct sentence that is not already in com_m.mdd_cache, and then fanned back out to every
+    block containing that sentence (going through the cache, so com_m.cache_stats reports the dedup hit rate). The
+    syntactic metrics of every parse are brought back too, into com_m.syntax_cache, and so are the word, syllable and
+    unfamiliar word counts of every sentence, into com_m.count_cache and com_m.unfamiliar_cache.
+
+    If threads is True, the workers are threads of this process instead. They share the caches of complexity_measures
+    and the parser directly, so nothing is pickled, but they only run in parallel where the GIL is released (in parts
+    of the spaCy parser) or on a free-threaded build of Python. See compare_executors.
+
+    If executor is given, the work runs there instead (and it is left running), so that a caller scoring many batches
+    starts its workers only once. workers is then only used to size the chunks.
+    """
+    workers = workers or os.cpu_count() or 1
+    with _pool(workers, threads, executor) as executor:
+        counts = list(executor.map(_score_counts, text_blocks,
+                                   chunksize=max(1, len(text_blocks) // (workers * 8))))
+        parsed = _parse_distinct(text_blocks, workers, executor)
+
+    scores = np.empty((len(text_blocks), len(MEASURES)))
+    sentence_scores = []
+    for i, block in enumerate(text_blocks):
+        keys = [com_m.mdd_cache_key(sentence) for sentence in block.excerpt]
+        mdd, sentence_mdds = _block_mdd(keys, parsed)
+        scores[i] = (*counts[i][:2], mdd)
+        for sentence, sentence_mdd, (unfamiliar, sentence_counts) in zip(block.excerpt, sentence_mdds, counts[i][2]):
+            com_m.unfamiliar_cache.put(sentence.phrase, unfamiliar)
+            com_m.count_cache.put(sentence.phrase, sentence_counts)
+            sentence_scores.append((unfamiliar[0], sentence_counts[1], unfamiliar[1], sentence_mdd))
+    return scores, np.array(sentence_scores, dtype=float).reshape(-1, len(SENTENCE_MEASURES))
+
+
+def score_mdd(text_blocks: list[TextBlock], workers: Optional[int] = None, threads: bool = False,
+              executor: Optional[Executor] = None) -> np.ndarray:
+    """Return the raw MDD of every block of text_blocks (nan where it cannot be computed), parsing in parallel the
+    same way as score_corpus_with_sentences, but without the Dale-Chall and Flesch scores and the per-sentence counts.
+    """
+    workers = workers or os.cpu_count() or 1
+    with _pool(workers, threads, executor) as executor:
+        parsed = _parse_distinct(text_blocks, workers, executor)
+    return np.array([_block_mdd([com_m.mdd_cache_key(sentence) for sentence in block.excerpt], parsed)[0]
+                     for block in text_blocks], dtype=float)
+
+
+def compare_executors(text_blocks: list[TextBlock], workers: Optional[int] = None) -> dict[str, float]:
+    """Score text_blocks with a process pool and with a thread pool of workers each, starting from empty caches both
+    times, and return the seconds each took and whether they gave the same scores.
+    """
+    timings = {}
+    results = []
+    for name, threads in (('processes', False), ('threads', True)):
+        for cache in (com_m.unfamiliar_cache, com_m.count_cache, com_m.mdd_cache, com_m.syntax_cache):
+            cache.clear()
+        start = time.perf_counter()
+        results.append(score_corpus(text_blocks, workers, threads))
+        timings[name] = time.perf_counter() - start
+    return {**timings, 'speedup': timings['processes'] / timings['threads'],
+            'identical': bool(np.array_equal(results[0], results[1], equal_nan=True))}
+
+
+def standardize_scores(raw_scores: np.ndarray) -> np.ndarray:
+    """Return the standardized grade level of every raw score, with the same shape as raw_scores.
+
+    Scores that are nan stay nan.
+    """
+    return np.column_stack([std.standardize_array(MEASURE_SCALES[measure], raw_scores[:, column])
+                            for column, measure in enumerate(MEASURES)])
+
+
+def standardize_carec(text_blocks: list[TextBlock]) -> np.ndarray:
+    """Return the standardized CAREC_M grade level of every text block."""
+    return std.standardize_array('carec', np.array([block.carec_m for block in text_blocks], dtype=float))
+
+
+# VECTORIZED STATISTICS (each works on the last axis, so a whole stack of bootstrap resamples is scored at once)
+def correlation(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Return the Pearson correlation between predicted and actual along the last axis.
+
+    A resample where either side is constant has no defined correlation and is returned as nan.
+    """
+    pred_centered = predicted - predicted.mean(axis=-1, keepdims=True)
+    actual_centered = actual - actual.mean(axis=-1, keepdims=True)
+    numerator = (pred_centered * actual_centered).sum(axis=-1)
+    denominator = np.sqrt((pred_centered ** 2).sum(axis=-1) * (actual_centered ** 2).sum(axis=-1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return numerator / denominator
+
+
+def mean_absolute_error(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Return the mean absolute difference in grade levels between predicted and actual along the last axis."""
+    return np.abs(predicted - actual).mean(axis=-1)
+
+
+def confusion_matrix(predicted: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Return a len(GRADES) x len(GRADES) matrix where entry [i][j] counts blocks with CAREC_M grade GRADES[i] that
+    were given grade GRADES[j] by the measure.
+
+    Preconditions:
+        - all grades in predicted and actual are in GRADES
+    """
+    matrix = np.zeros((len(GRADES), len(GRADES)), dtype=int)
+    np.add.at(matrix, (actual.astype(int) - GRADES[0], predicted.astype(int) - GRADES[0]), 1)
+    return matrix
+
+
+# BOOTSTRAP CONFIDENCE INTERVALS (resamples are split across worker processes)
+def _bootstrap_worker(predicted: np.ndarray, actual: np.ndarray, n_resamples: int,
+                      seed: np.random.SeedSequence) -> np.ndarray:
+    """Return a (n_resamples, 2) array of (correlation, MAE) for n_resamples bootstrap resamples."""
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, len(predicted), size=(n_resamples, len(predicted)))
+    resampled_pred, resampled_actual = predicted[indices], actual[indices]
+    return np.column_stack([correlation(resampled_pred, resampled_actual),
+                            mean_absolute_error(resampled_pred, resampled_actual)])
+
+
+def bootstrap_ci(predicted: np.ndarray, actual: np.ndarray, n_resamples: int = 1000, confidence: float = 0.95,
+                 workers: Optional[int] = None, seed: int = 111) -> dict[str, tuple[float, float]]:
+    """Return the bootstrap confidence intervals of correlation and MAE between predicted and actual.
+
+    The n_resamples resamples are split evenly across workers processes, each with an independent random stream
+    spawned from seed, so the result is reproducible for a fixed seed and number of workers.
+
+    Preconditions:
+        - len(predicted) == len(actual) > 0
+        - 0 < confidence < 1
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, n_resamples)
+    per_worker = [n_resamples // workers + (1 if i < n_resamples % workers else 0) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(_bootstrap_worker, [predicted] * workers, [actual] * workers, per_worker, seeds))
+    samples = np.concatenate(parts)
+
+    # a measure that gives every block the same grade has no correlation in any resample, so its interval is nan
+    tail = (1 - confidence) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        lower = np.nanpercentile(samples, tail, axis=0)
+        upper = np.nanpercentile(samples, 100 - tail, axis=0)
+    return {'correlation': (float(lower[0]), float(upper[0])), 'mae': (float(lower[1]), float(upper[1]))}
+
+
+# DALE-CHALL VALIDATION (our batched Dale-Chall scores against the New Dale-Chall column of the CSV file)
+def validate_dale_chall(text_blocks: list[TextBlock]) -> dict[str, float]:
+    """Return how closely the Dale-Chall scores of com_m.dale_chall_corpus match the stored New Dale-Chall Readability
+    Formula scores: their correlation, MAE, mean difference (computed - stored), the fraction of blocks given the same
+    grade by the revised formula table, and the number of seconds the batched scoring took.
+    """
+    word_list = com_m.dale_chall_word_list()
+    start = time.perf_counter()
+    _, computed = com_m.dale_chall_corpus(text_blocks, word_list)
+    elapsed = time.perf_counter() - start
+
+    stored = np.array([np.nan if block.dale_chall is None else block.dale_chall for block in text_blocks], dtype=float)
+    valid = ~np.isnan(stored)
+    computed, stored = computed[valid], stored[valid]
+    same_grade = (std.standardize_array('dale_chall_revised', computed)
+                  == std.standardize_array('dale_chall_revised', stored))
+    return {'n': int(valid.sum()),
+            'correlation': float(correlation(computed, stored)),
+            'mae': float(mean_absolute_error(computed, stored)),
+            'mean_difference': float((computed - stored).mean()),
+            'grade_agreement': float(same_grade.mean()),
+            'seconds': elapsed}
+
+
+# PARSER BACKEND COMPARISON (how well the heuristic parser's MDD tracks the spaCy MDD, and how much faster it is)
+def mdd_with_backend(text_blocks: list[TextBlock], backend: str) -> tuple[np.ndarray, float]:
+    """Return the MDD of every text block computed with the given parser backend (nan where it cannot be computed),
+    and the number of seconds it took.
+
+    The timing starts from an empty com_m.mdd_cache, so that it measures parsing rather than cache hits of an earlier
+    run (only sentences repeated within text_blocks are reused). The previously cached MDDs, and the previously
+    selected backend, are restored afterwards, even if the parse fails.
+    """
+    previous = ct.get_backend().name
+    cached, com_m.mdd_cache.values = com_m.mdd_cache.values, {}
+    try:
+        ct.use_backend(backend)
+        scores = np.full(len(text_blocks), np.nan)
+        start = time.perf_counter()
+        for i, block in enumerate(text_blocks):
+            try:
+                scores[i] = com_m.mean_dependency_distance(block, False)
+            except (ZeroDivisionError, AttributeError):
+                pass
+        elapsed = time.perf_counter() - start
+    finally:
+        cached.update(com_m.mdd_cache.values)
+        com_m.mdd_cache.values = cached
+        ct.use_backend(previous)
+    return scores, elapsed
+
+
+def compare_parser_backends(text_blocks: list[TextBlock], reference: str = 'spacy',
+                            candidate: str = 'heuristic') -> dict[str, float]:
+    """Return how closely the MDD from the candidate backend matches the MDD from the reference backend: their
+    correlation, MAE, the fraction of blocks given the same standardized grade, and the throughput of each backend in
+    sentences per second.
+    """
+    reference_mdd, reference_time = mdd_with_backend(text_blocks, reference)
+    candidate_mdd, candidate_time = mdd_with_backend(text_blocks, candidate)
+    num_sentences = sum(len(block.excerpt) for block in text_blocks)
+
+    valid = ~np.isnan(reference_mdd) & ~np.isnan(candidate_mdd)
+    reference_mdd, candidate_mdd = reference_mdd[valid], candidate_mdd[valid]
+    same_grade = std.standardize_array('mdd', reference_mdd) == std.standardize_array('mdd', candidate_mdd)
+    return {'n': int(valid.sum()),
+            'correlation': float(correlation(candidate_mdd, reference_mdd)),
+            'mae': float(mean_absolute_error(candidate_mdd, reference_mdd)),
+            'grade_agreement': float(same_grade.mean()),
+            f'{reference}_sentences_per_second': num_sentences / reference_time,
+            f'{candidate}_sentences_per_second': num_sentences / candidate_time,
+            'speedup': reference_time / candidate_time}
+
+
+# REPORT
+def compare(predicted: np.ndarray, actual: np.ndarray, n_resamples: int = 1000,
+            workers: Optional[int] = None) -> dict:
+    """Return the correlation, MAE, confusion matrix and bootstrap intervals of predicted grades against actual grades.
+
+    Pairs where the measure could not be computed are dropped before comparing.
+    """
+    valid = ~np.isnan(predicted)
+    predicted, actual = predicted[valid], actual[valid]
+    result = {'n': int(len(predicted)),
+              'correlation': float(correlation(predicted, actual)) if len(predicted) > 1 else float('nan'),
+              'mae': float(mean_absolute_error(predicted, actual)) if len(predicted) > 0 else float('nan'),
+              'confusion_matrix': confusion_matrix(predicted, actual)}
+    if len(predicted) > 1 and n_resamples > 0:
+        result['ci'] = bootstrap_ci(predicted, actual, n_resamples, workers=workers)
+    return result
+
+
+def evaluate(text_blocks: list[TextBlock], n_resamples: int = 1000, workers: Optional[int] = None) -> dict:
+    """Return the evaluation report of every measure against CAREC_M.
+
+    The report maps a group name ('all', 'category=Lit', 'location=start', ...) to a dictionary mapping each measure
+    in MEASURES to the output of compare() for the blocks of that group.
+    """
+    grades = standardize_scores(score_corpus(text_blocks, workers))
+    carec = standardize_carec(text_blocks)
+
+    groups = {'all': np.ones(len(text_blocks), dtype=bool)}
+    for attribute in ('category', 'location'):
+        values = np.array([getattr(block, attribute) for block in text_blocks])
+        for value in sorted(set(values)):
+            groups[f'{attribute}={value}'] = values == value
+
+    return {name: {measure: compare(grades[mask, column], carec[mask], n_resamples, workers)
+                   for column, measure in enumerate(MEASURES)}
+            for name, mask in groups.items()}
+
+
+def print_report(report: dict) -> None:
+    """Print a summary table of an evaluation report returned by evaluate()."""
+    print(f"{'group':<18}{'measure':<12}{'n':>6}{'r':>8}{'r 95% CI':>18}{'MAE':>8}{'MAE 95% CI':>18}")
+    for group, measures in report.items():
+        for measure, result in measures.items():
+            ci = result.get('ci', {'correlation': (np.nan, np.nan), 'mae': (np.nan, np.nan)})
+            r_ci = '[{:.3f}, {:.3f}]'.format(*ci['correlation'])
+            mae_ci = '[{:.2f}, {:.2f}]'.format(*ci['mae'])
+            print(f"{group:<18}{measure:<12}{result['n']:>6}{result['correlation']:>8.3f}{r_ci:>18}"
+                  f"{result['mae']:>8.2f}{mae_ci:>18}")
+
+
+if __name__ == '__main__':
+    corpus = read_csv('data/data_set_novels.csv')
+    print_report(evaluate(corpus))
+    print(validate_dale_chall(corpus))
+    print(compare_parser_backends(corpus))
+    print(com_m.cache_stats())
+    print(compare_executors(corpus))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["contextlib", "os", "warnings", "concurrent.futures", "typing", "numpy",
+                          "complexity_measures", "create_tree", "standardization", "data_processing", "time"],
+        'allowed-io': ["print_report"]
+    })
@@ -0,0 +1,223 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains the export stage of the scoring pipeline: the per-sentence and per-block metrics computed while the
+corpus is scored are streamed to files, instead of being thrown away once the averages are plotted.
+
+Two files are written, with one record per sentence and one record per text block:
+    - sentence records: the block ID, the position of the sentence in its block, its word, syllable and unfamiliar
+      word counts, and its MDD
+    - block records: the metadata and stored scores of the block, its number of sentences, and its computed
+      Dale-Chall, Flesch Reading Ease and MDD scores
+
+The corpus is scored batch_size blocks at a time, and the records of each batch are written before the next batch is
+scored, so at most one batch of records is ever held in memory. The output is either JSON Lines (one JSON object per
+line) or Parquet (one row group per batch, which needs pyarrow), and both can be read back in chunks by pandas, polars,
+duckdb, etc.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import json
+import math
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+import evaluation
+from data_processing import TextBlock, read_csv
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_FORMATS = ('jsonl', 'parquet')
+SENTENCE_FIELDS = ('block_id', 'sentence_index', 'words', 'syllables', 'unfamiliar_words', 'mdd')
+BLOCK_FIELDS = ('block_id', 'author', 'title', 'pub_year', 'category', 'location', 'carec_m', 'flesch_reading',
+                'dale_chall', 'sentence_count', 'computed_dale_chall', 'computed_flesch', 'mdd')
+# the pyarrow type (by its alias) of every field, so that every batch is written with the same Parquet schema
+FIELD_TYPES = {'block_id': 'int64', 'sentence_index': 'int64', 'words': 'int64', 'syllables': 'int64',
+               'unfamiliar_words': 'int64', 'mdd': 'double', 'author': 'string', 'title': 'string',
+               'pub_year': 'int64', 'category': 'string', 'location': 'string', 'carec_m': 'double',
+               'flesch_reading': 'double', 'dale_chall': 'double', 'sentence_count': 'int64',
+               'computed_dale_chall': 'double', 'computed_flesch': 'double'}
+
+
+class MetricsWriter:
+    """
+    An interface for a file that metric records are streamed to, one batch at a time.
+
+    Instance Attributes:
+    - path: the file the records are written to
+    - fields: the fields of every record, in order (SENTENCE_FIELDS or BLOCK_FIELDS)
+    - records_written: the number of records written so far
+    """
+    path: str
+    fields: tuple[str, ...]
+    records_written: int
+
+    def write_batch(self, records: list[dict[str, Any]]) -> None:
+        """Append records to the file."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Finish writing the file."""
+        raise NotImplementedError
+
+
+class JsonlWriter(MetricsWriter):
+    """
+    Writes records as JSON Lines, with nan (a measure that could not be computed) written as null.
+
+    Instance Attributes:
+    - file: the open output file
+    """
+    file: Any
+
+    def __init__(self, path: str, fields: tuple[str, ...]) -> None:
+        """Open path for writing records of the given fields, replacing any existing file."""
+        self.path = path
+        self.fields = fields
+        self.records_written = 0
+        self.file = open(path, 'w')
+
+    def write_batch(self, records: list[dict[str, Any]]) -> None:
+        """Append one line per record to the file."""
+        self.file.writelines(json.dumps(_json_safe(record)) + '\n' for record in records)
+        self.records_written += len(records)
+
+    def close(self) -> None:
+        """Close the file."""
+        self.file.close()
+
+
+class ParquetWriter(MetricsWriter):
+    """
+    Writes records as a Parquet file, one row group per batch, with the schema given by FIELD_TYPES (rather than
+    inferred from the first batch, which may be missing values that later batches have).
+
+    Instance Attributes:
+    - schema: the pyarrow schema of the records
+    - writer: the pyarrow writer, created when the first batch is written
+    """
+    schema: Any
+    writer: Optional[Any]
+
+    def __init__(self, path: str, fields: tuple[str, ...]) -> None:
+        """Prepare to write records of the given fields to path, raising ImportError if pyarrow is not installed."""
+        if pyarrow is None:
+            raise ImportError('pyarrow is needed to export metrics to Parquet')
+        self.path = path
+        self.fields = fields
+        self.records_written = 0
+        self.schema = pyarrow.schema([(field, pyarrow.type_for_alias(FIELD_TYPES[field])) for field in fields])
+        self.writer = None
+
+    def write_batch(self, records: list[dict[str, Any]]) -> None:
+        """Append records to the file as one row group."""
+        if not records:
+            return
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(pyarrow.Table.from_pylist(records, schema=self.schema))
+        self.records_written += len(records)
+
+    def close(self) -> None:
+        """Write the Parquet footer and close the file."""
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {'jsonl': JsonlWriter, 'parquet': ParquetWriter}
+
+
+def _json_safe(record: dict[str, Any]) -> dict[str, Any]:
+    """Return record with every nan float replaced by None, since nan is not valid JSON.
+
+    >>> _json_safe({'mdd': float('nan'), 'words': 3})
+    {'mdd': None, 'words': 3}
+    """
+    return {key: None if isinstance(value, float) and math.isnan(value) else value for key, value in record.items()}
+
+
+def sentence_records(text_block: TextBlock, sentence_scores: np.ndarray) -> list[dict[str, Any]]:
+    """Return the metric record of every sentence in text_block, in order, from sentence_scores, its rows of the
+    sentence scores of evaluation.score_corpus_with_sentences (so no sentence is counted or parsed again).
+    """
+    return [dict(zip(SENTENCE_FIELDS, (text_block.id, i, int(words), int(syllables), int(unfamiliar), float(mdd))))
+            for i, (words, syllables, unfamiliar, mdd) in enumerate(sentence_scores.tolist())]
+
+
+def publication_year(pub_year: Optional[int | str]) -> Optional[int]:
+    """Return pub_year as an int, or None if it is unknown. read_csv keeps the year as the text of the CSV file, and
+    leaves it at 0 when that is empty.
+
+    >>> publication_year('1851'), publication_year(0), publication_year('')
+    (1851, None, None)
+    """
+    return int(pub_year or 0) or None
+
+
+def block_record(text_block: TextBlock, scores: tuple[float, float, float]) -> dict[str, Any]:
+    """Return the metric record of text_block, given its raw (Dale-Chall, Flesch Reading Ease, MDD) scores."""
+    record = {'block_id': text_block.id}
+    record.update((field, getattr(text_block, field)) for field in BLOCK_FIELDS[1:9])
+    record['pub_year'] = publication_year(text_block.pub_year)
+    # TextBlock.sentence_count is the number of characters of the excerpt as read_csv sets it, not of its sentences
+    record['sentence_count'] = len(text_block.excerpt)
+    record.update(zip(BLOCK_FIELDS[10:], (float(score) for score in scores)))
+    return record
+
+
+def _batches(text_blocks: list[TextBlock], batch_size: int) -> Iterator[list[TextBlock]]:
+    """Yield consecutive slices of text_blocks of at most batch_size blocks."""
+    for start in range(0, len(text_blocks), batch_size):
+        yield text_blocks[start:start + batch_size]
+
+
+def export_metrics(text_blocks: list[TextBlock], sentence_file: str, block_file: str, export_format: str = 'jsonl',
+                   batch_size: int = 500, workers: Optional[int] = None) -> dict[str, int]:
+    """Score text_blocks batch_size blocks at a time, write the per-sentence metrics to sentence_file and the per-block
+    metrics to block_file as each batch is done, and return how many records of each kind were written.
+
+    Each batch is scored with evaluation.score_corpus_with_sentences, using workers processes.
+
+    Preconditions:
+        - export_format in EXPORT_FORMATS
+        - batch_size > 0
+    """
+    sentence_writer = WRITERS[export_format](sentence_file, SENTENCE_FIELDS)
+    block_writer = WRITERS[export_format](block_file, BLOCK_FIELDS)
+    try:
+        for batch in _batches(text_blocks, batch_size):
+            scores, sentence_scores = evaluation.score_corpus_with_sentences(batch, workers)
+            offsets = np.cumsum([0] + [len(block.excerpt) for block in batch])
+            sentence_writer.write_batch([record for i, block in enumerate(batch) for record in
+                                         sentence_records(block, sentence_scores[offsets[i]:offsets[i + 1]])])
+            block_writer.write_batch([block_record(block, block_scores) for block, block_scores in zip(batch, scores)])
+    finally:
+        sentence_writer.close()
+        block_writer.close()
+    return {'sentences': sentence_writer.records_written, 'blocks': block_writer.records_written}
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    print(export_metrics(read_csv('data/data_set_novels.csv'), 'data/sentence_metrics.jsonl',
+                         'data/block_metrics.jsonl'))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["json", "math", "typing", "numpy", "pyarrow", "pyarrow.parquet", "evaluation",
+                          "data_processing"],
+        'allowed-io': ["JsonlWriter.__init__"]
+    })
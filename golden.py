@@ -0,0 +1,220 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains the golden scores of the corpus, to catch a change to the scores when a measure is rewritten (for
+example to make num_syllables, the MDD parse or read_csv faster).
+
+write_golden scores every block and every sentence of data_set_novels.csv with every measure, and freezes the results
+in data/golden_scores.npz:
+    - per block: every measure in BLOCK_MEASURES, and the number of sentences and characters read_csv found
+    - per sentence: every measure in SENTENCE_MEASURES, including a checksum of the normalized phrase, so that a change
+      to how read_csv splits or cleans the excerpts shows up too
+check_golden then scores the same blocks (or any subset of them, for a quick check) with the current code, compares
+every value with the golden one within a tolerance, and reports which blocks diverged, and on which measures.
+
+The golden file is committed, computed with the GOLDEN_BACKEND parser from the corpus in data.zip. It is only ever
+written by calling write_golden on purpose (after checking that a change to the scores is intended): a missing golden
+file is an error, since scores written by the code under test would always match it.
+
+Both score the blocks in parallel, in chunks handed out to a process pool.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import os
+import time
+import zlib
+from typing import Callable, Optional
+
+import numpy as np
+
+import complexity_measures as com_m
+import create_tree as ct
+import evaluation
+from data_processing import TextBlock, Sentence, read_csv
+
+GOLDEN_FILE = 'data/golden_scores.npz'
+# the parser backend the committed golden file was computed with (the one that needs no model to be installed)
+GOLDEN_BACKEND = 'heuristic'
+BLOCK_MEASURES = ('num_sentences', 'excerpt_length', 'dale_chall', 'mdd', 'word_frequency', *com_m.COUNT_FORMULAS,
+                  *com_m.SYNTAX_METRICS)
+SENTENCE_MEASURES = ('phrase_checksum', 'word_count', 'words', 'syllables', 'polysyllables', 'characters',
+                     'unfamiliar_words', 'mdd', *com_m.SYNTAX_METRICS)
+# the default (relative, absolute) tolerance of every measure, which check_golden's tolerances can override
+DEFAULT_TOLERANCE = (1e-9, 1e-12)
+
+
+def _syntax_row(metrics: dict[str, float]) -> list[float]:
+    """Return the syntactic metrics in the order of com_m.SYNTAX_METRICS."""
+    return [metrics[name] for name in com_m.SYNTAX_METRICS]
+
+
+def _try_syntax(measure: Callable, argument: TextBlock | Sentence) -> list[float]:
+    """Return the syntactic metrics measure(argument) gives, or nan for all of them if it cannot be computed."""
+    try:
+        return _syntax_row(measure(argument))
+    except (ZeroDivisionError, AttributeError):
+        return [float('nan')] * len(com_m.SYNTAX_METRICS)
+
+
+def block_scores(text_block: TextBlock) -> list[float]:
+    """Return the score of text_block for every measure in BLOCK_MEASURES, nan where it cannot be computed."""
+    counts = com_m.block_counts(text_block)
+    return [len(text_block.excerpt), text_block.sentence_count,
+            evaluation.try_score(com_m.dale_chall_complexity, text_block),
+            evaluation.try_score(com_m.mean_dependency_distance, text_block, False),
+            evaluation.try_score(com_m.word_frequency_complexity, text_block),
+            *(evaluation.try_score(formula, counts) for formula in com_m.COUNT_FORMULAS.values()),
+            *_try_syntax(com_m.syntactic_complexity, text_block)]
+
+
+def sentence_scores(sentence: Sentence, word_list: set[str]) -> list[float]:
+    """Return the score of sentence for every measure in SENTENCE_MEASURES, nan where it cannot be computed."""
+    words, syllables, polysyllables, characters = com_m.count_cache.get(sentence.phrase, com_m.count_sentence, sentence)
+    unfamiliar = com_m.unfamiliar_cache.get(sentence.phrase, com_m.count_unfamiliar, sentence, word_list)[1]
+    return [zlib.crc32(sentence.normalized_phrase.encode('utf-8')), sentence.word_count,
+            words, syllables, polysyllables, characters, unfamiliar,
+            evaluation.try_score(com_m.mean_dependency_distance_sentence, sentence),
+            *_try_syntax(com_m.syntactic_complexity_sentence, sentence)]
+
+
+def _score_chunk(text_blocks: list[TextBlock]) -> tuple[np.ndarray, np.ndarray]:
+    """Return the block scores of every block in text_blocks, and the sentence scores of all of their sentences."""
+    word_list = com_m.dale_chall_word_list()
+    blocks = [block_scores(block) for block in text_blocks]
+    sentences = [sentence_scores(sentence, word_list) for block in text_blocks for sentence in block.excerpt]
+    return (np.array(blocks, dtype=float).reshape(-1, len(BLOCK_MEASURES)),
+            np.array(sentences, dtype=float).reshape(-1, len(SENTENCE_MEASURES)))
+
+
+def score_all(text_blocks: list[TextBlock], workers: Optional[int] = None) -> tuple[np.ndarray, np.ndarray]:
+    """Return a (len(text_blocks), len(BLOCK_MEASURES)) array of block scores and a (number of sentences,
+    len(SENTENCE_MEASURES)) array of sentence scores (in block order), scored in chunks by workers processes (all cores
+    by default).
+    """
+    workers = workers or os.cpu_count() or 1
+    # the lexicon is loaded (or built) once here, so the workers do not all build it at the same time
+    com_m.load_word_lexicon()
+    chunk_size = max(1, len(text_blocks) // (workers * 8))
+    chunks = [text_blocks[start:start + chunk_size] for start in range(0, len(text_blocks), chunk_size)]
+    with ct.process_pool(workers) as executor:
+        results = list(executor.map(_score_chunk, chunks))
+    return (np.concatenate([blocks for blocks, _ in results] or [np.empty((0, len(BLOCK_MEASURES)))]),
+            np.concatenate([sentences for _, sentences in results] or [np.empty((0, len(SENTENCE_MEASURES)))]))
+
+
+def write_golden(csv_file: str = 'data/data_set_novels.csv', golden_file: str = GOLDEN_FILE,
+                 workers: Optional[int] = None) -> int:
+    """Score every block of csv_file with the current code, save the scores as the golden ones in golden_file, and
+    return the number of blocks.
+    """
+    text_blocks = read_csv(csv_file)
+    blocks, sentences = score_all(text_blocks, workers)
+    np.savez_compressed(golden_file, backend=np.array(ct.get_backend().name),
+                        block_measures=np.array(BLOCK_MEASURES), sentence_measures=np.array(SENTENCE_MEASURES),
+                        block_ids=np.array([block.id for block in text_blocks], dtype=np.int64),
+                        sentence_blocks=np.repeat(np.arange(len(text_blocks)),
+                                                  [len(block.excerpt) for block in text_blocks]),
+                        blocks=blocks, sentences=sentences)
+    return len(text_blocks)
+
+
+def _diverged(current: np.ndarray, golden: np.ndarray, measures: tuple[str, ...],
+              tolerances: dict[str, tuple[float, float]]) -> np.ndarray:
+    """Return a boolean array of the same shape as current, of the values that are not within the tolerance of their
+    measure (the column of the same position in measures) of the golden value. nan only matches nan.
+    """
+    diverged = np.zeros(current.shape, dtype=bool)
+    for column, measure in enumerate(measures):
+        rtol, atol = tolerances.get(measure, DEFAULT_TOLERANCE)
+        diverged[:, column] = ~np.isclose(current[:, column], golden[:, column], rtol=rtol, atol=atol, equal_nan=True)
+    return diverged
+
+
+def check_golden(text_blocks: list[TextBlock], golden_file: str = GOLDEN_FILE,
+                 tolerances: Optional[dict[str, tuple[float, float]]] = None,
+                 workers: Optional[int] = None) -> dict:
+    """Score text_blocks with the current code and compare them with their golden scores in golden_file.
+
+    text_blocks can be any subset of the blocks the golden file was written from, matched by ID. tolerances maps a
+    measure (of BLOCK_MEASURES or SENTENCE_MEASURES, which share the names 'mdd' and the syntactic metrics) to its
+    (relative, absolute) tolerance, DEFAULT_TOLERANCE otherwise.
+
+    Return a report of the number of blocks checked, the IDs of the blocks that diverged (on any measure of the block
+    or of one of its sentences, or by having a different number of sentences), the IDs of the blocks missing from the
+    golden file, how many blocks diverged on each measure and by how much at most, and the number of seconds taken.
+    Raise FileNotFoundError if there is no golden file, and ValueError if it was written with a different parser
+    backend or different measures.
+    """
+    tolerances = tolerances or {}
+    start = time.perf_counter()
+    if not os.path.exists(golden_file):
+        raise FileNotFoundError(f'there are no golden scores in {golden_file}: restore the committed file, or call '
+                                f'write_golden on purpose to write new ones')
+    with np.load(golden_file) as golden:
+        golden = dict(golden)
+    if str(golden['backend']) != ct.get_backend().name:
+        raise ValueError(f"the golden scores were computed with the {golden['backend']} parser, "
+                         f"not {ct.get_backend().name}")
+    if tuple(golden['block_measures']) != BLOCK_MEASURES or tuple(golden['sentence_measures']) != SENTENCE_MEASURES:
+        raise ValueError('the golden scores were computed for different measures')
+
+    rows = {int(block_id): row for row, block_id in enumerate(golden['block_ids'])}
+    missing = [block.id for block in text_blocks if block.id not in rows]
+    text_blocks = [block for block in text_blocks if block.id in rows]
+    blocks, sentences = score_all(text_blocks, workers)
+
+    golden_rows = np.array([rows[block.id] for block in text_blocks], dtype=np.int64)
+    block_diverged = _diverged(blocks, golden['blocks'][golden_rows], BLOCK_MEASURES, tolerances)
+
+    # the golden sentences of a block are the rows from its first to its last in sentence_blocks
+    first_sentence = np.searchsorted(golden['sentence_blocks'], np.arange(len(golden['block_ids'])))
+    last_sentence = np.searchsorted(golden['sentence_blocks'], np.arange(len(golden['block_ids'])), side='right')
+    lengths = np.array([len(block.excerpt) for block in text_blocks], dtype=np.int64)
+    same_length = lengths == (last_sentence - first_sentence)[golden_rows]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    sentence_diverged = np.zeros((len(text_blocks), len(SENTENCE_MEASURES)), dtype=bool)
+    sentence_differences = np.zeros(len(SENTENCE_MEASURES))
+    for i in np.flatnonzero(same_length):
+        current = sentences[offsets[i]:offsets[i + 1]]
+        expected = golden['sentences'][first_sentence[golden_rows[i]]:last_sentence[golden_rows[i]]]
+        sentence_diverged[i] = _diverged(current, expected, SENTENCE_MEASURES, tolerances).any(axis=0)
+        # fmax skips nan, so a measure that is nan on both sides does not hide the differences of the others
+        sentence_differences = np.fmax.reduce(np.vstack([sentence_differences, np.abs(current - expected)]), axis=0)
+
+    block_differences = np.fmax.reduce(np.abs(blocks - golden['blocks'][golden_rows]), axis=0, initial=0)
+    by_measure = {}
+    for prefix, measures, diverged, differences in (('block', BLOCK_MEASURES, block_diverged, block_differences),
+                                                    ('sentence', SENTENCE_MEASURES, sentence_diverged,
+                                                     sentence_differences)):
+        for column, measure in enumerate(measures):
+            by_measure[f'{prefix}.{measure}'] = {'diverged_blocks': int(diverged[:, column].sum()),
+                                                 'max_abs_difference': float(differences[column])}
+    by_measure['sentence.count'] = {'diverged_blocks': int((~same_length).sum()), 'max_abs_difference': float(
+        np.abs(lengths - (last_sentence - first_sentence)[golden_rows]).max(initial=0))}
+
+    any_diverged = block_diverged.any(axis=1) | sentence_diverged.any(axis=1) | ~same_length
+    return {'blocks_checked': len(text_blocks),
+            'diverged': [block.id for block, diverged in zip(text_blocks, any_diverged) if diverged],
+            'missing': missing,
+            'by_measure': by_measure,
+            'seconds': time.perf_counter() - start}
+
+
+if __name__ == '__main__':
+    ct.use_backend(GOLDEN_BACKEND)
+    golden_report = check_golden(read_csv('data/data_set_novels.csv'))
+    print(len(golden_report['diverged']), 'of', golden_report['blocks_checked'], 'blocks diverged')
+    print({measure: result for measure, result in golden_report['by_measure'].items() if result['diverged_blocks']})
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["os", "time", "zlib", "typing", "numpy", "complexity_measures",
+                          "create_tree", "evaluation", "data_processing"],
+        'allowed-io': []
+    })
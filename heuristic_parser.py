@@ -0,0 +1,383 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains a lightweight, rule-based dependency parser that approximates the spaCy parse used for Mean
+Dependency Distance (MDD). It needs no model, so MDD can still be computed on machines without en_core_web_sm, and it
+is orders of magnitude faster than the neural parser.
+
+Parsing happens in three steps:
+    1. Tokenize with a regular expression (words, contractions and punctuation marks).
+    2. Tag every token with a coarse part of speech, using closed-class word lists and suffix rules.
+    3. Attach every token to a head with a few spaCy-style attachment rules (determiners and adjectives to the next
+       noun, auxiliaries to the next verb, prepositions to the word before them, and so on).
+
+The tokens produced have the same attributes that create_tree.to_nltk_tree reads from spaCy tokens, so the rest of the
+MDD code does not need to know which parser was used. The result is only an approximation: see
+evaluation.compare_parser_backends for how closely it tracks the spaCy MDD on data_set_novels.csv.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import re
+from typing import Optional
+
+TOKEN_PATTERN = re.compile(r"\w+(?:['’]\w+)*|[^\w\s]")
+
+# Closed word classes, tagged with (a subset of) the Penn Treebank tags that spaCy's tagger uses
+CLOSED_CLASS_TAGS = {
+    **{word: 'DT' for word in ('a', 'an', 'the', 'this', 'that', 'these', 'those', 'each', 'every', 'some', 'any',
+                               'no', 'another', 'all', 'both', 'either', 'neither')},
+    **{word: 'PRP$' for word in ('my', 'your', 'his', 'her', 'its', 'our', 'their')},
+    **{word: 'PRP' for word in ('i', 'you', 'he', 'she', 'it', 'we', 'they', 'me', 'him', 'us', 'them', 'myself',
+                                'yourself', 'himself', 'herself', 'itself', 'ourselves', 'themselves')},
+    **{word: 'IN' for word in ('of', 'in', 'on', 'at', 'by', 'for', 'with', 'from', 'into', 'onto', 'upon', 'about',
+                               'over', 'under', 'through', 'between', 'among', 'against', 'during', 'without',
+                               'within', 'along', 'across', 'behind', 'beyond', 'toward', 'towards', 'near', 'like',
+                               'after', 'before', 'around', 'down', 'up', 'out', 'off', 'past', 'above', 'below')},
+    **{word: 'SC' for word in ('because', 'although', 'though', 'while', 'when', 'whenever', 'if', 'unless', 'since',
+                               'until', 'whether', 'where', 'wherever', 'as', 'than', 'so')},
+    **{word: 'WDT' for word in ('which', 'who', 'whom', 'whose', 'what', 'why', 'how')},
+    **{word: 'CC' for word in ('and', 'or', 'but', 'nor', 'yet')},
+    **{word: 'MD' for word in ('can', 'could', 'will', 'would', 'shall', 'should', 'may', 'might', 'must')},
+    **{word: 'AUX' for word in ('is', 'am', 'are', 'was', 'were', 'be', 'been', 'being', 'has', 'have', 'had',
+                                'do', 'does', 'did')},
+    **{word: 'RB' for word in ('not', 'never', 'very', 'too', 'also', 'just', 'only', 'then', 'there', 'here', 'now',
+                               'again', 'still', 'even', 'always', 'often', 'soon', 'once', 'quite', 'almost')},
+    'to': 'TO'
+}
+
+# Suffix rules for open-class words, checked in order; the first match wins
+SUFFIX_TAGS = (('ly', 'RB'), ('ing', 'VBG'), ('ed', 'VBD'), ('tion', 'NN'), ('sion', 'NN'), ('ment', 'NN'),
+               ('ness', 'NN'), ('ity', 'NN'), ('ous', 'JJ'), ('ful', 'JJ'), ('ive', 'JJ'), ('able', 'JJ'),
+               ('ible', 'JJ'), ('al', 'JJ'), ('less', 'JJ'), ('ish', 'JJ'), ('ize', 'VB'), ('ise', 'VB'),
+               ('ify', 'VB'), ('s', 'NNS'))
+
+NOMINAL_TAGS = {'NN', 'NNS', 'NNP', 'PRP', 'CD'}
+MAIN_VERB_TAGS = {'VB', 'VBD', 'VBG', 'VBZ'}
+VERBAL_TAGS = MAIN_VERB_TAGS | {'AUX'}
+PUNCTUATION_TAGS = {'.', ','}
+MODIFIER_TAGS = {'DT', 'PRP$', 'JJ', 'CD'}
+
+
+class HeuristicToken:
+    """
+    A token of a heuristic parse, exposing the attributes of a spaCy Token that create_tree.to_nltk_tree uses.
+
+    Instance Attributes:
+    - i: the index of the token in its sentence
+    - orth_: the text of the token
+    - tag_: the part of speech tag of the token
+    - dep_: the dependency label of the token ('ROOT' for the root)
+    - head: the token this token depends on (the root is its own head, as in spaCy)
+    - children: the tokens that depend on this token, in sentence order
+    """
+    i: int
+    orth_: str
+    tag_: str
+    dep_: str
+    head: Optional[HeuristicToken]
+    children: list[HeuristicToken]
+
+    def __init__(self, i: int, orth: str, tag: str) -> None:
+        """Initialize an unattached token."""
+        self.i = i
+        self.orth_ = orth
+        self.tag_ = tag
+        self.dep_ = 'dep'
+        self.head = None
+        self.children = []
+
+    @property
+    def n_lefts(self) -> int:
+        """The number of children to the left of this token."""
+        return sum(1 for child in self.children if child.i < self.i)
+
+    @property
+    def n_rights(self) -> int:
+        """The number of children to the right of this token."""
+        return sum(1 for child in self.children if child.i > self.i)
+
+
+def tokenize(sentence: str) -> list[str]:
+    """Return the words and punctuation marks of sentence.
+
+    >>> tokenize("The girl didn't eat an apple.")
+    ['The', 'girl', "didn't", 'eat', 'an', 'apple', '.']
+    """
+    return TOKEN_PATTERN.findall(sentence)
+
+
+def tag_word(word: str, previous_tag: Optional[str]) -> str:
+    """Return the (approximate) Penn Treebank part of speech tag of word, given the tag of the word before it.
+
+    >>> [tag_word(word, None) for word in ['The', 'quickly', 'running', ',']]
+    ['DT', 'RB', 'VBG', ',']
+    >>> tag_word('fights', 'PRP')
+    'VBZ'
+    """
+    lower = word.lower()
+    if not word[0].isalnum():
+        return ',' if word in {',', ';', ':'} else '.'
+    if lower in CLOSED_CLASS_TAGS:
+        return CLOSED_CLASS_TAGS[lower]
+    if word.isdigit():
+        return 'CD'
+    if "'" in lower or '’' in lower:
+        return 'AUX' if lower.endswith(("n't", 'n’t')) else 'PRP'
+    if previous_tag in {'TO', 'MD'}:
+        return 'VB'
+    if word[0].isupper() and previous_tag is not None:
+        return 'NNP'
+    suffix_tag = _suffix_tag(lower)
+    if suffix_tag == 'NNS' and previous_tag in {'PRP', 'WDT'}:
+        return 'VBZ'
+    if suffix_tag is not None:
+        return suffix_tag
+    # an unknown word right after a subject is most likely its verb; otherwise assume it is a noun
+    return 'VBD' if previous_tag in {'PRP', 'WDT'} else 'NN'
+
+
+def _suffix_tag(lower: str) -> Optional[str]:
+    """Return the tag given to the lowercase word by SUFFIX_TAGS, or None if no suffix rule applies."""
+    for suffix, tag in SUFFIX_TAGS:
+        if lower.endswith(suffix) and len(lower) > len(suffix) + 2:
+            return tag
+    return None
+
+
+def _guess_missing_verbs(tokens: list[HeuristicToken]) -> None:
+    """Retag a verb in every clause that was left without one.
+
+    Irregular verbs ('ate', 'ran', 'took') have no suffix to recognize them by, so tag_word guesses that they are
+    nouns. In a clause with no verb, the first such guessed noun that directly follows another noun is most likely the
+    verb of that clause, as long as something follows it.
+    """
+    clause = []
+    for token in tokens + [None]:
+        if token is not None and token.tag_ not in {'.', 'CC', 'SC', 'WDT'}:
+            clause.append(token)
+            continue
+        if not any(word.tag_ in VERBAL_TAGS for word in clause):
+            for before, word, after in zip(clause, clause[1:], clause[2:]):
+                lower = word.orth_.lower()
+                if before.tag_ in NOMINAL_TAGS and word.tag_ == 'NN' and lower == word.orth_ \
+                        and after.tag_ not in PUNCTUATION_TAGS \
+                        and lower not in CLOSED_CLASS_TAGS and _suffix_tag(lower) is None:
+                    word.tag_ = 'VBD'
+                    break
+        clause = []
+
+
+def parse(sentence: str) -> list[HeuristicToken]:
+    """Return the tokens of sentence, each attached to its (approximate) head.
+
+    >>> tokens = parse('The girl ate an apple.')
+    >>> [(token.orth_, token.head.orth_, token.dep_) for token in tokens]
+    [('The', 'girl', 'det'), ('girl', 'ate', 'nsubj'), ('ate', 'ate', 'ROOT'), ('an', 'apple', 'det'), \
+('apple', 'ate', 'dobj'), ('.', 'ate', 'punct')]
+    """
+    tokens = []
+    previous_tag = None
+    for i, word in enumerate(tokenize(sentence)):
+        tokens.append(HeuristicToken(i, word, tag_word(word, previous_tag)))
+        if tokens[-1].tag_ != 'RB':
+            previous_tag = tokens[-1].tag_
+    if not tokens:
+        return tokens
+    _guess_missing_verbs(tokens)
+
+    root = _find_root(tokens)
+    root.head, root.dep_ = root, 'ROOT'
+    for token in tokens:
+        if token is not root:
+            _attach(token, tokens, root)
+    _break_cycles(tokens, root)
+    for token in tokens:
+        if token is not root:
+            token.head.children.append(token)
+    return tokens
+
+
+def _break_cycles(tokens: list[HeuristicToken], root: HeuristicToken) -> None:
+    """Attach to the root any token whose chain of heads loops without reaching the root, so that every token ends up
+    in the tree.
+    """
+    for token in tokens:
+        seen = set()
+        ancestor = token
+        while ancestor is not root and ancestor.i not in seen:
+            seen.add(ancestor.i)
+            ancestor = ancestor.head
+        if ancestor is not root:
+            token.head, token.dep_ = root, 'dep'
+
+
+def _find_root(tokens: list[HeuristicToken]) -> HeuristicToken:
+    """Return the first main verb of the sentence that is not inside a subordinate clause, falling back to the first
+    verb, then the first noun, then the first token.
+    """
+    subordinate = False
+    for token in tokens:
+        if token.tag_ in {'SC', 'WDT'}:
+            subordinate = True
+        elif token.tag_ == ',':
+            subordinate = False
+        elif token.tag_ in VERBAL_TAGS and not subordinate and not _next_is_verb(token, tokens):
+            return token
+    verbs = [token for token in tokens if token.tag_ in VERBAL_TAGS]
+    nouns = [token for token in tokens if token.tag_ in NOMINAL_TAGS]
+    return (verbs or nouns or tokens)[0]
+
+
+def _next_is_verb(token: HeuristicToken, tokens: list[HeuristicToken]) -> bool:
+    """Return whether the next verb-like word follows token with only adverbs in between (so token is an auxiliary)."""
+    for following in tokens[token.i + 1:]:
+        if following.tag_ in MAIN_VERB_TAGS:
+            return True
+        if following.tag_ not in {'RB', 'AUX'}:
+            return False
+    return False
+
+
+def _nearest(tokens: list[HeuristicToken], start: int, step: int, tags: set[str],
+             stop_tags: frozenset[str] = frozenset()) -> Optional[HeuristicToken]:
+    """Return the nearest token from index start (exclusive) in direction step whose tag is in tags, or None if a
+    token with a tag in stop_tags, or the end of the sentence, is reached first.
+    """
+    i = start + step
+    while 0 <= i < len(tokens):
+        if tokens[i].tag_ in tags:
+            return tokens[i]
+        if tokens[i].tag_ in stop_tags:
+            return None
+        i += step
+    return None
+
+
+def _attach(token: HeuristicToken, tokens: list[HeuristicToken], root: HeuristicToken) -> None:
+    """Set the head and dependency label of token (which is not the root)."""
+    tag, i = token.tag_, token.i
+    phrase_end = frozenset(PUNCTUATION_TAGS | VERBAL_TAGS | {'IN', 'CC', 'SC', 'WDT', 'MD'})
+    head, dep = None, 'dep'
+
+    if tag in PUNCTUATION_TAGS:
+        head, dep = root, 'punct'
+    elif tag in MODIFIER_TAGS or (tag in {'NN', 'NNP'} and i + 1 < len(tokens) and tokens[i + 1].tag_ in
+                                  {'NN', 'NNS', 'NNP'}):
+        head = _nearest(tokens, i, 1, NOMINAL_TAGS - {'PRP'}, phrase_end)
+        # the head of a noun phrase is its last noun ('the' -> 'town' in 'the town hall' is 'hall')
+        while head is not None and head.i + 1 < len(tokens) and tokens[head.i + 1].tag_ in {'NN', 'NNS', 'NNP'}:
+            head = tokens[head.i + 1]
+        dep = {'DT': 'det', 'PRP$': 'poss', 'JJ': 'amod', 'CD': 'nummod'}.get(tag, 'compound')
+    elif tag in {'AUX', 'MD', 'TO'}:
+        head, dep = _nearest(tokens, i, 1, MAIN_VERB_TAGS, frozenset({'.', 'CC', 'SC'})), 'aux'
+    elif tag == 'RB':
+        # an adverb modifies the verb or adjective right after it ('could not remember'), otherwise the verb before it
+        following = _nearest(tokens, i, 1, set(tokens[j].tag_ for j in range(i + 1, len(tokens))) - {'RB'})
+        if following is not None and following.tag_ in MAIN_VERB_TAGS | {'JJ'}:
+            head = following
+        else:
+            head = _nearest(tokens, i, -1, VERBAL_TAGS, frozenset({'.'})) or _nearest(tokens, i, 1, VERBAL_TAGS)
+        dep = 'neg' if token.orth_.lower() in {'not', "n't", 'never'} else 'advmod'
+    elif tag in {'SC', 'WDT'}:
+        head, dep = _nearest(tokens, i, 1, VERBAL_TAGS, frozenset({'.'})), 'mark'
+    elif tag == 'CC':
+        head, dep = _conjunct_before(token, tokens), 'cc'
+    elif tag == 'IN':
+        head = _nearest(tokens, i, -1, NOMINAL_TAGS | VERBAL_TAGS, frozenset({'.'}))
+        dep = 'prep'
+    elif tag in NOMINAL_TAGS:
+        head, dep = _attach_nominal(token, tokens, root)
+    elif tag in VERBAL_TAGS:
+        head, dep = _attach_verb(token, tokens, root)
+
+    if head is None or head is token:
+        head = root
+    token.head, token.dep_ = head, dep
+
+
+def _conjunct_before(token: HeuristicToken, tokens: list[HeuristicToken]) -> Optional[HeuristicToken]:
+    """Return the first word of the same class before the conjunction token."""
+    following = _nearest(tokens, token.i, 1, NOMINAL_TAGS | VERBAL_TAGS | {'JJ', 'RB'})
+    if following is None:
+        return None
+    for word_class in (NOMINAL_TAGS, VERBAL_TAGS):
+        if following.tag_ in word_class:
+            return _nearest(tokens, token.i, -1, word_class)
+    return _nearest(tokens, token.i, -1, {following.tag_})
+
+
+def _attach_nominal(token: HeuristicToken, tokens: list[HeuristicToken],
+                    root: HeuristicToken) -> tuple[Optional[HeuristicToken], str]:
+    """Return the head and label of a noun or pronoun: the object of a preposition or verb, a conjunct, or a subject.
+    """
+    before = tokens[token.i - 1] if token.i > 0 else None
+    # skip back over the modifiers of this noun to find what governs the whole noun phrase
+    j = token.i - 1
+    while j >= 0 and (tokens[j].tag_ in MODIFIER_TAGS | {'RB'} or tokens[j].head is token):
+        j -= 1
+    governor = tokens[j] if j >= 0 else None
+
+    if governor is not None and governor.tag_ == 'IN':
+        return governor, 'pobj'
+    if governor is not None and governor.tag_ == 'CC':
+        return _conjunct_before(governor, tokens), 'conj'
+    if governor is not None and governor.tag_ in MAIN_VERB_TAGS:
+        return governor, 'dobj'
+    if before is not None and before.tag_ == 'AUX' and token.i > root.i:
+        return before, 'attr'
+    verb = _subject_verb(token, tokens)
+    if verb is not None:
+        while verb.tag_ in {'AUX', 'MD'} and _nearest(tokens, verb.i, 1, MAIN_VERB_TAGS) is not None \
+                and _next_is_verb(verb, tokens):
+            verb = _nearest(tokens, verb.i, 1, MAIN_VERB_TAGS)
+        return verb, 'nsubj'
+    return _nearest(tokens, token.i, -1, VERBAL_TAGS) or root, 'dobj'
+
+
+def _subject_verb(token: HeuristicToken, tokens: list[HeuristicToken]) -> Optional[HeuristicToken]:
+    """Return the first verb (or auxiliary) after the noun token, skipping over any relative clause in between
+    ('the man, who had lived there, remembered' -> 'remembered'), or None if a preposition or the end of the sentence
+    comes first.
+    """
+    in_relative_clause = False
+    for following in tokens[token.i + 1:]:
+        if following.tag_ == 'WDT':
+            in_relative_clause = True
+        elif following.tag_ == ',' and in_relative_clause:
+            in_relative_clause = False
+        elif following.tag_ in {'.', 'IN'} and not in_relative_clause:
+            return None
+        elif following.tag_ in VERBAL_TAGS | {'MD'} and not in_relative_clause:
+            return following
+    return None
+
+
+def _attach_verb(token: HeuristicToken, tokens: list[HeuristicToken],
+                 root: HeuristicToken) -> tuple[Optional[HeuristicToken], str]:
+    """Return the head and label of a verb that is not the root: an auxiliary, a conjunct, or a clause of the root."""
+    if token.tag_ == 'AUX' and _next_is_verb(token, tokens):
+        return _nearest(tokens, token.i, 1, MAIN_VERB_TAGS), 'aux'
+    before = _nearest(tokens, token.i, -1, {'CC', 'SC', 'WDT', 'TO', 'IN'}, frozenset(MAIN_VERB_TAGS | {'.'}))
+    if before is not None and before.tag_ == 'CC':
+        return _conjunct_before(before, tokens), 'conj'
+    if before is not None and before.tag_ == 'WDT':
+        return _nearest(tokens, before.i, -1, NOMINAL_TAGS), 'relcl'
+    if before is not None and before.tag_ == 'TO':
+        return _nearest(tokens, before.i, -1, VERBAL_TAGS), 'xcomp'
+    return root, 'advcl' if before is not None and before.tag_ == 'SC' else 'ccomp'
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["re", "typing"]
+    })
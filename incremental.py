@@ -0,0 +1,217 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains the incremental ingestion mode for data_set_novels.csv.
+
+When rows are added to or edited in the CSV file, only those rows are parsed and scored again. Every row is identified
+by its ID and a hash of its contents, and compared against the last snapshot: a JSON file that stores, for every ID,
+the hash of its row and its computed (Dale-Chall, Flesch Reading Ease, MDD) scores. The snapshot is the score store:
+the scores of unchanged rows are read from it instead of being computed again. It also records the parser backend and
+the version of the scoring code (evaluation.SCORES_VERSION) that computed its scores, and its scores are only reused
+while both are the same, since switching between the heuristic parser and spaCy, or a change to a measure, moves them.
+
+After an update, the derived structures are changed in place rather than rebuilt:
+    - the CorpusIndex over the blocks gets the new and changed blocks, and loses the removed ones (it is only built
+      again from scratch when more than a quarter of the blocks changed, such as on the first load)
+    - so does the CAREC_M nearest neighbour index (scoring.CarecIndex) over the computed Dale-Chall and Flesch scores,
+      which becomes scoring.carec_index when the CSV file is the corpus the interactive scorer estimates from
+    - the snapshot gets the new hashes and scores
+    - the per-sentence caches of complexity_measures are keyed by sentence content, so they stay valid, and sentences
+      of a changed row that did not change are not parsed again
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import csv
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+import evaluation
+import scoring
+from corpus_index import CorpusIndex
+from data_processing import TextBlock, ExcerptStore, row_to_text_block, sentence_pool
+
+SNAPSHOT_FILE = 'data/corpus_snapshot.json'
+COMPUTED_SCORES = ('computed_dale_chall', 'computed_flesch', 'mdd')
+
+
+def row_hash(row: list[str]) -> str:
+    """Return a hash of every field of a CSV row.
+
+    >>> row_hash(['1', 'a']) == row_hash(['1', 'a']) != row_hash(['1', 'b'])
+    True
+    """
+    return hashlib.sha1('\x1f'.join(row).encode('utf-8')).hexdigest()
+
+
+class IncrementalCorpus:
+    """
+    The corpus of a CSV file, kept up to date with the file by only re-reading and re-scoring the rows that changed.
+
+    Instance Attributes:
+    - csv_file: the CSV file the corpus is read from
+    - snapshot_file: the JSON file the snapshot is saved to
+    - positions: maps the ID of every block to its position in index.text_blocks
+    - hashes: maps the ID of every block to the hash of its row
+    - scores: maps the ID of every block to its computed (Dale-Chall, Flesch Reading Ease, MDD) scores
+    - index: the CorpusIndex over the blocks, with the computed scores under the names in COMPUTED_SCORES
+    - carec_index: the CAREC_M nearest neighbour index over the computed Dale-Chall and Flesch scores of the blocks,
+      or None while there are none
+    - provenance: the parser backend and scores version that computed scores, or None before the first update
+
+    Representation Invariants:
+    - self.positions.keys() == self.hashes.keys() == self.scores.keys()
+    """
+    csv_file: str
+    snapshot_file: str
+    positions: dict[int, int]
+    hashes: dict[int, str]
+    scores: dict[int, tuple[float, float, float]]
+    index: CorpusIndex
+    carec_index: Optional[scoring.CarecIndex]
+    provenance: Optional[tuple[str, int]]
+
+    def __init__(self, csv_file: str, snapshot_file: str = SNAPSHOT_FILE) -> None:
+        """Initialize an empty corpus for csv_file. Call update() to load it."""
+        self.csv_file = csv_file
+        self.snapshot_file = snapshot_file
+        self.positions = {}
+        self.hashes = {}
+        self.scores = {}
+        self.index = CorpusIndex([], {score: np.array([]) for score in COMPUTED_SCORES})
+        self.carec_index = None
+        self.provenance = None
+
+    def text_blocks(self) -> list[TextBlock]:
+        """Return the current blocks of the corpus, in the order they were first added."""
+        return [block for block in self.index.text_blocks if block is not None]
+
+    def _rebuild_index(self, changed_blocks: dict[int, TextBlock], removed: set[int]) -> None:
+        """Build a new index over the current blocks, replaced by changed_blocks, minus the removed IDs."""
+        blocks = {block_id: self.index.text_blocks[position] for block_id, position in self.positions.items()
+                  if block_id not in removed}
+        blocks.update(changed_blocks)
+        ids = list(blocks)
+        self.index = CorpusIndex([blocks[block_id] for block_id in ids],
+                                 {score: np.array([self.scores[block_id][i] for block_id in ids], dtype=float)
+                                  for i, score in enumerate(COMPUTED_SCORES)})
+        self.positions = {block_id: position for position, block_id in enumerate(ids)}
+        self.carec_index = scoring.CarecIndex(np.array([self.scores[block_id][:2] for block_id in ids], dtype=float),
+                                              np.array([blocks[block_id].carec_m for block_id in ids], dtype=float),
+                                              np.array(ids, dtype=np.int64)) if ids else None
+
+    def load_snapshot(self) -> dict[int, dict]:
+        """Return the last saved snapshot, mapping an ID to its row hash and scores, or {} if there is none or its
+        scores were computed with a different parser backend or scores version than evaluation.scores_provenance().
+        """
+        if not os.path.exists(self.snapshot_file):
+            return {}
+        with open(self.snapshot_file) as file:
+            snapshot = json.load(file)
+        if [snapshot.get('backend'), snapshot.get('scores_version')] != list(evaluation.scores_provenance()):
+            return {}
+        return {int(block_id): entry for block_id, entry in snapshot['blocks'].items()}
+
+    def save_snapshot(self) -> None:
+        """Save the hash and scores of every block, and what computed them, for the next run to compare against."""
+        blocks = {block_id: {'hash': self.hashes[block_id], 'scores': list(self.scores[block_id])}
+                  for block_id in self.positions}
+        backend, version = self.provenance or evaluation.scores_provenance()
+        with open(self.snapshot_file, 'w') as file:
+            json.dump({'backend': backend, 'scores_version': version, 'blocks': blocks}, file)
+
+    def update(self, workers: Optional[int] = None) -> dict[str, int]:
+        """Bring the corpus up to date with the CSV file, and return how many rows were added, changed, removed and
+        left unchanged.
+
+        Only rows that are new or whose contents changed (compared to the blocks already loaded, or else to the last
+        snapshot) are turned into TextBlocks, and only those without up to date scores in the snapshot are scored.
+        The snapshot is saved at the end.
+
+        If the parser backend or scores version changed since the last update, the scores already loaded are stale,
+        so every row is treated as changed and scored again.
+        """
+        stale = self.provenance != evaluation.scores_provenance()
+        self.provenance = evaluation.scores_provenance()
+        snapshot = self.load_snapshot()
+        store = ExcerptStore()
+        changed_rows = {}
+        seen = set()
+        unchanged = 0
+        with open(self.csv_file) as csv_fle:
+            reader = csv.reader(csv_fle)
+            next(reader)
+            for row in reader:
+                block_id, digest = int(row[0]), row_hash(row)
+                seen.add(block_id)
+                if not stale and self.hashes.get(block_id) == digest:
+                    unchanged += 1
+                else:
+                    changed_rows[block_id] = (digest, row_to_text_block(row, sentence_pool, store))
+        store.freeze()
+        sentence_pool.release()
+
+        # score only the rows that the snapshot does not already have scores for
+        to_score = [block_id for block_id, (digest, _) in changed_rows.items()
+                    if snapshot.get(block_id, {}).get('hash') != digest]
+        if to_score:
+            raw = evaluation.score_corpus([changed_rows[block_id][1] for block_id in to_score], workers)
+            new_scores = {block_id: tuple(float(value) for value in row) for block_id, row in zip(to_score, raw)}
+        else:
+            new_scores = {}
+
+        removed = set(self.positions) - seen
+        counts = {'added': sum(1 for block_id in changed_rows if block_id not in self.positions),
+                  'changed': sum(1 for block_id in changed_rows if block_id in self.positions),
+                  'removed': len(removed), 'unchanged': unchanged, 'scored': len(to_score)}
+        for block_id, (digest, _) in changed_rows.items():
+            self.hashes[block_id] = digest
+            self.scores[block_id] = new_scores.get(block_id) or tuple(snapshot[block_id]['scores'])
+        for block_id in removed:
+            del self.hashes[block_id], self.scores[block_id]
+
+        if len(changed_rows) + len(removed) > len(self.positions) // 4:
+            # too many changes (e.g. the first load) to be worth updating the index one block at a time
+            self._rebuild_index({block_id: block for block_id, (_, block) in changed_rows.items()}, removed)
+        else:
+            for block_id, (_, block) in changed_rows.items():
+                computed = dict(zip(COMPUTED_SCORES, self.scores[block_id]))
+                if block_id in self.positions:
+                    self.index.replace(self.positions[block_id], block, computed)
+                    self.carec_index.replace(block_id, np.array(self.scores[block_id][:2]), block.carec_m)
+                else:
+                    self.positions[block_id] = self.index.append(block, computed)
+                    self.carec_index.append(block_id, np.array(self.scores[block_id][:2]), block.carec_m)
+            for block_id in removed:
+                self.index.remove(self.positions.pop(block_id))
+                self.carec_index.remove(block_id)
+        if os.path.abspath(self.csv_file) == os.path.abspath(scoring.CORPUS_FILE):
+            scoring.carec_index = self.carec_index
+
+        self.save_snapshot()
+        return counts
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    corpus = IncrementalCorpus('data/data_set_novels.csv')
+    print(corpus.update())
+    print(corpus.update())
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["csv", "hashlib", "json", "os", "typing", "numpy", "evaluation", "scoring",
+                          "corpus_index", "data_processing"],
+        'allowed-io': ["IncrementalCorpus.load_snapshot", "IncrementalCorpus.save_snapshot", "IncrementalCorpus.update"]
+    })
@@ -0,0 +1,147 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains the word frequency lexicon used by the word frequency measure in complexity_measures.
+
+The lexicon is built once from the words of every CLEAR excerpt and saved as two NumPy arrays:
+    - words: every distinct (lowercase) word, UTF-8 encoded, as a sorted array of fixed-width byte strings
+    - ranks: the frequency rank of the word at the same position, 1 for the most common word in the corpus
+Both are loaded memory-mapped, so the full lexicon is never turned into Python objects, and its pages are shared
+between processes. Words are looked up by a binary search (np.searchsorted) over the sorted array, done for a whole
+batch of words at once. The lexicon itself remembers nothing: the word frequency measure looks up every word of the
+corpus vocabulary only once, and keeps its rank in the 'frequency_rank' column of data_processing.corpus_vocabulary,
+which is gathered by word id (see complexity_measures.sum_log_ranks).
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+from data_processing import TextBlock, read_csv
+
+LEXICON_DIRECTORY = 'data'
+WORDS_FILE = 'lexicon_words.npy'
+RANKS_FILE = 'lexicon_ranks.npy'
+
+
+class Lexicon:
+    """
+    A sorted, array-based mapping from a word to its frequency rank in the corpus.
+
+    Instance Attributes:
+    - words: the distinct words of the corpus, UTF-8 encoded and sorted
+    - ranks: ranks[i] is the frequency rank of words[i], 1 for the most common word
+    - unknown_rank: the rank given to words that are not in the lexicon (one more than the rarest word)
+
+    Representation Invariants:
+    - len(self.words) == len(self.ranks)
+    - self.unknown_rank == len(self.words) + 1
+    """
+    words: np.ndarray
+    ranks: np.ndarray
+    unknown_rank: int
+
+    def __init__(self, words: np.ndarray, ranks: np.ndarray) -> None:
+        """Initialize a lexicon from its (possibly memory-mapped) arrays."""
+        self.words = words
+        self.ranks = ranks
+        self.unknown_rank = len(words) + 1
+
+    def lookup(self, words: list[str]) -> list[int]:
+        """Return the frequency rank of every word in words (case insensitive), or unknown_rank for words that are not
+        in the lexicon.
+
+        >>> lexicon = build_lexicon([['the', 'cat', 'the'], ['The', 'dog']])
+        >>> lexicon.lookup(['the', 'Cat', 'dog', 'emu'])
+        [1, 2, 3, 4]
+        """
+        if len(self.words) == 0 or len(words) == 0:
+            return [self.unknown_rank] * len(words)
+        width = self.words.dtype.itemsize
+        encoded = [word.lower().encode('utf-8') for word in words]
+        query = np.array(encoded, dtype=self.words.dtype)
+        positions = np.minimum(np.searchsorted(self.words, query), len(self.words) - 1)
+        # a word longer than the widest word in the lexicon would be truncated in query, so it is never a match
+        found = (self.words[positions] == query) & np.array([len(word) <= width for word in encoded], dtype=bool)
+        return np.where(found, self.ranks[positions], self.unknown_rank).tolist()
+
+    def save(self, directory: str = LEXICON_DIRECTORY) -> None:
+        """Save the arrays of the lexicon in directory, to be loaded with load_lexicon."""
+        np.save(os.path.join(directory, WORDS_FILE), self.words)
+        np.save(os.path.join(directory, RANKS_FILE), self.ranks)
+
+
+def build_lexicon(sentences: list[list[str]]) -> Lexicon:
+    """Return the lexicon of the words in sentences, a list of the words of every sentence.
+
+    Words are ranked from most to least frequent, with ties broken alphabetically.
+    """
+    counts = Counter(word.lower() for words in sentences for word in words if word != '')
+    by_frequency = sorted(counts, key=lambda word: (-counts[word], word))
+    encoded = np.array([word.encode('utf-8') for word in by_frequency], dtype=bytes)
+    order = np.argsort(encoded, kind='stable')
+    return Lexicon(encoded[order], (order + 1).astype(np.int32))
+
+
+def corpus_sentences(text_blocks: list[TextBlock]) -> list[list[str]]:
+    """Return the words of every sentence of text_blocks, as they are split for the other word-based measures."""
+    return [sentence.sentence_to_list() for block in text_blocks for sentence in block.excerpt]
+
+
+def load_lexicon(directory: str = LEXICON_DIRECTORY) -> Lexicon:
+    """Return the lexicon saved in directory, memory-mapped. Raise FileNotFoundError if it was never saved."""
+    return Lexicon(np.load(os.path.join(directory, WORDS_FILE), mmap_mode='r'),
+                   np.load(os.path.join(directory, RANKS_FILE), mmap_mode='r'))
+
+
+def load_or_build_lexicon(csv_file: str = 'data/data_set_novels.csv',
+                          directory: str = LEXICON_DIRECTORY) -> Lexicon:
+    """Return the lexicon saved in directory, building it from csv_file and saving it first if there is none."""
+    if not all(os.path.exists(os.path.join(directory, file)) for file in (WORDS_FILE, RANKS_FILE)):
+        build_lexicon(corpus_sentences(read_csv(csv_file))).save(directory)
+    return load_lexicon(directory)
+
+
+def benchmark_lookup(lexicon: Lexicon, sentences: list[list[str]], word_list: set[str]) -> dict[str, float]:
+    """Return the mean time per word, in nanoseconds, of looking up the words of every sentence in the lexicon (one
+    binary search batch per sentence, with nothing remembered between them) and of testing them against word_list, the
+    Dale-Chall set membership test.
+    """
+    num_words = sum(len(words) for words in sentences)
+
+    start = time.perf_counter()
+    for words in sentences:
+        lexicon.lookup(words)
+    lexicon_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for words in sentences:
+        sum(1 for word in words if word not in word_list)
+    set_time = time.perf_counter() - start
+
+    return {'lexicon_ns_per_word': lexicon_time / num_words * 1e9, 'set_ns_per_word': set_time / num_words * 1e9}
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import complexity_measures
+    corpus_lexicon = load_or_build_lexicon()
+    print(benchmark_lookup(corpus_lexicon, corpus_sentences(read_csv('data/data_set_novels.csv')),
+                           complexity_measures.dale_chall_word_list()))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["os", "time", "collections", "numpy", "data_processing", "complexity_measures"],
+        'allowed-io': []
+    })
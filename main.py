@@ -12,8 +12,10 @@ and can be run on the provided text from the dataset. We included our results of
 written report.
 
 Goal 2: We used pygame to allow the user to input a sentence stripped of its punctuation and have its scores returned
-for every complexity measure implemented. This function also estimates the CAREC (crowd-sourced) score by matching text 
-with its closest equivalent in flesch reading ease and dale chall scores from the data set.
+for every complexity measure implemented. This function also estimates the CAREC (crowd-sourced) score with the model
+trained by carec_model.py, or, if it was never trained, by matching text with its closest equivalent in flesch reading
+ease and dale chall scores from the data set. The scoring itself is in scoring.py, and the window is only created once
+the interactive scorer starts, so this file can be imported headless.
 
 Both return a plotly visualization of the scores for easy comparison.
 
@@ -22,28 +24,45 @@ Copyright and Usage Information
 
 This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
 """
-import pygame
 import sys
+from typing import Optional
+
+import pygame
 import pygame_gui
 import plotly.graph_objects as go
 
-import data_processing
-from data_processing import TextBlock, Sentence
 from data_processing import read_csv
 
 import complexity_measures
+from scoring import sentence_text_block, score_sentence
+from carec_model import estimate_carec
+from sampling import approximate_averages, SAMPLED_MEASURES
 com_m = complexity_measures
 
-pygame.init()
+# The window and its widgets are only created by init_gui, when the interactive scorer runs, so that importing this
+# file does not open a window (or need a display at all).
 width = 600
 height = 600
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Sentence Difficulty Score Returned as Grade Level")
-clock = pygame.time.Clock()
-manager = pygame_gui.UIManager((width, height))
-text_input = pygame_gui.elements.UITextEntryLine(relative_rect=pygame.Rect((120, 250), (350, 50)), manager=manager,
-                                                 object_id='main_text_entry')
-text_font = pygame.font.SysFont('Arial', 25)
+screen = None
+clock = None
+manager = None
+text_input = None
+text_font = None
+
+
+def init_gui() -> None:
+    """Initialize pygame and create the window of the interactive scorer, if that has not been done yet."""
+    global screen, clock, manager, text_input, text_font
+    if screen is not None:
+        return
+    pygame.init()
+    screen = pygame.display.set_mode((width, height))
+    pygame.display.set_caption("Sentence Difficulty Score Returned as Grade Level")
+    clock = pygame.time.Clock()
+    manager = pygame_gui.UIManager((width, height))
+    text_input = pygame_gui.elements.UITextEntryLine(relative_rect=pygame.Rect((120, 250), (350, 50)),
+                                                     manager=manager, object_id='main_text_entry')
+    text_font = pygame.font.SysFont('Arial', 25)
 
 
 def draw_text(text, font, text_col, x, y):
@@ -52,78 +71,13 @@ def draw_text(text, font, text_col, x, y):
     screen.blit(img, (x, y))
 
 
-def get_closest_carec_score(text: TextBlock) -> float:
-    """get a CAREC_M score by comparing Dale_Chall and Flesch complexitity scores from data_set_novels.csv"""
-    closest_txt_blk = text
-    dc = complexity_measures.dale_chall_complexity(text)
-    fc = complexity_measures.flesch_complexity_score(text)
-
-    pos_similar_txt_blk = data_processing.read_csv('data/data_set_novels.csv')
-    min_diff = 10000
-    for textblock in pos_similar_txt_blk:
-        if (textblock.dale_chall and textblock.flesch_reading) is not None:
-            diff_dc = dc - textblock.dale_chall
-            diff_fc = fc - textblock.flesch_reading
-            diff = diff_dc + diff_fc
-
-            if diff <= min_diff:
-                closest_txt_blk = textblock
-    return closest_txt_blk.carec_m
-
-
-def standardized_carec_score(score: float) -> float:
-    """Standardizes carec score using the following metric, note the end points are exclusive:
-
-        Carec Score Scale:
-        4.9 and Below	Grade 4 and Below
-        5.0 to 5.9	    Grades 5 - 6
-        6.0 to 6.9	    Grades 7 - 8
-        7.0 to 7.9	    Grades 9 - 10
-        8.0 to 8.9	    Grades 11 - 12
-        9.0 to 9.9	    Grades 13 - 15 (College)
-        10 and Above	Grades 16 and Above (College Graduate)
-
-        Adjusted to 1.0 Scale:
-        0 - 0.2         Grade 4 and Below
-        0.2 - 0.45      Grades 5 - 6
-        0.45 - 0.65     Grades 7-8
-        0.65 - 0.8      Grades 9 - 10
-        0.8 - 0.9       Grades 11 - 12
-        0.9 - 1.0       Grades 13 - 15 (College)
-        1.0 +           Grades 16 and Above (College Graduate)
-
-        """
-    if score >= 1:
-        return 16
-    elif 0.97 <= score < 1:
-        return 15
-    elif 0.93 <= score < 0.97:
-        return 14
-    elif 0.90 <= score < 0.93:
-        return 13
-    elif 0.85 <= score < 0.90:
-        return 12
-    elif 0.8 <= score < 0.85:
-        return 11
-    elif 0.75 <= score < 0.8:
-        return 10
-    elif 0.65 <= score < 0.75:
-        return 9
-    elif 0.55 <= score < 0.65:
-        return 8
-    elif 0.45 <= score < 0.55:
-        return 7
-    elif 0.30 <= score < 0.45:
-        return 6
-    elif 0.2 <= score < 0.3:
-        return 5
-    else:
-        return 4
-
-
 def show_text(text_to_show):
     """after input sentence"""
     counter = 0
+    # the scores do not change from frame to frame, so they are computed once
+    new_textblock = sentence_text_block(text_to_show)
+    scores = score_sentence(new_textblock, estimate_carec)
+    dc, fc, cm, sd = scores['dale_chall'], scores['flesch'], scores['carec'], scores['mdd']
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -131,17 +85,6 @@ def show_text(text_to_show):
                 sys.exit()
         screen.fill("white")
 
-        new_sentence = Sentence(text_to_show, None, None, None)
-        new_sentence.phrase = text_to_show
-
-        new_textblock = TextBlock([new_sentence], None, None, None, None, None, None, None, None, None, None)
-        new_textblock.excerpt = [new_sentence]
-
-        dc = com_m.standardized_dale_chall(com_m.dale_chall_complexity(new_textblock))
-        fc = com_m.standardized_flesch_ease(com_m.flesch_complexity_score(new_textblock))
-        cm = standardized_carec_score(get_closest_carec_score(new_textblock))
-        sd = com_m.standardized_syntax_score(com_m.mean_dependency_distance(new_textblock, True))
-
         draw_text('Sentence Complextity Score as Grade Level', pygame.font.SysFont('Arial', 40), 'black', 50, 30)
         draw_text('Dale-Chall:' + str(dc), text_font, 'black', 50, 100)
         draw_text('Flesch: ' + str(fc), text_font, 'black', 50, 150)
@@ -149,17 +92,14 @@ def show_text(text_to_show):
         draw_text('Mean Dependency Distance: ' + str(sd), text_font, 'black', 50, 250)
         # run plotly
         if counter == 0:
-            display_reading_level_accuracy(new_textblock, dc, fc, sd)
+            display_reading_level_accuracy(dc, fc, sd, cm)
         counter += 1
         pygame.display.update()
 
 
-def display_reading_level_accuracy(textblock: TextBlock, dc: float, fc: float, sd: float) -> None:
-    """Display a bar graph of the reading level accuracy of a given sentence."""
-    if len(textblock.excerpt) == 1:
-        cm = standardized_carec_score(get_closest_carec_score(textblock))
-    else:
-        cm = standardized_carec_score(textblock.carec_m)
+def display_reading_level_accuracy(dc: float, fc: float, sd: float, cm: float) -> None:
+    """Display a bar graph of the reading level accuracy of a given sentence, from its grade levels as computed by
+    scoring.score_sentence (so that its CAREC_M is not estimated again)."""
     fig = go.Figure(
         data=[go.Bar(y=[dc, fc, sd, cm], x=['Dale-Chall Complexity', 'Flesch Complexity',
                                             'Mean Dependency Distance', 'CAREC_M'])],
@@ -172,6 +112,7 @@ def display_reading_level_accuracy(textblock: TextBlock, dc: float, fc: float, s
 
 def get_score():
     """Take in a sentence"""
+    init_gui()
     while True:
         ui_refresher_rate = clock.tick(60) / 1000
         for event in pygame.event.get():
@@ -188,9 +129,20 @@ def get_score():
         pygame.display.update()
 
 
-def runner() -> None:
-    """A runner of the data_set_novels.csv file."""
+def runner(tolerance: Optional[float] = None) -> None:
+    """A runner of the data_set_novels.csv file.
+
+    If tolerance is given, the averages are instead estimated over the whole corpus from a stratified sample, scored
+    until each one is within tolerance (as a fraction of its mean) with 95% confidence (see sampling.py).
+    """
     textblocks = read_csv('data/data_set_novels.csv')
+    if tolerance is not None:
+        report = approximate_averages(textblocks, tolerance, relative=True)
+        print(f"scored {report['fraction_scored']:.0%} of the corpus", report['estimates'])
+        avg_dc, avg_fc, avg_dependency, avg_carec = (report['estimates'][measure]['mean']
+                                                     for measure in SAMPLED_MEASURES)
+        show_averages(avg_dc, avg_fc, avg_dependency, avg_carec)
+        return
     counter = 0
     dc = []
     fc = []
@@ -207,7 +159,11 @@ def runner() -> None:
     avg_fc = sum(fc) / counter
     avg_dependency = sum(dependency) / counter
     avg_carec = sum(carec) / counter
+    show_averages(avg_dc, avg_fc, avg_dependency, avg_carec)
+
 
+def show_averages(avg_dc: float, avg_fc: float, avg_dependency: float, avg_carec: float) -> None:
+    """Display a bar graph of the average of every measure."""
     fig = go.Figure(
         data=[go.Bar(y=[avg_dc, avg_fc, avg_dependency, avg_carec], x=['Dale-Chall Complexity', 'Flesch Complexity',
                                                                        'Mean Dependency Distance', 'CAREC_M'])],
@@ -230,6 +186,7 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'max-line-length': 120,
-        'extra-imports': ["csv", "typing", "string", "create_tree"],  # the names (strs) of imported modules
-        'allowed-io': ["read_csv"]
+        # the names (strs) of imported modules
+        'extra-imports': ["csv", "typing", "string", "create_tree", "scoring", "carec_model", "sampling"],
+        'allowed-io': ["read_csv", "runner"]
     })
@@ -0,0 +1,217 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains a memory-bounded way to score a corpus that may not fit in memory all at once.
+
+read_csv followed by evaluation.score_corpus keeps every TextBlock and Sentence of the corpus alive until the end, as
+well as every entry of the per-sentence caches of complexity_measures. score_csv_within_budget instead reads the CSV
+file row by row, and keeps track of the approximate size of what it holds:
+    - the blocks read since the last flush (their objects, and the text of their excerpts)
+    - the per-sentence caches
+    - the words of data_processing.corpus_vocabulary and its per-word columns
+When that goes over the budget, the blocks read so far are scored, their scores are spilled to a file on disk, and the
+blocks are dropped. If the caches and the columns take more than half of the budget, they are evicted (cleared) as
+well. The words of the vocabulary are never dropped (the ids of the sentences read refer to them), so they are counted
+towards the budget but can only grow.
+
+The blocks are scored in one pool of workers, started once for the whole run.
+
+The scores of the whole corpus are returned memory-mapped from the spill file, and the peak resident set size (RSS) of
+the process is reported at the end of the run.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import csv
+import os
+import resource
+import sys
+import tempfile
+from concurrent.futures import Executor
+from typing import Optional
+
+import numpy as np
+
+import complexity_measures as com_m
+import create_tree as ct
+import evaluation
+from data_processing import TextBlock, ExcerptStore, SentencePool, MetricCache, Vocabulary, corpus_vocabulary, \
+    row_to_text_block
+
+# the caches that grow with the number of distinct sentences scored in this process
+CACHES = (com_m.unfamiliar_cache, com_m.count_cache, com_m.mdd_cache, com_m.syntax_cache, com_m.frequency_cache)
+# the approximate size of a SentenceView, and of the entry of one block in the pool of its batch
+VIEW_BYTES = 250
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process so far, in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes everywhere else
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def block_size(text_block: TextBlock) -> int:
+    """Return the approximate number of bytes used by text_block, its sentences, and the text of its excerpt."""
+    size = sys.getsizeof(text_block) + sys.getsizeof(text_block.__dict__) + sys.getsizeof(text_block.excerpt)
+    size += sum(sys.getsizeof(getattr(text_block, attribute)) for attribute in ('author', 'title', 'url', 'pub_year'))
+    for sentence in text_block.excerpt:
+        size += sys.getsizeof(sentence) + sys.getsizeof(sentence.__dict__) + VIEW_BYTES
+        # the token ids are shared by the sentences of the same view, but each is counted, as the view bytes are
+        size += sys.getsizeof(sentence.token_ids)
+    # the excerpt is stored once as UTF-8 text (in memory-mapped pages, which count towards RSS once read)
+    return size + text_block.sentence_count
+
+
+def cache_size(cache: MetricCache) -> int:
+    """Return the approximate number of bytes used by the entries of cache."""
+    size = sys.getsizeof(cache.values)
+    for key, value in cache.values.items():
+        size += sys.getsizeof(value)
+        if isinstance(key, tuple):
+            size += sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+        else:
+            size += sys.getsizeof(key)
+    return size
+
+
+def vocabulary_size(vocabulary: Vocabulary) -> int:
+    """Return the approximate number of bytes used by the words and ids of vocabulary, and by its columns."""
+    size = sys.getsizeof(vocabulary.words) + sys.getsizeof(vocabulary.ids)
+    # each word is referenced by both words and ids, but stored once
+    size += sum(sys.getsizeof(word) for word in vocabulary.words)
+    return size + sum(values.nbytes for _, values in vocabulary.columns.values())
+
+
+def _tracked_size() -> int:
+    """Return the approximate number of bytes used by the caches and corpus_vocabulary."""
+    return sum(cache_size(cache) for cache in CACHES) + vocabulary_size(corpus_vocabulary)
+
+
+class MemoryBudget:
+    """
+    The approximate memory held by a run of score_csv_within_budget, against its budget.
+
+    Instance Attributes:
+    - budget: the most bytes the blocks, caches and vocabulary should take
+    - blocks: the approximate bytes of the blocks read since the last flush, and of the words they added to
+      corpus_vocabulary
+    - caches: the approximate bytes of the per-sentence caches and of corpus_vocabulary, as of the last flush
+    - peak: the most bytes held at once (blocks plus caches) so far
+    - flushes: how many times the blocks were scored and spilled
+    - evictions: how many times the caches and the columns of corpus_vocabulary were cleared
+
+    Representation Invariants:
+    - self.budget > 0
+    """
+    budget: int
+    blocks: int
+    caches: int
+    peak: int
+    flushes: int
+    evictions: int
+    _words: int
+
+    def __init__(self, budget_mb: float) -> None:
+        """Initialize an empty budget of budget_mb megabytes."""
+        self.budget = int(budget_mb * 2 ** 20)
+        self.blocks = 0
+        self.caches = _tracked_size()
+        self.peak = self.caches
+        self.flushes = 0
+        self.evictions = 0
+        # the number of words of corpus_vocabulary counted in self.caches or self.blocks
+        self._words = len(corpus_vocabulary.words)
+
+    def add_block(self, text_block: TextBlock) -> None:
+        """Count a newly read block (whose new words were given ids as it was read)."""
+        new_words = corpus_vocabulary.words[self._words:]
+        self.blocks += block_size(text_block) + sum(sys.getsizeof(word) for word in new_words)
+        self._words += len(new_words)
+        self.peak = max(self.peak, self.blocks + self.caches)
+
+    def over_budget(self) -> bool:
+        """Return whether the blocks and caches take more than the budget."""
+        return self.blocks + self.caches > self.budget
+
+    def flushed(self) -> None:
+        """Record that the blocks were dropped, and evict the caches and the columns of corpus_vocabulary if they (with
+        its words) take more than half of the budget."""
+        self.flushes += 1
+        self.blocks = 0
+        self._words = len(corpus_vocabulary.words)
+        self.caches = _tracked_size()
+        self.peak = max(self.peak, self.caches)
+        if self.caches > self.budget // 2:
+            for cache in CACHES:
+                cache.clear()
+            corpus_vocabulary.clear_columns()
+            self.evictions += 1
+            self.caches = _tracked_size()
+
+
+def _flush(batch: list[TextBlock], store: ExcerptStore, spill_file: object, workers: Optional[int],
+           executor: Executor) -> None:
+    """Score the blocks of batch in executor and append their (ID, Dale-Chall, Flesch Reading Ease, MDD) rows to
+    spill_file."""
+    store.freeze()
+    scores = evaluation.score_corpus(batch, workers, executor=executor)
+    ids = np.array([block.id for block in batch], dtype=float)
+    spill_file.write(np.column_stack([ids, scores]).astype(np.float64).tobytes())
+
+
+def score_csv_within_budget(csv_file: str, budget_mb: float = 256, workers: Optional[int] = None,
+                            spill_dir: Optional[str] = None) -> tuple[np.ndarray, dict[str, float]]:
+    """Score every row of csv_file, holding about budget_mb megabytes of blocks and cached metrics at most.
+
+    Return a read-only array memory-mapped from the spill file (in spill_dir, or the default temporary directory), with
+    one (ID, Dale-Chall, Flesch Reading Ease, MDD) row per block in file order, and a report of the run: the number of
+    blocks, flushes and cache evictions, the estimated peak of the tracked memory, the peak RSS in megabytes, and the
+    path of the spill file (which the caller may delete once done with the scores).
+
+    Preconditions:
+        - budget_mb > 0
+    """
+    budget = MemoryBudget(budget_mb)
+    num_blocks = 0
+    with tempfile.NamedTemporaryFile(dir=spill_dir, suffix='.scores', delete=False) as spill_file, \
+            ct.process_pool(workers) as executor:
+        with open(csv_file) as csv_fle:
+            reader = csv.reader(csv_fle)
+            next(reader)
+            batch, store, pool = [], ExcerptStore(), SentencePool()
+            for row in reader:
+                batch.append(row_to_text_block(row, pool, store))
+                budget.add_block(batch[-1])
+                num_blocks += 1
+                if budget.over_budget():
+                    _flush(batch, store, spill_file, workers, executor)
+                    batch, store, pool = [], ExcerptStore(), SentencePool()
+                    budget.flushed()
+            if batch:
+                _flush(batch, store, spill_file, workers, executor)
+                budget.flushed()
+        spill_path = spill_file.name
+
+    scores = np.memmap(spill_path, dtype=np.float64, mode='r', shape=(num_blocks, 4)) if num_blocks > 0 \
+        else np.empty((0, 4))
+    return scores, {'blocks': num_blocks, 'flushes': budget.flushes, 'evictions': budget.evictions,
+                    'tracked_peak_mb': budget.peak / 2 ** 20, 'peak_rss_mb': peak_rss_mb(), 'spill_file': spill_path}
+
+
+if __name__ == '__main__':
+    corpus_scores, report = score_csv_within_budget('data/data_set_novels.csv', budget_mb=64)
+    print(report)
+    os.remove(report['spill_file'])
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["csv", "os", "resource", "sys", "tempfile", "concurrent.futures", "typing", "numpy",
+                          "complexity_measures", "create_tree", "evaluation", "data_processing"],
+        'allowed-io': ["score_csv_within_budget"]
+    })
@@ -0,0 +1,197 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains an approximate mode for the corpus-wide averages of the measures (as plotted by main.runner), for
+when a quick estimate is enough and parsing every block for MDD is not worth the time.
+
+approximate_averages scores a stratified random sample of the corpus, a batch at a time:
+    - the blocks are split into strata by category and location, and every batch is drawn from the strata in
+      proportion to their size, so the sample has the same mix of 'Lit'/'Info' and 'start'/'mid'/'end'/'whole'
+      excerpts as the corpus
+    - after every batch, the mean of each measure is estimated with the stratified estimator, along with a confidence
+      interval (with the finite population correction, so it shrinks to nothing once a stratum is fully scored)
+    - sampling stops as soon as the half-width of every interval is within its tolerance
+The report gives the estimate and achieved half-width of every measure, and the fraction of the corpus scored.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+from statistics import NormalDist
+from concurrent.futures import Executor
+from typing import Optional
+
+import numpy as np
+
+import create_tree as ct
+import evaluation
+from data_processing import TextBlock, read_csv
+
+# the measures averaged by main.runner: the stored Dale-Chall and Flesch scores, the computed MDD, and CAREC_M
+SAMPLED_MEASURES = ('dale_chall', 'flesch', 'mdd', 'carec')
+
+
+def score_sample(text_blocks: list[TextBlock], workers: Optional[int] = None,
+                 executor: Optional[Executor] = None) -> np.ndarray:
+    """Return a (len(text_blocks), len(SAMPLED_MEASURES)) array of the measures of text_blocks, nan where one is
+    missing or cannot be computed. Only MDD is computed, in parallel by evaluation.score_mdd (in executor, if given).
+    """
+    mdd = evaluation.score_mdd(text_blocks, workers, executor=executor) if text_blocks else np.empty(0)
+    stored = np.array([[np.nan if value is None else value for value in (block.dale_chall, block.flesch_reading)]
+                       for block in text_blocks], dtype=float).reshape(-1, 2)
+    carec = np.array([np.nan if block.carec_m is None else block.carec_m for block in text_blocks], dtype=float)
+    return np.column_stack([stored, mdd, carec])
+
+
+def strata_of(text_blocks: list[TextBlock]) -> dict[tuple[str, str], list[int]]:
+    """Return the positions in text_blocks of the blocks of every (category, location) stratum.
+
+    >>> from async_scoring import text_to_block
+    >>> blocks = [text_to_block('She danced.') for _ in range(3)]
+    >>> blocks[0].category, blocks[1].category, blocks[2].category = 'Lit', 'Info', 'Lit'
+    >>> strata_of(blocks)
+    {('Lit', None): [0, 2], ('Info', None): [1]}
+    """
+    strata = {}
+    for i, block in enumerate(text_blocks):
+        strata.setdefault((block.category, block.location), []).append(i)
+    return strata
+
+
+def allocate(sizes: np.ndarray, remaining: np.ndarray, batch_size: int) -> np.ndarray:
+    """Return how many more blocks to draw from every stratum, for a batch of batch_size blocks split in proportion to
+    the sizes of the strata (by largest remainder), never more than remaining in a stratum.
+
+    >>> allocate(np.array([60, 30, 10]), np.array([60, 30, 10]), 10).tolist()
+    [6, 3, 1]
+    >>> allocate(np.array([60, 30, 10]), np.array([0, 30, 10]), 10).tolist()
+    [0, 8, 2]
+    """
+    weights = np.where(remaining > 0, sizes, 0).astype(float)
+    batch_size = min(batch_size, int(remaining.sum()))
+    if batch_size == 0:
+        return np.zeros(len(sizes), dtype=np.int64)
+    quotas = weights / weights.sum() * batch_size
+    counts = np.minimum(np.floor(quotas).astype(np.int64), remaining)
+    while counts.sum() < batch_size:
+        # hand out the rest one at a time, to the open stratum furthest below its quota
+        shortfall = np.where(counts < remaining, quotas - counts, -np.inf)
+        counts[np.argmax(shortfall)] += 1
+    return counts
+
+
+def stratified_estimate(samples: list[np.ndarray], sizes: np.ndarray,
+                        z: float) -> tuple[np.ndarray, np.ndarray]:
+    """Return the stratified estimate of the mean of every measure, and the half-width of its confidence interval
+    (z standard errors), from samples[h], the scores of the blocks drawn so far from stratum h (of sizes[h] blocks).
+
+    nan scores are left out of their measure, and so out of the finite population correction too: a stratum is only
+    treated as fully scored for a measure once every one of its blocks has a score of it. The half-width is inf while a
+    stratum that is not fully scored has fewer than two scores of a measure, since its variance is then unknown.
+
+    >>> samples = [np.array([[1.0, 1.0, 1.0, 1.0], [3.0, 3.0, 3.0, np.nan]])]
+    >>> mean, half_width = stratified_estimate(samples, np.array([2]), 1.96)
+    >>> mean.tolist(), half_width.tolist()
+    ([2.0, 2.0, 2.0, 1.0], [0.0, 0.0, 0.0, inf])
+    """
+    weights = sizes / sizes.sum()
+    mean = np.zeros(len(SAMPLED_MEASURES))
+    variance = np.zeros(len(SAMPLED_MEASURES))
+    for sample, size, weight in zip(samples, sizes, weights):
+        valid = ~np.isnan(sample)
+        counts = valid.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # nan for a measure with no scores in this stratum, which makes its estimate nan too
+            stratum_mean = np.where(valid, sample, 0).sum(axis=0) / counts
+            squares = np.where(valid, (sample - stratum_mean) ** 2, 0).sum(axis=0)
+            stratum_variance = np.where(counts > 1, squares / (counts - 1), np.inf)
+            variance += np.where(counts < size, weight ** 2 * stratum_variance / counts * (1 - counts / size), 0)
+        mean += weight * stratum_mean
+    return mean, z * np.sqrt(variance)
+
+
+def approximate_averages(text_blocks: list[TextBlock], tolerance: float | dict[str, float], relative: bool = False,
+                         confidence: float = 0.95, batch_size: int = 50, seed: int = 0,
+                         workers: Optional[int] = None) -> dict:
+    """Estimate the mean of every measure in SAMPLED_MEASURES over text_blocks from a stratified random sample, scoring
+    batch_size more blocks at a time until the confidence interval of every mean is narrow enough.
+
+    tolerance is the largest acceptable half-width of the interval, for every measure or per measure (a measure left
+    out of the dict has no tolerance to meet). If relative is True, it is a fraction of the estimated mean instead.
+    Every stratum is first given two blocks (or all of its blocks, if it has fewer), so that its variance is known.
+
+    Return the estimate and achieved half-width of every measure, whether every tolerance was met, and the number and
+    fraction of the blocks that were scored.
+
+    Preconditions:
+        - len(text_blocks) > 0
+        - 0 < confidence < 1
+        - batch_size > 0
+    """
+    if not isinstance(tolerance, dict):
+        tolerance = dict.fromkeys(SAMPLED_MEASURES, tolerance)
+    limits = np.array([tolerance.get(measure, np.inf) for measure in SAMPLED_MEASURES], dtype=float)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    rng = np.random.default_rng(seed)
+    strata = [rng.permutation(members) for members in strata_of(text_blocks).values()]
+    sizes = np.array([len(members) for members in strata], dtype=np.int64)
+    drawn = np.zeros(len(strata), dtype=np.int64)
+    samples = [np.empty((0, len(SAMPLED_MEASURES))) for _ in strata]
+
+    to_draw = np.minimum(sizes, 2)
+    # one pool of workers for every batch, rather than one started per batch
+    with ct.process_pool(workers) as executor:
+        while True:
+            batch = [text_blocks[i] for h, count in enumerate(to_draw) for i in strata[h][drawn[h]:drawn[h] + count]]
+            scores = score_sample(batch, workers, executor)
+            offset = 0
+            for h, count in enumerate(to_draw):
+                samples[h] = np.vstack([samples[h], scores[offset:offset + count]])
+                offset += count
+            drawn += to_draw
+
+            mean, half_width = stratified_estimate(samples, sizes, z)
+            allowed = np.where(np.isinf(limits), np.inf, limits * np.abs(mean)) if relative else limits
+            met = bool((half_width <= allowed).all())
+            if met or (drawn == sizes).all():
+                break
+            to_draw = allocate(sizes, sizes - drawn, batch_size)
+
+    num_scored = int(drawn.sum())
+    return {'estimates': {measure: {'mean': float(mean[j]), 'half_width': float(half_width[j])}
+                          for j, measure in enumerate(SAMPLED_MEASURES)},
+            'confidence': confidence,
+            'tolerance_met': met,
+            'blocks_scored': num_scored,
+            'fraction_scored': num_scored / len(text_blocks)}
+
+
+def exact_averages(text_blocks: list[TextBlock], workers: Optional[int] = None) -> dict[str, float]:
+    """Return the exact mean of every measure in SAMPLED_MEASURES over text_blocks (leaving out nan scores), to check
+    approximate_averages against.
+    """
+    scores = score_sample(text_blocks, workers)
+    valid = ~np.isnan(scores)
+    with np.errstate(invalid='ignore'):
+        means = np.where(valid, scores, 0).sum(axis=0) / valid.sum(axis=0)
+    return dict(zip(SAMPLED_MEASURES, means.tolist()))
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    corpus = read_csv('data/data_set_novels.csv')
+    print(approximate_averages(corpus, 0.01, relative=True))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["statistics", "concurrent.futures", "typing", "numpy", "create_tree", "evaluation",
+                          "data_processing", "async_scoring"],
+        'allowed-io': []
+    })
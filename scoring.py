@@ -0,0 +1,259 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains the scoring of a single sentence, and the estimate of its CAREC_M score, used by the interactive
+scorer in main.py.
+
+CAREC_M is estimated as the score of the nearest block of the corpus in (Dale-Chall, Flesch Reading Ease[, MDD])
+space. Whole batches of texts are estimated at once (see estimate_carec_scores): their features are computed together,
+and the distances from every text to every corpus block are computed with matrix products.
+
+None of it needs pygame or a display, so it can be imported by scripts and by headless scoring servers.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from typing import Callable, Optional
+
+import numpy as np
+
+import data_processing
+from data_processing import TextBlock, Sentence
+
+import standardization
+import complexity_measures
+com_m = complexity_measures
+
+
+class CarecIndex:
+    """
+    A nearest neighbour index over the blocks of the corpus, to estimate the CAREC_M score of new texts from their
+    complexity scores.
+
+    Every feature is standardized (by the mean and standard deviation of the corpus) so that each one counts equally
+    in the Euclidean distance, instead of Flesch (on a 0-100 scale) drowning out Dale-Chall (on a 0-10 scale).
+
+    Blocks can be appended, replaced and removed in place (see incremental.IncrementalCorpus). Their features are
+    standardized by the mean and standard deviation the index was built with, which are not updated.
+
+    Instance Attributes:
+    - features: the standardized feature row of every corpus block (Dale-Chall, Flesch Reading Ease[, MDD])
+    - carec: the CAREC_M score of every corpus block
+    - ids: the ID of every corpus block
+    - mean: the mean of every feature over the corpus
+    - scale: the standard deviation of every feature over the corpus (1 where a feature is constant)
+
+    Representation Invariants:
+    - len(self.features) == len(self.carec) == len(self.ids)
+    """
+    features: np.ndarray
+    carec: np.ndarray
+    ids: np.ndarray
+    mean: np.ndarray
+    scale: np.ndarray
+    _squared_norms: np.ndarray
+
+    def __init__(self, features: np.ndarray, carec: np.ndarray, ids: Optional[np.ndarray] = None) -> None:
+        """Initialize the index of the raw feature rows of the corpus and their CAREC_M scores, for the blocks with
+        the given IDs (their positions, by default). Rows with a nan feature are left out.
+        """
+        features = np.asarray(features, dtype=float)
+        keep = ~np.isnan(features).any(axis=1)
+        features = features[keep]
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0)
+        self.scale[self.scale == 0] = 1
+        self.features = (features - self.mean) / self.scale
+        self.carec = np.asarray(carec, dtype=float)[keep]
+        self.ids = (np.arange(len(keep)) if ids is None else np.asarray(ids, dtype=np.int64))[keep]
+        self._squared_norms = (self.features ** 2).sum(axis=1)
+
+    # IN PLACE UPDATES
+    def append(self, block_id: int, features: np.ndarray, carec: float) -> None:
+        """Add the block with the given ID, raw feature row and CAREC_M score, unless it has a nan feature.
+
+        >>> index = CarecIndex(np.array([[0.0, 0.0], [10.0, 10.0]]), np.array([0.1, 0.9]))
+        >>> index.append(7, np.array([20.0, 20.0]), 0.5)
+        >>> index.estimate(np.array([[19.0, 21.0], [1.0, 2.0]])).tolist()
+        [0.5, 0.1]
+        """
+        features = np.asarray(features, dtype=float)
+        if np.isnan(features).any():
+            return
+        row = (features - self.mean) / self.scale
+        self.features = np.vstack([self.features, row])
+        self.carec = np.append(self.carec, carec)
+        self.ids = np.append(self.ids, block_id)
+        self._squared_norms = np.append(self._squared_norms, (row ** 2).sum())
+
+    def replace(self, block_id: int, features: np.ndarray, carec: float) -> None:
+        """Replace the block with the given ID (adding it if it is not in the index) by a new feature row and
+        CAREC_M score.
+        """
+        self.remove(block_id)
+        self.append(block_id, features, carec)
+
+    def remove(self, block_id: int) -> None:
+        """Remove the block with the given ID, if it is in the index.
+
+        >>> index = CarecIndex(np.array([[0.0, 0.0], [10.0, 10.0]]), np.array([0.1, 0.9]), np.array([3, 4]))
+        >>> index.remove(4)
+        >>> index.ids.tolist(), index.estimate(np.array([[9.0, 7.0]])).tolist()
+        ([3], [0.1])
+        """
+        keep = self.ids != block_id
+        if not keep.all():
+            self.features, self.carec = self.features[keep], self.carec[keep]
+            self.ids, self._squared_norms = self.ids[keep], self._squared_norms[keep]
+
+    def nearest(self, queries: np.ndarray, chunk_size: int = 1024) -> np.ndarray:
+        """Return the position (in self.features) of the nearest corpus block to every row of queries, the raw
+        features of one query each.
+
+        The distances from a chunk of chunk_size queries to every block are computed as one matrix product, using
+        |q - f|^2 = |q|^2 - 2 q.f + |f|^2, and |q|^2 is left out since it does not change which block is nearest.
+
+        >>> index = CarecIndex(np.array([[0.0, 0.0], [10.0, 10.0]]), np.array([0.1, 0.9]))
+        >>> index.nearest(np.array([[1.0, 2.0], [9.0, 7.0]])).tolist()
+        [0, 1]
+        """
+        queries = (np.atleast_2d(np.asarray(queries, dtype=float)) - self.mean) / self.scale
+        nearest = np.empty(len(queries), dtype=np.int64)
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            distances = self._squared_norms - 2 * chunk @ self.features.T
+            nearest[start:start + chunk_size] = distances.argmin(axis=1)
+        return nearest
+
+    def estimate(self, queries: np.ndarray) -> np.ndarray:
+        """Return the CAREC_M score of the nearest corpus block to every row of queries (nan for a row with a nan
+        feature).
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=float))
+        estimates = self.carec[self.nearest(np.nan_to_num(queries))]
+        return np.where(np.isnan(queries).any(axis=1), np.nan, estimates)
+
+
+# the index of data_set_novels.csv, built by load_carec_index the first time an estimate is needed (and kept up to
+# date with the file by an incremental.IncrementalCorpus of it)
+CORPUS_FILE = 'data/data_set_novels.csv'
+carec_index = None
+
+
+def build_carec_index(text_blocks: list[TextBlock], mdd: Optional[np.ndarray] = None) -> CarecIndex:
+    """Return the index of text_blocks, on their Dale-Chall and Flesch Reading Ease scores, plus their MDD if it is
+    given (one score per block, as from evaluation.score_corpus).
+
+    The scores are computed by query_features rather than read from the CSV file, since the scores stored there were
+    computed with different formulas, and the queries have to be compared with the corpus on the same scale.
+    """
+    features = query_features(text_blocks)
+    if mdd is not None:
+        features = np.column_stack([features, mdd])
+    return CarecIndex(features, np.array([block.carec_m for block in text_blocks], dtype=float),
+                      np.array([block.id for block in text_blocks], dtype=np.int64))
+
+
+def load_carec_index() -> CarecIndex:
+    """Return the index of data_set_novels.csv, building it the first time it is needed."""
+    global carec_index
+    if carec_index is None:
+        carec_index = build_carec_index(data_processing.read_csv(CORPUS_FILE))
+    return carec_index
+
+
+def query_features(text_blocks: list[TextBlock], with_mdd: bool = False, user_input: bool = False) -> np.ndarray:
+    """Return the (Dale-Chall, Flesch Reading Ease[, MDD]) feature row of every block in text_blocks, with the
+    Dale-Chall and Flesch scores of all of them computed at once. MDD is computed as in
+    com_m.mean_dependency_distance(block, user_input), nan where it cannot be computed.
+    """
+    word_list = com_m.dale_chall_word_list()
+    columns = [com_m.dale_chall_corpus(text_blocks, word_list)[1],
+               com_m.count_formula_scores(text_blocks, ['flesch_reading_ease'])['flesch_reading_ease']]
+    if with_mdd:
+        mdd = []
+        for block in text_blocks:
+            try:
+                mdd.append(com_m.mean_dependency_distance(block, user_input))
+            except (ZeroDivisionError, AttributeError):
+                mdd.append(float('nan'))
+        columns.append(np.array(mdd, dtype=float))
+    return np.column_stack(columns)
+
+
+def estimate_carec_scores(text_blocks: list[TextBlock], index: Optional[CarecIndex] = None,
+                          user_input: bool = False) -> np.ndarray:
+    """Return the CAREC_M score of the nearest block of index (the corpus by default) to every block in text_blocks.
+
+    An index built with MDD matches on MDD too (see query_features for user_input).
+    """
+    index = index or load_carec_index()
+    return index.estimate(query_features(text_blocks, index.features.shape[1] == 3, user_input))
+
+
+def get_closest_carec_score(text: TextBlock) -> float:
+    """get a CAREC_M score by comparing Dale_Chall and Flesch complexitity scores from data_set_novels.csv
+
+    This is estimate_carec_scores for a single text.
+    """
+    return float(estimate_carec_scores([text])[0])
+
+
+def standardized_carec_score(score: float) -> float:
+    """Standardizes carec score using the following metric, note the end points are exclusive:
+
+        Carec Score Scale:
+        4.9 and Below	Grade 4 and Below
+        5.0 to 5.9	    Grades 5 - 6
+        6.0 to 6.9	    Grades 7 - 8
+        7.0 to 7.9	    Grades 9 - 10
+        8.0 to 8.9	    Grades 11 - 12
+        9.0 to 9.9	    Grades 13 - 15 (College)
+        10 and Above	Grades 16 and Above (College Graduate)
+
+        Adjusted to 1.0 Scale:
+        0 - 0.2         Grade 4 and Below
+        0.2 - 0.45      Grades 5 - 6
+        0.45 - 0.65     Grades 7-8
+        0.65 - 0.8      Grades 9 - 10
+        0.8 - 0.9       Grades 11 - 12
+        0.9 - 1.0       Grades 13 - 15 (College)
+        1.0 +           Grades 16 and Above (College Graduate)
+
+        """
+    return standardization.standardize('carec', score)
+
+
+def sentence_text_block(text: str) -> TextBlock:
+    """Return a TextBlock holding text as its only sentence, as the interactive scorer scores it."""
+    new_sentence = Sentence(text, None, None, None)
+    new_sentence.phrase = text
+
+    new_textblock = TextBlock([new_sentence], None, None, None, None, None, None, None, None, None, None)
+    new_textblock.excerpt = [new_sentence]
+    return new_textblock
+
+
+def score_sentence(text_block: TextBlock,
+                   carec_estimator: Callable[[TextBlock], float] = get_closest_carec_score) -> dict[str, float]:
+    """Return the grade level of a single-sentence text block for every complexity measure, and its CAREC_M grade
+    level as estimated by carec_estimator (such as carec_model.estimate_carec).
+    """
+    return {'dale_chall': com_m.standardized_dale_chall(com_m.dale_chall_complexity(text_block)),
+            'flesch': com_m.standardized_flesch_ease(com_m.flesch_complexity_score(text_block)),
+            'carec': standardized_carec_score(carec_estimator(text_block)),
+            'mdd': com_m.standardized_syntax_score(com_m.mean_dependency_distance(text_block, True))}
+
+
+if __name__ == '__main__':
+    print(score_sentence(sentence_text_block('The girl ate an apple')))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["typing", "numpy", "data_processing", "standardization", "complexity_measures"],
+        'allowed-io': []
+    })
@@ -0,0 +1,142 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains the grade level scales used to standardize every complexity measure, stored as data instead of
+if/elif ladders.
+
+Each scale is a sorted list of breakpoints and a list of grades with one more entry than the breakpoints. A score s is
+given grades[i], where i is the number of breakpoints that are <= s. In other words, every interval includes its lower
+end point and excludes its upper one, exactly like the original ladders:
+
+    breakpoints:   [b0,   b1,   b2]
+    grades:      [g0,  g1,   g2,   g3]
+    s < b0 -> g0,  b0 <= s < b1 -> g1,  b1 <= s < b2 -> g2,  s >= b2 -> g3
+
+Single scores are looked up with bisect, and whole arrays of scores with np.searchsorted, so standardizing the full
+corpus is one vectorized call. Alternate scales can be loaded from a JSON config file with load_scales.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+import json
+from bisect import bisect_right
+
+import numpy as np
+
+
+class GradeScale:
+    """
+    A table mapping a raw complexity score to a grade level.
+
+    Instance Attributes:
+    - breakpoints: the sorted scores at which the grade changes
+    - grades: the grade given to each interval between breakpoints, lowest scores first
+
+    Representation Invariants:
+    - len(self.grades) == len(self.breakpoints) + 1
+    - self.breakpoints == sorted(self.breakpoints)
+    """
+    breakpoints: list[float]
+    grades: list[int]
+    _breakpoint_array: np.ndarray
+    _grade_array: np.ndarray
+
+    def __init__(self, breakpoints: list[float], grades: list[int]) -> None:
+        """Initialize a scale, raising ValueError if it breaks the representation invariants."""
+        if len(grades) != len(breakpoints) + 1:
+            raise ValueError('a scale needs exactly one more grade than breakpoints')
+        if list(breakpoints) != sorted(breakpoints):
+            raise ValueError('scale breakpoints must be sorted')
+        self.breakpoints = list(breakpoints)
+        self.grades = list(grades)
+        self._breakpoint_array = np.array(self.breakpoints, dtype=float)
+        self._grade_array = np.array(self.grades, dtype=float)
+
+    def grade(self, score: float) -> int:
+        """Return the grade level of a single score.
+
+        >>> GradeScale([1, 2], [4, 5, 6]).grade(1)
+        5
+        """
+        return self.grades[bisect_right(self.breakpoints, score)]
+
+    def grade_array(self, scores: np.ndarray) -> np.ndarray:
+        """Return the grade level of every score in scores, with the same shape.
+
+        Scores that are nan (a measure that could not be computed) stay nan.
+
+        >>> GradeScale([1, 2], [4, 5, 6]).grade_array(np.array([0.5, 2.0, np.nan])).tolist()
+        [4.0, 6.0, nan]
+        """
+        scores = np.asarray(scores, dtype=float)
+        grades = self._grade_array[np.searchsorted(self._breakpoint_array, scores, side='right')]
+        return np.where(np.isnan(scores), np.nan, grades)
+
+
+# The default scales. See the standardizer of each measure (complexity_measures and main) for what they represent.
+# 'dale_chall' maps Dale-Chall scores adjusted to a 0-1 scale, and 'dale_chall_revised' maps the raw scores of the
+# revised (New Dale-Chall) formula directly, splitting each band of its table evenly between the grades of the band:
+#     4.9 and below: grade 4, 5.0-5.9: 5-6, 6.0-6.9: 7-8, 7.0-7.9: 9-10, 8.0-8.9: 11-12, 9.0-9.9: 13-15, 10+: 16
+SCALES = {
+    'dale_chall': GradeScale([0.2, 0.3, 0.45, 0.55, 0.65, 0.75, 0.8, 0.85, 0.9, 0.93, 0.97, 1],
+                             [4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16]),
+    'dale_chall_revised': GradeScale([5, 5.5, 6, 6.5, 7, 7.5, 8, 8.5, 9, 9.34, 9.67, 10],
+                                     [4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16]),
+    'flesch': GradeScale([30, 35, 45, 50, 54, 57, 60, 65, 70, 80, 90],
+                         [16, 15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5]),
+    'mdd': GradeScale([1, 1.5, 2, 2.5, 2.7, 3, 3.2, 3.4, 3.5, 3.7, 3.8, 3.9, 4],
+                      [4, 5, 6, 7, 8, 9, 10, 11, 12, 12, 13, 14, 15, 16]),
+    'carec': GradeScale([0.2, 0.3, 0.45, 0.55, 0.65, 0.75, 0.8, 0.85, 0.9, 0.93, 0.97, 1],
+                        [4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16])
+}
+
+
+def standardize(measure: str, score: float) -> int:
+    """Return the grade level of a single score of the given measure.
+
+    Preconditions:
+        - measure in SCALES
+
+    >>> standardize('flesch', 85.0)
+    6
+    """
+    return SCALES[measure].grade(score)
+
+
+def standardize_array(measure: str, scores: np.ndarray) -> np.ndarray:
+    """Return the grade level of every score of the given measure, as a float array (nan scores stay nan).
+
+    Preconditions:
+        - measure in SCALES
+
+    >>> standardize_array('mdd', np.array([0.5, 3.45, 3.6, 9.0])).tolist()
+    [4.0, 12.0, 12.0, 16.0]
+    """
+    return SCALES[measure].grade_array(scores)
+
+
+def load_scales(json_file: str) -> dict[str, GradeScale]:
+    """Return the scales stored in a JSON file of the form
+    {"<measure>": {"breakpoints": [...], "grades": [...]}, ...}
+
+    To use them in place of the defaults, update SCALES with the result: SCALES.update(load_scales(json_file)).
+    """
+    with open(json_file) as file:
+        config = json.load(file)
+    return {measure: GradeScale(scale['breakpoints'], scale['grades']) for measure, scale in config.items()}
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["json", "bisect", "numpy"],
+        'allowed-io': ["load_scales"]
+    })
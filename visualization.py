@@ -0,0 +1,166 @@
+"""CSC111 Winter 2023
+
+Instructions (READ THIS FIRST!)
+===============================
+This file contains the Plotly visualizations of the full-corpus results (see evaluation.score_corpus).
+
+Plotting every one of the ~4,700 blocks for every measure as its own bar or point makes charts that are slow to draw
+and huge to save. Instead, the scores are aggregated with NumPy before they are handed to Plotly:
+    - histograms: the distribution of each measure, as one bar per bin
+    - density heatmaps: a 2-D histogram of each measure against CAREC_M
+    - grade heatmaps: the confusion matrix of each standardized measure against the standardized CAREC_M grade
+Only the bin counts end up in the figure, so its size depends on the number of bins, not the number of blocks.
+Point clouds, when they are wanted, use Scattergl (drawn with WebGL) and are randomly downsampled to max_points.
+
+save_html writes figures to a single static HTML file that loads plotly.js from its CDN rather than embedding it.
+
+Copyright and Usage Information
+===============================
+
+This file is Copyright (c) 2023 Lana Wehbeh, Mikayla Pradeepan, and Agnes Yau.
+"""
+from __future__ import annotations
+from typing import Optional
+
+import numpy as np
+import plotly.graph_objects as go
+
+import evaluation
+from data_processing import TextBlock, read_csv
+
+MEASURE_LABELS = {'dale_chall': 'Dale-Chall Complexity', 'flesch': 'Flesch Complexity',
+                  'mdd': 'Mean Dependency Distance', 'carec': 'CAREC_M'}
+
+
+# AGGREGATION (plain NumPy, so the figures only ever get the binned counts)
+def histogram_bins(values: np.ndarray, bins: int = 40) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the (counts, bin centers, bin widths) of a histogram of values, leaving out nan values.
+
+    >>> counts, centers, widths = histogram_bins(np.array([0.0, 1.0, 1.0, np.nan]), bins=2)
+    >>> counts.tolist(), centers.tolist(), widths.tolist()
+    ([1, 2], [0.25, 0.75], [0.5, 0.5])
+    """
+    values = np.asarray(values, dtype=float)
+    counts, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    return counts, (edges[:-1] + edges[1:]) / 2, np.diff(edges)
+
+
+def density_bins(x: np.ndarray, y: np.ndarray, bins: int = 40) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the (counts, x bin centers, y bin centers) of a 2-D histogram of the points (x[i], y[i]), leaving out
+    points where either coordinate is nan. counts[j][i] is the number of points in x bin i and y bin j, which is the
+    orientation go.Heatmap expects.
+
+    >>> counts, x_centers, y_centers = density_bins(np.array([0.0, 1.0, np.nan]), np.array([0.0, 1.0, 1.0]), bins=2)
+    >>> counts.tolist()
+    [[1.0, 0.0], [0.0, 1.0]]
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    counts, x_edges, y_edges = np.histogram2d(x[keep], y[keep], bins=bins)
+    return counts.T, (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
+
+
+def downsample(x: np.ndarray, y: np.ndarray, max_points: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Return at most max_points of the points (x[i], y[i]) where neither coordinate is nan, chosen at random without
+    replacement and kept in their original order.
+
+    >>> downsample(np.arange(10.0), np.arange(10.0), 3)[0].shape
+    (3,)
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    keep = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if len(keep) > max_points:
+        keep = np.sort(np.random.default_rng(seed).choice(keep, size=max_points, replace=False))
+    return x[keep], y[keep]
+
+
+# FIGURES
+def histogram_figure(scores: dict[str, np.ndarray], bins: int = 40) -> go.Figure:
+    """Return a figure with the histogram of every measure in scores, which maps a key of MEASURE_LABELS to the raw
+    score of every block. Only one measure is shown at a time, chosen with a dropdown, since their scales differ.
+    """
+    fig = go.Figure()
+    for i, (measure, values) in enumerate(scores.items()):
+        counts, centers, widths = histogram_bins(values, bins)
+        fig.add_trace(go.Bar(x=centers, y=counts, width=widths, name=MEASURE_LABELS[measure], visible=i == 0))
+    buttons = [{'label': MEASURE_LABELS[measure], 'method': 'update',
+                'args': [{'visible': [j == i for j in range(len(scores))]}]} for i, measure in enumerate(scores)]
+    fig.update_layout(title_text='Distribution of Scores', title_x=0.5, xaxis_title='Raw Score',
+                      yaxis_title='Number of Text Blocks', bargap=0, updatemenus=[{'buttons': buttons}])
+    return fig
+
+
+def density_figure(measure: str, measure_scores: np.ndarray, carec_scores: np.ndarray, bins: int = 40) -> go.Figure:
+    """Return a heatmap of the number of blocks in every (measure, CAREC_M) bin of their raw scores."""
+    counts, x_centers, y_centers = density_bins(measure_scores, carec_scores, bins)
+    fig = go.Figure(data=[go.Heatmap(z=counts, x=x_centers, y=y_centers, colorscale='Viridis',
+                                     colorbar={'title': 'Blocks'})])
+    fig.update_layout(title_text=f'{MEASURE_LABELS[measure]} vs CAREC_M', title_x=0.5,
+                      xaxis_title=MEASURE_LABELS[measure], yaxis_title='CAREC_M')
+    return fig
+
+
+def grade_figure(measure: str, predicted: np.ndarray, actual: np.ndarray) -> go.Figure:
+    """Return a heatmap of the confusion matrix of the standardized grades of a measure against the standardized
+    CAREC_M grades (see evaluation.confusion_matrix). Blocks where the measure could not be computed are left out.
+    """
+    keep = ~np.isnan(predicted)
+    matrix = evaluation.confusion_matrix(predicted[keep], actual[keep])
+    fig = go.Figure(data=[go.Heatmap(z=matrix, x=evaluation.GRADES, y=evaluation.GRADES, colorscale='Blues',
+                                     colorbar={'title': 'Blocks'})])
+    fig.update_layout(title_text=f'{MEASURE_LABELS[measure]} Grade vs CAREC_M Grade', title_x=0.5,
+                      xaxis_title=f'{MEASURE_LABELS[measure]} Grade', yaxis_title='CAREC_M Grade')
+    return fig
+
+
+def scatter_figure(measure: str, measure_scores: np.ndarray, carec_scores: np.ndarray,
+                   max_points: int = 20000) -> go.Figure:
+    """Return a WebGL point cloud of the raw scores of a measure against CAREC_M, with at most max_points points."""
+    x, y = downsample(measure_scores, carec_scores, max_points)
+    fig = go.Figure(data=[go.Scattergl(x=x, y=y, mode='markers', marker={'size': 3, 'opacity': 0.5})])
+    fig.update_layout(title_text=f'{MEASURE_LABELS[measure]} vs CAREC_M', title_x=0.5,
+                      xaxis_title=MEASURE_LABELS[measure], yaxis_title='CAREC_M')
+    return fig
+
+
+def corpus_figures(text_blocks: list[TextBlock], raw_scores: Optional[np.ndarray] = None,
+                   bins: int = 40) -> list[go.Figure]:
+    """Return the histogram, density and grade figures of the corpus.
+
+    raw_scores is the output of evaluation.score_corpus(text_blocks), which is computed if it is not given.
+    """
+    if raw_scores is None:
+        raw_scores = evaluation.score_corpus(text_blocks)
+    carec = np.array([block.carec_m for block in text_blocks], dtype=float)
+    grades = evaluation.standardize_scores(raw_scores)
+    carec_grades = evaluation.standardize_carec(text_blocks)
+
+    scores = {measure: raw_scores[:, column] for column, measure in enumerate(evaluation.MEASURES)}
+    scores['carec'] = carec
+    figures = [histogram_figure(scores, bins)]
+    for column, measure in enumerate(evaluation.MEASURES):
+        figures.append(density_figure(measure, raw_scores[:, column], carec, bins))
+        figures.append(grade_figure(measure, grades[:, column], carec_grades))
+    return figures
+
+
+def save_html(figures: list[go.Figure], html_file: str) -> None:
+    """Write figures to one static HTML file, loading plotly.js from its CDN instead of embedding it."""
+    parts = [figure.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False)
+             for i, figure in enumerate(figures)]
+    with open(html_file, 'w') as file:
+        file.write('<html><head><meta charset="utf-8"></head><body>\n' + '\n'.join(parts) + '\n</body></html>\n')
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod(verbose=True)
+
+    save_html(corpus_figures(read_csv('data/data_set_novels.csv')), 'data/corpus_report.html')
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ["typing", "numpy", "plotly.graph_objects", "evaluation", "data_processing"],
+        'allowed-io': ["save_html"]
+    })